@@ -8,47 +8,110 @@ from flask import Flask, redirect
 # when running as a Vercel serverless function.
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Import legacy handlers (order matters for Firebase init)
+from util.templates import configure as configure_templates
+
+# Import legacy handlers. They share one Firestore client, one HTTP
+# connection pool and one set of caches because they live in this process.
 login_module = importlib.import_module("login")
 callback_module = importlib.import_module("callback")
 view_module = importlib.import_module("view")
+batch_module = importlib.import_module("batch")
+now_module = importlib.import_module("now")
+stream_module = importlib.import_module("stream")
+cover_module = importlib.import_module("cover")
 
 login_handler = login_module.catch_all
 callback_handler = callback_module.catch_all
 view_handler = view_module.catch_all
 view_svg_handler = view_handler  # view.svg.py is identical to view.py
-
-app = Flask(__name__)
+batch_handler = batch_module.catch_all
+now_handler = now_module.catch_all
+stream_handler = stream_module.catch_all
+cover_handler = cover_module.catch_all
 
 
-@app.route("/")
 def index():
     return redirect("/api/login")
 
 
-@app.route("/api/login", defaults={"path": ""})
-@app.route("/api/login/<path:path>")
 def login(path):
     return login_handler(path)
 
 
-@app.route("/api/callback", defaults={"path": ""})
-@app.route("/api/callback/<path:path>")
 def callback(path):
     return callback_handler(path)
 
 
-@app.route("/api/view", defaults={"path": ""})
-@app.route("/api/view/<path:path>")
 def view(path):
     return view_handler(path)
 
 
-@app.route("/api/view.svg", defaults={"path": ""})
-@app.route("/api/view.svg/<path:path>")
 def view_svg(path):
     return view_svg_handler(path)
 
 
+def batch(path):
+    return batch_handler(path)
+
+
+def now(path):
+    return now_handler(path)
+
+
+def stream(path):
+    return stream_handler(path)
+
+
+def cover(path):
+    return cover_handler(path)
+
+
+def create_app():
+    """Build the single application serving login, callback and view.
+
+    Used both by Vercel (module level ``app``) and by gunicorn, where
+    ``gunicorn.conf.py`` preloads it in the master so workers share the
+    imported code and compiled templates copy-on-write.
+    """
+    app = configure_templates(Flask(__name__))
+
+    app.add_url_rule("/", "index", index)
+    for name, func in (
+        ("login", login),
+        ("callback", callback),
+        ("view", view),
+        ("view.svg", view_svg),
+        ("now", now),
+        ("stream", stream),
+        ("cover", cover),
+    ):
+        endpoint = name.replace(".", "_")
+        app.add_url_rule(f"/api/{name}", endpoint, func, defaults={"path": ""})
+        app.add_url_rule(f"/api/{name}/<path:path>", endpoint, func)
+
+    app.add_url_rule("/api/batch", "batch", batch, defaults={"path": ""}, methods=["GET", "POST"])
+    app.add_url_rule("/api/batch/<path:path>", "batch", batch, methods=["GET", "POST"])
+
+    return app
+
+
+def warm_up(app):
+    """Do the one-off work every worker would otherwise repeat after forking.
+
+    Templates are compiled and the profanity rules are built in the gunicorn
+    master when the app is preloaded. The Firestore client is deliberately not
+    created here: gRPC channels must not cross a fork, so each worker creates
+    its own on first use.
+    """
+    from util import profanity
+
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    profanity.warm_up()
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     app.run(debug=True, port=3000)
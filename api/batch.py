@@ -0,0 +1,209 @@
+import base64
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Response, jsonify, request
+
+# Ensure the api/ directory is on sys.path so the view module resolves when
+# running as a Vercel serverless function.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import view
+from util import spotify
+from util.templates import configure as configure_templates
+
+# Render many badges in one request:
+#
+#   /api/batch?uids=alice,bob,carol&theme=compact            composite SVG grid
+#   /api/batch?uids=alice,bob&format=json                    one SVG per uid
+#
+# JSON badges link Spotify covers from /api/cover unless external_cover=false.
+# uids can also be repeated (uid=alice&uid=bob) or POSTed as {"uids": [...]}.
+# All the view's rendering parameters apply to every badge. Token documents
+# are read with a single Firestore get_all, the Spotify calls run on a thread
+# pool, each distinct cover is fetched once, and the templates are rendered
+# in the request thread.
+
+BATCH_MAX_UIDS = int(os.getenv("BATCH_MAX_UIDS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+GRID_GAP = 10
+
+SVG_SIZE = re.compile(r'<svg\b[^>]*?\bwidth="(\d+)"[^>]*?\bheight="(\d+)"')
+
+app = configure_templates(Flask(__name__))
+
+_executor = None
+_executor_pid = None
+
+
+def get_executor():
+    """Return the process-wide thread pool, recreated after a fork."""
+    global _executor, _executor_pid
+
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        _executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch")
+        _executor_pid = pid
+
+    return _executor
+
+
+def get_uids():
+    uids = []
+    for value in request.args.getlist("uids"):
+        uids.extend(value.split(","))
+    uids.extend(request.args.getlist("uid"))
+
+    body = request.get_json(silent=True)
+    if isinstance(body, dict) and isinstance(body.get("uids"), list):
+        uids.extend(str(uid) for uid in body["uids"])
+
+    # Keep the requested order, drop blanks and duplicates.
+    return list(dict.fromkeys(uid.strip() for uid in uids if uid.strip()))
+
+
+def fetch_song_infos(uids, show_offline):
+    """Return ``{uid: (status, song_info)}`` with status ok, invalid_token or error."""
+    token_infos = view.prefetch_token_info(uids)
+    executor = get_executor()
+    # No cover prefetch: load_covers fetches exactly the covers the badges need.
+    futures = {
+        uid: executor.submit(view.get_song_info, uid, show_offline, token_infos[uid], prefetch=False)
+        for uid in uids
+        if uid in token_infos
+    }
+
+    results = {}
+    for uid in uids:
+        if uid not in futures:
+            results[uid] = ("invalid_token", None)
+            continue
+        try:
+            results[uid] = ("ok", futures[uid].result())
+        except spotify.InvalidTokenError:
+            results[uid] = ("invalid_token", None)
+        except Exception as e:
+            print(f"batch: failed to fetch {uid}: {e}")
+            results[uid] = ("error", None)
+    return results
+
+
+def needs_cover_bytes(url, options):
+    """Return True if rendering a badge with cover ``url`` reads its bytes."""
+    theme = view.THEMES[options["theme"]]
+    return (
+        not options["external_cover"]
+        or view.get_external_cover_url(url, options["theme"]) is None
+        or (options["is_bar_color_from_cover"] and theme.bar_color)
+        or (options["cover_background"] and theme.derivatives)
+    )
+
+
+def load_covers(song_infos, options):
+    """Fetch every distinct cover the badges embed or draw from, once, concurrently."""
+    if not options["cover_image"]:
+        return {}
+
+    urls = set()
+    for status, song_info in song_infos.values():
+        if status != "ok":
+            continue
+        item, is_now_playing, _, _ = song_info
+        if not view.is_offline(item, is_now_playing, options["show_offline"]):
+            urls.add(view.get_cover_url(item, options["theme"]))
+    urls.discard(None)
+
+    urls = [url for url in urls if needs_cover_bytes(url, options)]
+    return dict(zip(urls, get_executor().map(view.load_image, urls)))
+
+
+def make_grid(svgs, columns, gap=GRID_GAP):
+    """Lay ``svgs`` out in a grid of ``columns`` inside one SVG.
+
+    Each badge is embedded as a data URI <image> rather than inlined, so the
+    badges' stylesheets (same class names, different colors) stay isolated.
+    """
+    sizes = []
+    for svg in svgs:
+        match = SVG_SIZE.search(svg)
+        sizes.append((int(match.group(1)), int(match.group(2))) if match else (0, 0))
+
+    cell_width = max((width for width, _ in sizes), default=0)
+    parts = []
+    y = 0
+    for row in range(0, len(svgs), columns):
+        row_height = max(height for _, height in sizes[row : row + columns])
+        for col, svg in enumerate(svgs[row : row + columns]):
+            width, height = sizes[row + col]
+            data = base64.b64encode(svg.encode("utf-8")).decode("ascii")
+            parts.append(
+                f'<image x="{col * (cell_width + gap)}" y="{y}" width="{width}" height="{height}" '
+                f'href="data:image/svg+xml;base64,{data}"/>'
+            )
+        y += row_height + gap
+
+    total_width = max(min(columns, len(svgs)) * (cell_width + gap) - gap, 0)
+    total_height = max(y - gap, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{total_width}" height="{total_height}" '
+        f'viewBox="0 0 {total_width} {total_height}">{"".join(parts)}</svg>'
+    )
+
+
+@app.route("/", defaults={"path": ""}, methods=["GET", "POST"])
+@app.route("/<path:path>", methods=["GET", "POST"])
+def catch_all(path):
+    uids = get_uids()
+    output = request.args.get("format", default="svg")
+    columns = request.args.get("columns", default="3")
+    options = view.get_render_options(request.args)
+    if output == "svg":
+        # Badges inside the grid are data URI images, which cannot load
+        # external covers.
+        options["external_cover"] = False
+    elif "external_cover" not in request.args:
+        # JSON badges are placed in pages that can load the cover from
+        # /api/cover, so by default they link it instead of embedding it.
+        options["external_cover"] = True
+
+    # Handle invalid request
+    if not uids or output not in ("svg", "json"):
+        return Response("not ok", status=400)
+    if options["theme"] not in view.THEMES:
+        return Response(f"Unknown theme, use one of: {', '.join(view.THEMES)}", status=400)
+    if len(uids) > BATCH_MAX_UIDS:
+        return Response(f"Too many uids, at most {BATCH_MAX_UIDS} per request", status=400)
+    columns = int(columns) if columns.isdigit() and int(columns) > 0 else 3
+
+    song_infos = fetch_song_infos(uids, options["show_offline"])
+    images = load_covers(song_infos, options)
+
+    badges = []
+    for uid in uids:
+        status, song_info = song_infos[uid]
+        badge = {"uid": uid, "status": status, "svg": None}
+        if status == "ok":
+            badge["is_now_playing"] = song_info[1]
+            # One track the templates choke on must not fail the whole batch.
+            try:
+                badge["svg"] = view.assets.store.expand(view.render_badge(*song_info, images=images, **options))
+            except Exception as e:
+                print(f"batch: failed to render {uid}: {e}")
+                badge["status"] = "error"
+                del badge["is_now_playing"]
+        badges.append(badge)
+
+    if output == "json":
+        resp = jsonify({"badges": badges})
+    else:
+        svg = make_grid([badge["svg"] for badge in badges if badge["svg"] is not None], columns)
+        resp = Response(svg, mimetype="image/svg+xml")
+    resp.headers["Cache-Control"] = "s-maxage=1"
+
+    return resp
+
+
+if __name__ == "__main__":
+    app.run(debug=True, port=5004)
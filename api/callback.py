@@ -1,28 +1,17 @@
-from base64 import b64decode
-
 from dotenv import find_dotenv, load_dotenv
 from flask import Flask, Response, jsonify, redirect, render_template, request
 
 load_dotenv(find_dotenv())
 
-import json
-import os
-
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-from util import spotify
+from util import spotify, stamp
+from util.bloom import get_uid_filter
+from util.cache import get_cache
+from util.firestore import lazy_firestore_db
 
 print("Starting Server")
 
-firebase_config = os.getenv("FIREBASE")
-firebase_dict = json.loads(b64decode(firebase_config))
-
-cred = credentials.Certificate(firebase_dict)
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+# Shares the process-wide Firestore client with the view (see util.firestore).
+db = lazy_firestore_db()
 
 app = Flask(__name__)
 
@@ -58,6 +47,16 @@ def catch_all(path):
     doc_ref = db.collection("users").document(user_id)
     doc_ref.set(token_info)
 
+    uid_filter = get_uid_filter()
+    if uid_filter is not None:
+        uid_filter.add(user_id)
+
+    # Drop anything the view remembers about this uid from before the login.
+    get_cache("unknown_uid").delete(user_id)
+    get_cache("token_info").delete(user_id)
+    # Other workers' per-process caches, see view.is_unknown_uid.
+    stamp.logins.touch()
+
     rendered_data = {
         "uid": user_id,
         "BASE_URL": spotify.BASE_URL,
@@ -0,0 +1,83 @@
+import os
+import re
+import sys
+
+from flask import Flask, Response, request
+
+# Ensure the api/ directory is on sys.path so the view module resolves when
+# running as a Vercel serverless function.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import view
+from util import assets, derivatives
+from util.cache import get_cache
+from util.image import ImageError, sniff
+from util.themes import DEFAULT_COVER_SIZE, THEMES
+
+# Album covers by Spotify CDN image id, for badges rendered with
+# external_cover=true:
+#
+#   /api/cover/ab67616d00001e02...?size=64
+#
+# An image id always refers to the same bytes, so responses may be cached
+# forever by browsers and CDNs. ``size`` scales the cover down to the side a
+# theme draws it at; only the sizes themes use are accepted.
+
+COVER_ID = re.compile(r"^[0-9a-f]{40}$")
+COVER_URL = "https://i.scdn.co/image/"
+SIZES = frozenset(theme.cover_size for theme in THEMES.values()) | {DEFAULT_COVER_SIZE}
+
+CACHE_COVER = get_cache("cover", ttl=view.IMAGE_CACHE_TTL, maxsize=256)
+
+app = Flask(__name__)
+
+
+def load_cover(cover_id, size):
+    """Return the Asset for a cover at ``size`` px, or None if unavailable."""
+    key = f"{cover_id}:{size}"
+    asset = CACHE_COVER.get(key)
+    if asset is not None:
+        return asset
+
+    content = view.load_image(COVER_URL + cover_id)
+    if content is None:
+        return None
+    try:
+        asset = assets.intern(derivatives.downscale(content, size))
+    except Exception as e:
+        print(f"Error resizing cover {cover_id}: {e}")
+        return None
+    CACHE_COVER.set(key, asset)
+    return asset
+
+
+@app.route("/", defaults={"path": ""})
+@app.route("/<path:path>")
+def catch_all(path):
+    cover_id = path.rsplit("/", 1)[-1]
+    size = request.args.get("size", default=str(DEFAULT_COVER_SIZE))
+
+    # Handle invalid request
+    if not COVER_ID.match(cover_id) or not size.isdigit() or int(size) not in SIZES:
+        return Response("not ok", status=400)
+
+    asset = load_cover(cover_id, int(size))
+    if asset is None:
+        resp = Response("not found", status=404)
+        resp.headers["Cache-Control"] = "s-maxage=60"
+        return resp
+
+    try:
+        kind, _ = sniff(asset.content)
+    except ImageError:
+        kind = None
+
+    resp = Response(asset.content, mimetype=f"image/{kind or 'jpeg'}")
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    resp.headers["Access-Control-Allow-Origin"] = "*"
+    resp.set_etag(asset.digest)
+    return resp.make_conditional(request)
+
+
+if __name__ == "__main__":
+    app.run(debug=True, port=5007)
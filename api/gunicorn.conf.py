@@ -0,0 +1,36 @@
+# gunicorn settings for the single-process deployment:
+#
+#   gunicorn -c api/gunicorn.conf.py --chdir api app:app
+#
+# The app is loaded once in the master (preload_app) and warmed up before the
+# workers fork, so imported modules, compiled templates and the profanity
+# rules are shared copy-on-write instead of being rebuilt per worker.
+import gc
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:3000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Threads per worker (gthread). Every open /api/stream connection holds one.
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = True
+
+
+def when_ready(server):
+    import app
+
+    app.warm_up(app.app)
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far out of the collector's reach so that
+    # gc passes in the workers don't touch (and un-share) those pages.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    from util.bloom import get_uid_filter
+
+    # Start loading the uid filter now instead of on the first badge request.
+    uid_filter = get_uid_filter()
+    if uid_filter is not None:
+        uid_filter.ready()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import sys
+from time import time
+
+from flask import Flask, jsonify, request
+
+# Ensure the api/ directory is on sys.path so the view module resolves when
+# running as a Vercel serverless function.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import view
+from util import spotify
+from util.profanity import profanity_check
+from util.remaster import remove_remaster
+
+# Track data as JSON for clients that draw their own widget:
+#
+#   /api/now?uid=alice
+#
+# Uses the view's token, now-playing and recently-played caches but never
+# downloads covers or renders a template. When nothing is playing it reports
+# the most recently played track. Responses carry an ETag that only changes
+# when the track, its state (playing, paused, recently_played, offline) or
+# the playback position jumps (seek, next track), so clients can poll with
+# If-None-Match and extrapolate progress_ms from timestamp themselves while
+# the state is playing.
+
+# Granularity in ms of the playback start time hashed into the ETag.
+ETAG_STARTED_AT_MS = 5000
+
+app = Flask(__name__)
+
+
+def get_track_data(item, is_now_playing, progress_ms, duration_ms, show_offline=False):
+    if view.is_offline(item, is_now_playing, show_offline):
+        return {"state": "offline"}
+
+    currently_playing_type = item.get("currently_playing_type", "track")
+    if currently_playing_type == "episode":
+        artist = item["show"]["publisher"]
+        album = item["show"].get("name")
+        images = item.get("images") or []
+    else:
+        artist = item["artists"][0]["name"]
+        album = (item.get("album") or {}).get("name")
+        images = (item.get("album") or {}).get("images") or []
+
+    if not is_now_playing:
+        state = "recently_played"
+    elif item.get("is_playing", True):
+        state = "playing"
+    else:
+        state = "paused"
+
+    return {
+        "state": state,
+        "type": currently_playing_type,
+        "artist": artist,
+        "title": item["name"],
+        "album": album,
+        "album_art_url": images[0]["url"] if images else None,
+        "url": (item.get("external_urls") or {}).get("spotify"),
+        "uri": item.get("uri"),
+        "progress_ms": progress_ms if is_now_playing else None,
+        "duration_ms": duration_ms,
+    }
+
+
+def get_etag(data, now_ms):
+    stable = dict(data)
+    if stable.get("state") == "playing" and stable.get("progress_ms") is not None:
+        # progress_ms moves every request, so hash when playback started
+        # instead. It only changes on seek, pause or a new track; flooring it
+        # absorbs the jitter of Spotify's and our clocks. A paused track
+        # keeps its progress_ms, which is hashed as it is.
+        stable["started_at"] = (now_ms - stable.pop("progress_ms")) // ETAG_STARTED_AT_MS
+    digest = hashlib.blake2b(json.dumps(stable, sort_keys=True).encode("utf-8"), digest_size=12)
+    return digest.hexdigest()
+
+
+def json_response(data, status=200):
+    resp = jsonify(data)
+    resp.status_code = status
+    resp.headers["Access-Control-Allow-Origin"] = "*"
+    resp.headers["Cache-Control"] = "s-maxage=1"
+    return resp
+
+
+@app.route("/", defaults={"path": ""})
+@app.route("/<path:path>")
+def catch_all(path):
+    uid = request.args.get("uid")
+    show_offline = request.args.get("show_offline", default="false") == "true"
+    is_enable_profanity = request.args.get("profanity", default="false") == "true"
+    hide_remaster = request.args.get("hide_remaster", default="false") == "true"
+
+    # Handle invalid request
+    if not uid:
+        return json_response({"error": "missing_uid"}, status=400)
+
+    try:
+        # The newest recently-played track, not a random one, so the ETag
+        # holds while nothing changes.
+        song_info = view.get_song_info(uid, show_offline, newest=True, prefetch=False)
+    except spotify.InvalidTokenError:
+        return json_response(
+            {
+                "error": "invalid_token",
+                "message": "Invalid Spotify access_token or refresh_token. Please re-login.",
+            },
+            status=404,
+        )
+
+    data = get_track_data(*song_info, show_offline=show_offline)
+    if data["state"] != "offline":
+        if is_enable_profanity:
+            data["artist"] = profanity_check(data["artist"])
+            data["title"] = profanity_check(data["title"])
+        if hide_remaster:
+            data["title"] = remove_remaster(data["title"])
+
+    now_ms = int(time() * 1000)
+    etag = get_etag(data, now_ms)
+    data["uid"] = uid
+    data["timestamp"] = now_ms
+
+    resp = json_response(data)
+    # Weak: the body also carries the timestamp, which changes every time.
+    resp.set_etag(etag, weak=True)
+    return resp.make_conditional(request)
+
+
+if __name__ == "__main__":
+    app.run(debug=True, port=5005)
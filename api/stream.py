@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import threading
+from time import monotonic, time
+
+from flask import Flask, Response, request, stream_with_context
+
+# Ensure the api/ directory is on sys.path so the view module resolves when
+# running as a Vercel serverless function.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import now
+import view
+from util import spotify
+from util.poller import Hub
+
+# Live now-playing updates over Server-Sent Events:
+#
+#   const events = new EventSource("/api/stream?uid=alice");
+#   events.addEventListener("track", (e) => render(JSON.parse(e.data)));
+#
+# Each event carries the same JSON as /api/now. All streams of one uid share
+# a single poller (util/poller.py). A stream ends after STREAM_MAX_SECONDS and
+# EventSource reconnects by itself, which keeps serverless time limits and
+# long-lived worker threads in check.
+
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "300"))
+# Open streams per worker process. Each one holds a worker thread for up to
+# STREAM_MAX_SECONDS, so this must stay below GUNICORN_THREADS or badge
+# requests queue behind streams. Past it, clients get a 503 with Retry-After.
+STREAM_MAX_CONNECTIONS = int(os.getenv("STREAM_MAX_CONNECTIONS", "2"))
+STREAM_RETRY_AFTER = 30
+HEARTBEAT_SECONDS = 15.0
+RETRY_MS = 3000
+
+app = Flask(__name__)
+
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONNECTIONS)
+
+
+def fetch_event(uid):
+    """Return the /api/now payload for ``uid`` with its ETag."""
+    try:
+        # The newest recently-played track, so an idle user's stream does not
+        # send a different random track on every poll.
+        song_info = view.get_song_info(uid, False, newest=True, prefetch=False)
+    except spotify.InvalidTokenError:
+        return {"uid": uid, "state": "invalid_token", "etag": "invalid_token"}
+
+    data = now.get_track_data(*song_info)
+    now_ms = int(time() * 1000)
+    data["etag"] = now.get_etag(data, now_ms)
+    data["uid"] = uid
+    data["timestamp"] = now_ms
+    return data
+
+
+hub = Hub(fetch_event)
+
+
+def format_event(data):
+    return f"event: track\nid: {data['etag']}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_events(uid, max_seconds=STREAM_MAX_SECONDS, heartbeat=HEARTBEAT_SECONDS):
+    deadline = monotonic() + max_seconds
+    # Subscribing inside the generator means a client that goes away before
+    # the first chunk never leaves a subscription behind.
+    with hub.subscribe(uid) as subscription:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return
+            data = subscription.get(timeout=min(heartbeat, remaining))
+            if data is None:
+                # Comment line: keeps proxies from closing an idle stream.
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(data)
+            if data["state"] == "invalid_token":
+                return
+
+
+@app.route("/", defaults={"path": ""})
+@app.route("/<path:path>")
+def catch_all(path):
+    uid = request.args.get("uid")
+
+    # Handle invalid request
+    if not uid:
+        return Response("not ok", status=400)
+
+    if not stream_slots.acquire(blocking=False):
+        resp = Response("too many streams", status=503)
+        resp.headers["Retry-After"] = str(STREAM_RETRY_AFTER)
+        return resp
+
+    resp = Response(
+        stream_with_context(stream_events(uid)),
+        mimetype="text/event-stream",
+    )
+    # The server closes the response when the stream ends or the client goes
+    # away, even if it was never iterated.
+    resp.call_on_close(stream_slots.release)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["Access-Control-Allow-Origin"] = "*"
+    # Disable nginx response buffering for this stream.
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+
+if __name__ == "__main__":
+    app.run(debug=True, port=5006, threaded=True)
@@ -2,35 +2,83 @@ from flask import Flask, Response, jsonify, render_template, redirect, request
 from base64 import b64decode, b64encode
 from dotenv import load_dotenv, find_dotenv
 
-from util.firestore import get_firestore_db
+from util.bloom import get_uid_filter
+from util.cache import get_cache, get_shared_backend
+from util.firestore import lazy_firestore_db
+from util.image import ImageError, fetch_image
+from util.lazy import lazy_import
 from util.profanity import profanity_check
+from util.prefetch import Prefetcher
 from util.remaster import remove_remaster
+from util.scheduler import IDLE_INTERVAL, get_scheduler
+from util.templates import configure as configure_templates
+from util.singleflight import Group
+from util.themes import THEMES, get_cover_size
+from util.tokens import TokenInfo
 
 load_dotenv(find_dotenv())
 
-from sys import getsizeof
-from PIL import Image, ImageFile
-
 from time import time
 
+import hashlib
 import io
-from util import spotify
+import os
+from util import assets, compress, derivatives, spotify, stamp
 import random
 import requests
 import functools
-import colorgram
 import math
 import html
 import re
 
-ImageFile.LOAD_TRUNCATED_IMAGES = True
+# Only needed for bar_color_cover; loaded on first use to keep cold starts fast.
+Image = lazy_import("PIL.Image")
+colorgram = lazy_import("colorgram")
 
 print("Starting Server")
 
-db = get_firestore_db()
-CACHE_TOKEN_INFO = {}
-
-app = Flask(__name__)
+db = lazy_firestore_db()
+
+# Cache TTLs in seconds (0 disables the cache). The backend is chosen with
+# CACHE_BACKEND, see util/cache.py.
+NOW_PLAYING_CACHE_TTL = float(os.getenv("NOW_PLAYING_CACHE_TTL", "5"))
+IMAGE_CACHE_TTL = float(os.getenv("IMAGE_CACHE_TTL", "86400"))
+SVG_CACHE_TTL = float(os.getenv("SVG_CACHE_TTL", "60"))
+RECENTLY_PLAYED_CACHE_TTL = float(os.getenv("RECENTLY_PLAYED_CACHE_TTL", "300"))
+UNKNOWN_UID_CACHE_TTL = float(os.getenv("UNKNOWN_UID_CACHE_TTL", "600"))
+# With POLL_SCHEDULER=true now-playing entries are refreshed in the background
+# and must outlive the longest poll interval.
+POLLED_NOW_PLAYING_TTL = IDLE_INTERVAL + NOW_PLAYING_CACHE_TTL
+# Seconds a request waits for an identical in-flight one before rendering
+# on its own.
+SINGLEFLIGHT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_TIMEOUT", "10"))
+# Progress is rounded down to this many ms, or percent of the track if that
+# is coarser, so a badge does not change (and miss the cache) every request.
+# With animate_progress the browser moves the bar, so it can be coarser.
+PROGRESS_QUANTUM_MS = int(os.getenv("PROGRESS_QUANTUM_MS", "1000"))
+PROGRESS_QUANTUM_PERCENT = float(os.getenv("PROGRESS_QUANTUM_PERCENT", "0"))
+ANIMATED_PROGRESS_QUANTUM_MS = int(os.getenv("ANIMATED_PROGRESS_QUANTUM_MS", "10000"))
+
+CACHE_TOKEN_INFO = get_cache("token_info")
+CACHE_NOW_PLAYING = get_cache("now_playing", ttl=NOW_PLAYING_CACHE_TTL, maxsize=4096)
+CACHE_IMAGE = get_cache("image", ttl=IMAGE_CACHE_TTL, maxsize=128)
+CACHE_SVG = get_cache("svg", ttl=SVG_CACHE_TTL, maxsize=256)
+CACHE_RECENTLY_PLAYED = get_cache("recently_played", ttl=RECENTLY_PLAYED_CACHE_TTL, maxsize=4096)
+# uids that are not in Firestore or whose refresh token was revoked, so stale
+# README embeds do not read Firestore on every hit. callback.py clears the
+# entry when the user logs in again, see is_unknown_uid for other workers.
+CACHE_UNKNOWN_UID = get_cache("unknown_uid", ttl=UNKNOWN_UID_CACHE_TTL, maxsize=65536)
+RENDERS_IN_FLIGHT = Group()
+IMAGES_IN_FLIGHT = Group()
+COVER_PREFETCH = os.getenv("COVER_PREFETCH", "true") == "true" and IMAGE_CACHE_TTL != 0
+# Covers on Spotify's CDN can be linked through /api/cover by their id, see
+# api/cover.py. COVER_BASE_URL may point at a CDN in front of it.
+SPOTIFY_IMAGE_URL = re.compile(r"^https://i\.scdn\.co/image/([0-9a-f]{40})$")
+COVER_BASE_URL = os.getenv("COVER_BASE_URL", "/api/cover/")
+# Cover derivatives for themes that use them, see get_derivatives.
+CACHE_DERIVATIVES = get_cache("derivatives", ttl=IMAGE_CACHE_TTL, maxsize=256)
+
+app = configure_templates(Flask(__name__))
 
 
 @functools.lru_cache(maxsize=128)
@@ -50,21 +98,53 @@ def generate_css_bar(num_bar=75):
     return css_bar
 
 
-@functools.lru_cache(maxsize=128)
 def load_image(url):
+    asset = CACHE_IMAGE.get(url)
+    if asset is not None:
+        return asset.content
+
+    # A prefetch of the same cover may already be downloading it.
+    return IMAGES_IN_FLIGHT.do(url, lambda: download_image(url))
+
+
+def download_image(url):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.content
+        # Many users share an album: cache the one shared copy of the cover.
+        asset = assets.intern(fetch_image(url))
+        CACHE_IMAGE.set(url, asset)
+        return asset.content
     except requests.exceptions.RequestException as e:
         print(f"Error loading image from {url}: {e}")
         # Return a placeholder or None to handle gracefully
         return None
+    except ImageError as e:
+        print(f"Rejected image from {url}: {e}")
+        return None
     except Exception as e:
         print(f"Unexpected error loading image: {e}")
         return None
 
 
+COVER_PREFETCHER = Prefetcher(load_image)
+
+
+def prefetch_covers(items):
+    """Start downloading the covers of ``items`` that are not cached yet.
+
+    The theme is not known yet, so this warms the default cover size.
+    """
+    if not COVER_PREFETCH:
+        return
+
+    for item in items:
+        try:
+            url = get_cover_url(item)
+        except (KeyError, IndexError, TypeError):
+            continue
+        if url and url not in CACHE_IMAGE:
+            COVER_PREFETCHER.submit(url)
+
+
 def to_img_b64(content):
     if content is None:
         return ""
@@ -101,9 +181,27 @@ def format_time_ms(milliseconds):
     return f"{minutes}:{seconds:02d}"
 
 
-def calculate_progress_data(progress_ms, duration_ms):
-    """Calculate progress percentage and formatted times"""
-    if not progress_ms or not duration_ms or duration_ms <= 0:
+def quantize_progress(progress_ms, duration_ms, quantum_ms=PROGRESS_QUANTUM_MS, quantum_percent=PROGRESS_QUANTUM_PERCENT):
+    """Round ``progress_ms`` down to the progress quantum."""
+    if progress_ms is None:
+        return None
+    step = quantum_ms
+    if duration_ms and quantum_percent:
+        step = max(step, duration_ms * quantum_percent / 100)
+    if step <= 1:
+        return progress_ms
+    return int(progress_ms // step * step)
+
+
+def calculate_progress_data(progress_ms, duration_ms, animate=False):
+    """Calculate progress percentage and formatted times
+
+    With ``animate`` the bar moves on to the end of the track in the browser
+    (``animation_seconds``), and only the duration is shown, which does not
+    go stale while it does.
+    """
+    # progress_ms is 0 at the start of a track, which animates from there.
+    if progress_ms is None or not duration_ms or duration_ms <= 0:
         return {
             "progress_percentage": 0,
             "current_time": "0:00",
@@ -121,6 +219,14 @@ def calculate_progress_data(progress_ms, duration_ms):
     remaining_ms = duration_ms - progress_ms
     remaining_time = f"-{format_time_ms(remaining_ms)}"
 
+    if animate:
+        return {
+            "progress_percentage": round(progress_percentage, 3),
+            "current_time": "",
+            "remaining_time": format_time_ms(duration_ms),
+            "animation_seconds": f"{remaining_ms / 1000:g}",
+        }
+
     return {
         "progress_percentage": progress_percentage,
         "current_time": current_time,
@@ -143,37 +249,35 @@ def make_svg(
     border_radius="10",
     progress_ms=None,
     duration_ms=None,
+    img_url=None,
+    backdrop=None,
+    animate_progress=False,
 ):
-    height = 0
-    num_bar = 75
+    theme_info = THEMES[theme]
+    if not theme_info.progress:
+        # Otherwise every request would render, and cache, a new SVG.
+        progress_ms = duration_ms = None
+        animate_progress = False
+
+    cache_key = hashlib.blake2b(
+        repr(
+            (artist_name, song_name, img, is_now_playing, cover_image, theme,
+             bar_color, show_offline, background_color, mode, border_radius,
+             progress_ms, duration_ms, img_url, backdrop, animate_progress)
+        ).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    svg = CACHE_SVG.get(cache_key)
+    if svg is not None:
+        return svg
+
+    height = theme_info.get_height(cover_image)
+    num_bar = theme_info.num_bar
 
     # Sanitize input
     artist_name = encode_html_entities(artist_name)
     song_name = encode_html_entities(song_name)
 
-    if theme == "compact":
-        if cover_image:
-            height = 400
-        else:
-            height = 100
-    elif theme == "natemoo-re":
-        height = 84
-        num_bar = 100
-    elif theme == "novatorem":
-        height = 100
-        num_bar = 100
-    elif theme == "apple":
-        height = 534
-        num_bar = 0
-    elif theme == "spotify-embed":
-        height = 152
-        num_bar = 0
-    else:
-        if cover_image:
-            height = 445
-        else:
-            height = 145
-
     if is_now_playing:
         title_text = "Now playing"
         content_bar = "".join(["<div class='bar'></div>" for i in range(num_bar)])
@@ -187,15 +291,15 @@ def make_svg(
         content_bar = ""
         css_bar = generate_css_bar(num_bar)
 
-    # Calculate progress data for Apple and Spotify Embed themes
+    # Calculate progress data for themes that draw it
     progress_data = {}
-    if theme in ["apple", "spotify-embed"] and duration_ms is not None:
+    if duration_ms is not None:
         if is_now_playing and progress_ms is not None:
             # Currently playing - show real progress
-            progress_data = calculate_progress_data(progress_ms, duration_ms)
+            progress_data = calculate_progress_data(progress_ms, duration_ms, animate_progress)
         else:
-            # Recently played - show 0 progress but real duration
-            progress_data = calculate_progress_data(0, duration_ms)
+            # Recently played - show 0 progress
+            progress_data = calculate_progress_data(None, duration_ms)
 
     rendered_data = {
         "height": height,
@@ -206,6 +310,8 @@ def make_svg(
         "artist_name": artist_name,
         "song_name": song_name,
         "img": img,
+        "img_url": html.escape(img_url) if img_url else None,
+        "backdrop": backdrop,
         "cover_image": cover_image,
         "bar_color": bar_color,
         "background_color": background_color,
@@ -215,60 +321,106 @@ def make_svg(
         "border_radius": border_radius,
     }
 
-    return render_template(f"spotify.{theme}.html.j2", **rendered_data)
+    svg = render_template(theme_info.template, **rendered_data)
+    svg = assets.AssetText(svg, assets.store.find(svg))
+    CACHE_SVG.set(cache_key, svg)
 
+    return svg
 
-def get_cache_token_info(uid):
-    global CACHE_TOKEN_INFO
 
+def get_cache_token_info(uid):
     token_info = CACHE_TOKEN_INFO.get(uid, None)
 
-    if type(token_info) == dict:
-        current_ts = int(time())
-        expired_ts = token_info.get("expired_ts")
-        if expired_ts is None or current_ts >= expired_ts:
-            return None
+    if isinstance(token_info, TokenInfo) and token_info.expired():
+        return None
 
     return token_info
 
 
 def delete_cache_token_info(uid):
-    global CACHE_TOKEN_INFO
-
     if uid in CACHE_TOKEN_INFO:
         del CACHE_TOKEN_INFO[uid]
 
 
-def get_access_token(uid):
-    global CACHE_TOKEN_INFO
+def is_unknown_uid(uid):
+    """Return True if ``uid`` is in the negative cache."""
+    if uid not in CACHE_UNKNOWN_UID:
+        return False
+    # callback.py only clears the entry in its own worker. With per-process
+    # caches, any login since the last hit drops the whole negative cache.
+    if get_shared_backend() is None and stamp.logins.changed():
+        CACHE_UNKNOWN_UID.clear()
+        return False
+    return True
+
+
+def prefetch_token_info(uids):
+    """Return ``{uid: TokenInfo}`` for ``uids`` using one batched Firestore read.
+
+    Unknown uids are recorded in the negative cache like get_access_token does.
+    """
+    token_infos = {}
+    missing = []
+    uid_filter = get_uid_filter()
+    for uid in uids:
+        token_info = get_cache_token_info(uid)
+        if token_info is not None:
+            token_infos[uid] = token_info
+        elif is_unknown_uid(uid):
+            continue
+        elif uid_filter is not None and not uid_filter.might_exist(uid):
+            continue
+        else:
+            missing.append(uid)
+
+    if missing:
+        refs = [db.collection("users").document(uid) for uid in missing]
+        for doc in db.get_all(refs):
+            if doc.exists:
+                token_info = TokenInfo.from_dict(doc.to_dict())
+                CACHE_TOKEN_INFO[doc.id] = token_info
+                token_infos[doc.id] = token_info
+
+        for uid in missing:
+            if uid not in token_infos:
+                CACHE_UNKNOWN_UID[uid] = "unknown"
+
+    return token_infos
+
 
+def get_access_token(uid, token_info=None):
     # Load token from cache memory
-    token_info = get_cache_token_info(uid)
+    if token_info is None:
+        token_info = get_cache_token_info(uid)
 
     if token_info is None:
+        if is_unknown_uid(uid):
+            return None
+
+        uid_filter = get_uid_filter()
+        if uid_filter is not None and not uid_filter.might_exist(uid):
+            return None
+
         # Load from firebase
         doc_ref = db.collection("users").document(uid)
         doc = doc_ref.get()
 
         if not doc.exists:
             print("not exist data in firebase: {}".format(uid))
+            CACHE_UNKNOWN_UID[uid] = "unknown"
             return None
 
-        token_info = doc.to_dict()
+        token_info = TokenInfo.from_dict(doc.to_dict())
 
         CACHE_TOKEN_INFO[uid] = token_info
 
-    current_ts = int(time())
-    access_token = token_info.get("access_token", None)
+    access_token = token_info.access_token
     print(access_token)
 
     # Check token expired
-    expired_ts = token_info.get("expired_ts")
-    if expired_ts is None or current_ts >= expired_ts:
+    if token_info.expired():
         # Refresh token
-        refresh_token = token_info["refresh_token"]
-
-        new_token = spotify.refresh_token(refresh_token)
+        new_token = spotify.refresh_token(token_info.refresh_token)
 
         # Handle refresh token revoke
         if new_token.get("error") == "invalid_grant":
@@ -278,26 +430,107 @@ def get_access_token(uid):
 
             # Delete token in memory cache
             delete_cache_token_info(uid)
+            CACHE_UNKNOWN_UID[uid] = "revoked"
             return None
 
-        expired_ts = int(time()) + new_token["expires_in"]
+        token_info = token_info.refreshed(new_token)
         update_data = {
-            "access_token": new_token["access_token"],
-            "expired_ts": expired_ts,
+            "access_token": token_info.access_token,
+            "refresh_token": token_info.refresh_token,
+            "expired_ts": token_info.expired_ts,
         }
         doc_ref = db.collection("users").document(uid)
         doc_ref.update(update_data)
 
-        access_token = new_token["access_token"]
+        access_token = token_info.access_token
 
         # Save in memory cache
-        CACHE_TOKEN_INFO[uid] = update_data
+        CACHE_TOKEN_INFO[uid] = token_info
 
     return access_token
 
 
-def get_song_info(uid, show_offline):
-    access_token = get_access_token(uid)
+def fetch_now_playing(uid, access_token, ttl=None, prefetch=True):
+    data = spotify.get_now_playing(access_token)
+
+    # Only cache real answers, never Spotify error payloads.
+    if not data or "item" in data:
+        CACHE_NOW_PLAYING.set(uid, (data, time()), ttl)
+
+    # Fetch the cover of a new track before the first render asks for it.
+    if prefetch and data and data.get("item"):
+        prefetch_covers(
+            [dict(data["item"], currently_playing_type=data.get("currently_playing_type", "track"))]
+        )
+
+    return data
+
+
+def poll_now_playing(uid):
+    """Refresh the cached now-playing of ``uid``; run by the poll scheduler."""
+    try:
+        access_token = get_access_token(uid)
+        if access_token is None:
+            raise spotify.InvalidTokenError("Invalid Spotify access_token or refresh_token")
+        return fetch_now_playing(uid, access_token, POLLED_NOW_PLAYING_TTL)
+    except Exception:
+        # The next view fetches it itself.
+        CACHE_NOW_PLAYING.delete(uid)
+        raise
+
+
+def get_now_playing(uid, access_token, prefetch=True):
+    scheduler = get_scheduler(poll_now_playing)
+    cached = CACHE_NOW_PLAYING.get(uid)
+    if cached is not None:
+        if scheduler is not None:
+            scheduler.touch(uid)
+        data, fetched_at = cached
+        if data and data.get("progress_ms") is not None and data.get("is_playing", True):
+            # Advance the cached position by the time spent in the cache.
+            data = dict(data)
+            progress_ms = data["progress_ms"] + int((time() - fetched_at) * 1000)
+            duration_ms = (data.get("item") or {}).get("duration_ms")
+            data["progress_ms"] = min(progress_ms, duration_ms) if duration_ms else progress_ms
+        return data
+
+    if scheduler is None:
+        return fetch_now_playing(uid, access_token, prefetch=prefetch)
+
+    # First view: fetch it here, the scheduler keeps it fresh from now on.
+    data = fetch_now_playing(uid, access_token, POLLED_NOW_PLAYING_TTL, prefetch)
+    scheduler.touch(uid, data)
+    return data
+
+
+def get_recently_played_tracks(uid, access_token, prefetch=True):
+    tracks = CACHE_RECENTLY_PLAYED.get(uid)
+    if tracks is not None:
+        return tracks
+
+    recent_plays = spotify.get_recently_play(access_token)
+    if "items" not in recent_plays and recent_plays:
+        # Spotify error payload, try again on the next request.
+        return []
+
+    tracks = [play["track"] for play in recent_plays.get("items", [])]
+    CACHE_RECENTLY_PLAYED.set(uid, tracks)
+    # Any of them may be picked on the next requests.
+    if prefetch:
+        prefetch_covers(tracks)
+    return tracks
+
+
+def get_song_info(uid, show_offline, token_info=None, newest=False, prefetch=True):
+    """Return ``(item, is_now_playing, progress_ms, duration_ms)`` for ``uid``.
+
+    ``is_now_playing`` is True for the current track even while it is
+    paused, then ``item["is_playing"]`` is False. When nothing is playing,
+    ``item`` is a random recently-played track, or the last one played with
+    ``newest`` so repeated calls agree. Callers that never draw the cover,
+    or load it themselves, pass ``prefetch=False``.
+    """
+    access_token = get_access_token(uid, token_info)
 
     item = None
     is_now_playing = False
@@ -308,11 +541,13 @@ def get_song_info(uid, show_offline):
     if access_token is None:
         raise spotify.InvalidTokenError("Invalid Spotify access_token or refresh_token")
 
-    data = spotify.get_now_playing(access_token)
+    data = get_now_playing(uid, access_token, prefetch)
 
     if data:
         item = data["item"]
         item["currently_playing_type"] = data["currently_playing_type"]
+        # is_now_playing also covers a paused track, this tells them apart.
+        item["is_playing"] = data.get("is_playing", True)
         is_now_playing = True
 
         # Extract progress data for currently playing tracks
@@ -322,16 +557,16 @@ def get_song_info(uid, show_offline):
     elif show_offline:
         return None, False, None, None
     else:
-        recent_plays = spotify.get_recently_play(access_token)
-        size_recent_play = len(recent_plays["items"])
+        tracks = get_recently_played_tracks(uid, access_token, prefetch)
 
         # Handle empty recently play, should offline
-        if size_recent_play == 0:
+        if not tracks:
             return None, False, None, None
 
-        idx = random.randint(0, size_recent_play - 1)
-        item = recent_plays["items"][idx]["track"]
-        item["currently_playing_type"] = "track"
+        # Spotify lists the most recently played track first.
+        idx = 0 if newest else random.randint(0, len(tracks) - 1)
+        # Copy so the cached track is never mutated.
+        item = dict(tracks[idx], currently_playing_type="track")
         is_now_playing = False
         # No progress data for recently played tracks, but get duration
         if item and item.get("duration_ms"):
@@ -340,44 +575,139 @@ def get_song_info(uid, show_offline):
     return item, is_now_playing, progress_ms, duration_ms
 
 
-@app.route("/", defaults={"path": ""})
-@app.route("/<path:path>")
-def catch_all(path):
-    uid = request.args.get("uid")
-    cover_image = request.args.get("cover_image", default="true") == "true"
-    is_redirect = request.args.get("redirect", default="false") == "true"
-    theme = request.args.get("theme", default="default")
-    bar_color = request.args.get("bar_color", default="53b14f")
-    background_color = request.args.get("background_color", default="121212")
-    is_bar_color_from_cover = (
-        request.args.get("bar_color_cover", default="false") == "true"
-    )
-    show_offline = request.args.get("show_offline", default="false") == "true"
-    interchange = request.args.get("interchange", default="false") == "true"
-    mode = request.args.get("mode", default="light")
-    border_radius = request.args.get("border_radius", default="10")
-    is_enable_profanity = request.args.get("profanity", default="false") == "true"
-    hide_remaster = request.args.get("hide_remaster", default="false") == "true"
-
-    # Handle invalid request
-    if not uid:
-        return Response("not ok")
-    
+def get_render_options(args):
+    """Read the badge rendering options from request ``args``."""
+    border_radius = args.get("border_radius", default="10")
     if not re.match(r'^\d+$', border_radius):
         border_radius = "10"
 
+    return {
+        "cover_image": args.get("cover_image", default="true") == "true",
+        "theme": args.get("theme", default="default"),
+        "bar_color": args.get("bar_color", default="53b14f"),
+        "background_color": args.get("background_color", default="121212"),
+        "is_bar_color_from_cover": args.get("bar_color_cover", default="false") == "true",
+        "show_offline": args.get("show_offline", default="false") == "true",
+        "interchange": args.get("interchange", default="false") == "true",
+        "mode": args.get("mode", default="light"),
+        "border_radius": border_radius,
+        "is_enable_profanity": args.get("profanity", default="false") == "true",
+        "hide_remaster": args.get("hide_remaster", default="false") == "true",
+        "external_cover": args.get("external_cover", default="false") == "true",
+        "cover_background": args.get("cover_background", default="false") == "true",
+        "animate_progress": args.get("animate_progress", default="false") == "true",
+    }
+
+
+def is_offline(item, is_now_playing, show_offline):
+    return (show_offline and not is_now_playing) or (item is None)
+
+
+def select_image(images, size):
+    """Return the smallest of ``images`` at least ``size`` px wide.
+
+    Falls back to the largest image if none is big enough, and to the
+    middle one (Spotify's 300 px) if their sizes are unknown.
+    """
+    sized = sorted((image for image in images if image.get("width")), key=lambda image: image["width"])
+    for image in sized:
+        if image["width"] >= size:
+            return image
+    if sized:
+        return sized[-1]
+    if images:
+        return images[1] if len(images) > 1 else images[0]
+    return None
+
+
+def get_cover_url(item, theme="default"):
+    currently_playing_type = item.get("currently_playing_type", "track")
+
+    if currently_playing_type == "track":
+        images = item["album"].get("images") or []
+    elif currently_playing_type == "episode":
+        images = item.get("images") or []
+    else:
+        return None
+
+    image = select_image(images, get_cover_size(theme))
+    return image["url"] if image is not None else None
+
+
+def get_external_cover_url(url, theme="default"):
+    """Return the /api/cover url serving the Spotify CDN image ``url``, or None
+    if ``url`` is not one."""
+    match = SPOTIFY_IMAGE_URL.match(url)
+    if match is None:
+        return None
+    return f"{COVER_BASE_URL}{match.group(1)}?size={get_cover_size(theme)}"
+
+
+def get_derivatives(img, theme):
+    """Return ``(cover, backdrop, colors)`` derived from cover bytes ``img``.
+
+    ``cover`` is the cover scaled to the theme's size and ``backdrop`` a tiny
+    blurred copy, both Assets; ``colors`` are its two dominant colors. They
+    are computed once per cover and size. If the cover cannot be decoded,
+    returns the original cover and no backdrop.
+    """
+    source = assets.intern(img)
+    size = get_cover_size(theme)
+    key = f"{source.digest}:{size}"
+    derived = CACHE_DERIVATIVES.get(key)
+    if derived is not None:
+        return derived
+
     try:
-        item, is_now_playing, progress_ms, duration_ms = get_song_info(
-            uid, show_offline
+        derived = (
+            assets.intern(derivatives.downscale(img, size, derivatives.DOWNSCALE_SLACK)),
+            assets.intern(derivatives.backdrop(img)),
+            derivatives.dominant_colors(img),
         )
-    except spotify.InvalidTokenError as e:
+    except Exception as e:
+        print(f"Error deriving images from cover: {e}")
+        return source, None, None
+    CACHE_DERIVATIVES.set(key, derived)
+    return derived
 
-        # Handle invalid token
-        return Response(
-            "Error: Invalid Spotify access_token or refresh_token. Possibly the token revoked. Please re-login at https://github.com/kittinan/spotify-github-profile"
-        )
 
-    if (show_offline and not is_now_playing) or (item is None):
+def render_badge(
+    item,
+    is_now_playing,
+    progress_ms,
+    duration_ms,
+    cover_image=True,
+    theme="default",
+    bar_color="53b14f",
+    background_color="121212",
+    is_bar_color_from_cover=False,
+    show_offline=False,
+    interchange=False,
+    mode="light",
+    border_radius="10",
+    is_enable_profanity=False,
+    hide_remaster=False,
+    external_cover=False,
+    cover_background=False,
+    animate_progress=False,
+    images=None,
+):
+    """Render the badge SVG for ``item`` as returned by get_song_info.
+
+    With ``external_cover`` the SVG links the cover from /api/cover instead
+    of embedding it, which only displays where the SVG may load external
+    images (not in GitHub READMEs). ``cover_background`` draws themes with
+    derivatives over a blurred backdrop of the cover. With
+    ``animate_progress`` the progress bar moves in the browser. ``images``
+    optionally maps cover urls to already loaded image bytes.
+    """
+    if animate_progress and item is not None and not item.get("is_playing", True):
+        # A paused track's bar must not move on in the browser.
+        animate_progress = False
+    quantum_ms = ANIMATED_PROGRESS_QUANTUM_MS if animate_progress else PROGRESS_QUANTUM_MS
+    progress_ms = quantize_progress(progress_ms, duration_ms, quantum_ms)
+
+    if is_offline(item, is_now_playing, show_offline):
         if interchange:
             artist_name = "Currently not playing on Spotify"
             song_name = "Offline"
@@ -386,7 +716,7 @@ def catch_all(path):
             song_name = "Currently not playing on Spotify"
         img_b64 = ""
         cover_image = False
-        svg = make_svg(
+        return make_svg(
             artist_name,
             song_name,
             img_b64,
@@ -401,34 +731,50 @@ def catch_all(path):
             progress_ms,
             duration_ms,
         )
-        resp = Response(svg, mimetype="image/svg+xml")
-        resp.headers["Cache-Control"] = "s-maxage=1"
-        return resp
 
     currently_playing_type = item.get("currently_playing_type", "track")
-
-    if is_redirect:
-        return redirect(item["uri"], code=302)
+    theme_info = THEMES[theme]
+    # The cover is only needed for its colors if the theme draws bar_color.
+    is_bar_color_from_cover = is_bar_color_from_cover and theme_info.bar_color
 
     img = None
     img_b64 = ""
+    img_url = None
+    asset = None
+    backdrop = None
+    backdrop_asset = None
+    cover_background = cover_background and theme_info.derivatives
     if cover_image:
-
-        if currently_playing_type == "track":
-            img = load_image(item["album"]["images"][1]["url"])
-        elif currently_playing_type == "episode":
-            img = load_image(item["images"][1]["url"])
-
-        # Only convert to base64 if image was successfully loaded
-        if img is not None:
-            img_b64 = to_img_b64(img)
+        url = get_cover_url(item, theme)
+        if url is not None and external_cover:
+            img_url = get_external_cover_url(url, theme)
+        if url is not None and (img_url is None or is_bar_color_from_cover or cover_background):
+            if images is not None and url in images:
+                img = images[url]
+            else:
+                img = load_image(url)
+
+        # The SVG gets a placeholder; the shared base64 cover is only
+        # spliced in when the response is written. ``asset`` keeps it alive
+        # until make_svg has attached it to the SVG.
+        if img is not None and img_url is None:
+            if theme_info.derivatives:
+                asset = get_derivatives(img, theme)[0]
+            else:
+                asset = assets.intern(img)
+            img_b64 = asset.placeholder
+
+        if img is not None and cover_background:
+            _, backdrop_asset, colors = get_derivatives(img, theme)
+            if backdrop_asset is not None:
+                backdrop = {"img": backdrop_asset.placeholder, "from": colors[0], "to": colors[1]}
+                # Keep the text readable on the cover's colors.
+                mode = isLightOrDark([int(colors[0][i : i + 2], 16) for i in (0, 2, 4)])
 
     # Extract cover image color
     if is_bar_color_from_cover and img is not None:
 
-        is_skip_dark = False
-        if theme in ["default"]:
-            is_skip_dark = True
+        is_skip_dark = theme_info.skip_dark_bar
 
         try:
             pil_img = Image.open(io.BytesIO(img))
@@ -473,7 +819,7 @@ def catch_all(path):
         artist_name = song_name
         song_name = x
 
-    svg = make_svg(
+    return make_svg(
         artist_name,
         song_name,
         img_b64,
@@ -487,14 +833,75 @@ def catch_all(path):
         border_radius,
         progress_ms,
         duration_ms,
+        img_url=img_url,
+        backdrop=backdrop,
+        animate_progress=animate_progress,
     )
 
-    resp = Response(svg, mimetype="image/svg+xml")
-    resp.headers["Cache-Control"] = "s-maxage=1"
 
-    print("cache size:", getsizeof(CACHE_TOKEN_INFO))
+def get_svg_etag(svg):
+    # Placeholders are content hashes, so hashing the unexpanded SVG is enough.
+    return hashlib.blake2b(svg.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def render_request(args):
+    """Return ``(kind, body)`` for a badge request: svg, redirect, text or
+    bad_request."""
+    uid = args.get("uid")
+    is_redirect = args.get("redirect", default="false") == "true"
+    options = get_render_options(args)
+
+    # Handle invalid request
+    if not uid:
+        return "text", "not ok"
+    if options["theme"] not in THEMES:
+        return "bad_request", f"Unknown theme, use one of: {', '.join(THEMES)}"
+
+    try:
+        item, is_now_playing, progress_ms, duration_ms = get_song_info(
+            uid, options["show_offline"]
+        )
+    except spotify.InvalidTokenError as e:
+
+        # Handle invalid token
+        return (
+            "text",
+            "Error: Invalid Spotify access_token or refresh_token. Possibly the token revoked. Please re-login at https://github.com/kittinan/spotify-github-profile",
+        )
+
+    if is_redirect and not is_offline(item, is_now_playing, options["show_offline"]):
+        return "redirect", item["uri"]
+
+    return "svg", render_badge(item, is_now_playing, progress_ms, duration_ms, **options)
+
+
+@app.route("/", defaults={"path": ""})
+@app.route("/<path:path>")
+def catch_all(path):
+    # Identical requests arriving while one is being rendered share its
+    # result instead of running the pipeline again.
+    key = tuple(sorted(request.args.items(multi=True)))
+    kind, body = RENDERS_IN_FLIGHT.do(key, lambda: render_request(request.args), SINGLEFLIGHT_TIMEOUT)
+
+    if kind == "redirect":
+        return redirect(body, code=302)
+    if kind == "text":
+        return Response(body)
+    if kind == "bad_request":
+        return Response(body, status=400)
+
+    # Compressed once per rendered SVG, see AssetStore.encode.
+    encoding = compress.negotiate(request.headers.get("Accept-Encoding"))
+    chunks, encoding = assets.store.encode(body, encoding)
+    resp = Response(chunks, mimetype="image/svg+xml")
+    if encoding is not None:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "s-maxage=1"
+    # Weak: the same badge is sent with different encodings.
+    resp.set_etag(get_svg_etag(body), weak=True)
 
-    return resp
+    return resp.make_conditional(request)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+"""Benchmark and load-test tooling.
+
+Nothing in here is imported by the application itself. See ``bench/README.md``
+for how to run the suites and compare results against a baseline.
+"""
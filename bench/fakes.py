@@ -0,0 +1,559 @@
+"""Local stand-ins for the services the view endpoint talks to.
+
+``FakeSpotify`` is a small threaded HTTP server that answers the Spotify
+endpoints used by ``util.spotify`` and also serves album covers, so a
+benchmark never leaves the machine. Latency and error rate are configurable
+and all randomness is seeded, which keeps runs reproducible.
+
+``InMemoryFirestore`` implements the subset of the Firestore client API used
+by the app (collection / document / get / set / update / delete / stream /
+get_all).
+
+``FakeRedis`` is a tiny Redis-protocol server (GET / SET / DEL / SCAN) for
+exercising ``util.cache.RedisBackend`` without a Redis install.
+"""
+
+import fnmatch
+import io
+import json
+import random
+import socketserver
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TOKEN_PREFIX = "token-"
+
+
+def uid_from_token(access_token):
+    if access_token and access_token.startswith(TOKEN_PREFIX):
+        return access_token[len(TOKEN_PREFIX) :]
+    return None
+
+
+def _stable_hash(value):
+    return zlib.crc32(value.encode("utf-8"))
+
+
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        return dict(self._data)
+
+
+class _DocumentRef:
+    def __init__(self, store, collection, doc_id):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self):
+        self._store._read()
+        data = self._store._docs(self._collection).get(self.id)
+        return _Snapshot(self.id, data)
+
+    def set(self, data):
+        self._store._write()
+        self._store._docs(self._collection)[self.id] = dict(data)
+
+    def update(self, data):
+        self._store._write()
+        docs = self._store._docs(self._collection)
+        if self.id not in docs:
+            raise KeyError(f"No document to update: {self._collection}/{self.id}")
+        docs[self.id].update(data)
+
+    def delete(self):
+        self._store._write()
+        self._store._docs(self._collection).pop(self.id, None)
+
+
+class _Collection:
+    def __init__(self, store, name):
+        self._store = store
+        self._name = name
+
+    def document(self, doc_id):
+        return _DocumentRef(self._store, self._name, doc_id)
+
+    def select(self, field_paths):
+        # Projections are not modelled; callers only use the document ids.
+        return self
+
+    def stream(self):
+        docs = list(self._store._docs(self._name).items())
+        for doc_id, data in docs:
+            self._store._read()
+            yield _Snapshot(doc_id, data)
+
+
+class InMemoryFirestore:
+    """Dictionary backed Firestore client with optional per-call latency."""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_ms = latency_ms
+        self.reads = 0
+        self.writes = 0
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def _read(self):
+        with self._lock:
+            self.reads += 1
+        self._sleep()
+
+    def _write(self):
+        with self._lock:
+            self.writes += 1
+        self._sleep()
+
+    def _docs(self, name):
+        return self._collections.setdefault(name, {})
+
+    def collection(self, name):
+        return _Collection(self, name)
+
+    def get_all(self, refs):
+        for ref in refs:
+            yield ref.get()
+
+    def seed_users(self, uids, expired_ratio=0.0, seed=0):
+        """Store a token document for every uid in ``uids``.
+
+        ``expired_ratio`` of the users get an already expired access token so
+        the refresh path is exercised as well.
+        """
+        rng = random.Random(seed)
+        now = int(time.time())
+        users = self._docs("users")
+        for uid in uids:
+            expired = rng.random() < expired_ratio
+            users[uid] = {
+                "access_token": TOKEN_PREFIX + uid,
+                "refresh_token": "refresh-" + uid,
+                "token_type": "Bearer",
+                "scope": "user-read-currently-playing user-read-recently-played",
+                "expires_in": 3600,
+                "expired_ts": now - 1 if expired else now + 3600,
+            }
+
+
+def make_cover(index, size=300):
+    """Return JPEG bytes for a deterministic, non-trivial cover image."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(index)
+    img = Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(24):
+        x0, y0 = rng.randrange(size), rng.randrange(size)
+        x1, y1 = x0 + rng.randrange(size // 2), y0 + rng.randrange(size // 2)
+        fill = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle([x0, y0, x1, y1], fill=fill)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+TITLES = [
+    "Bohemian Rhapsody - Remastered 2011",
+    "Blinding Lights",
+    "Shape of You",
+    "Hotel California - 2013 Remaster",
+    "Smells Like Teen Spirit",
+    "Billie Jean",
+    "Rolling in the Deep",
+    "Come Together - Remastered 2009",
+    "bad guy",
+    "Levitating (feat. DaBaby)",
+    "Mr. Brightside",
+    "Wonderwall - Remastered",
+    "Uptown Funk (feat. Bruno Mars)",
+    "Dancing Queen",
+    "Lose Yourself",
+    "Fuck You",
+]
+
+ARTISTS = [
+    "Queen",
+    "The Weeknd",
+    "Ed Sheeran",
+    "Eagles",
+    "Nirvana",
+    "Michael Jackson",
+    "Adele",
+    "The Beatles",
+    "Billie Eilish",
+    "Dua Lipa",
+    "The Killers",
+    "Oasis",
+    "Mark Ronson",
+    "ABBA",
+    "Eminem",
+    "CeeLo Green",
+]
+
+
+class FakeSpotify:
+    """Threaded HTTP server imitating the Spotify Web API and image CDN.
+
+    ``playing_ratio`` is the share of users that are currently playing,
+    ``episode_ratio`` the share of those that listen to a podcast episode.
+    ``num_covers`` bounds the number of distinct album covers, which controls
+    how well the image cache can do.
+    """
+
+    def __init__(
+        self,
+        latency_ms=0.0,
+        jitter_ms=0.0,
+        cdn_latency_ms=0.0,
+        error_rate=0.0,
+        playing_ratio=0.6,
+        episode_ratio=0.05,
+        num_covers=50,
+        seed=0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.cdn_latency_ms = cdn_latency_ms
+        self.error_rate = error_rate
+        self.playing_ratio = playing_ratio
+        self.episode_ratio = episode_ratio
+        self.num_covers = num_covers
+        self.seed = seed
+        self.calls = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._covers = {}
+        self._server = None
+        self._thread = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                fake._dispatch(self, "GET")
+
+            def do_POST(self):
+                fake._dispatch(self, "POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def spotify_urls(self):
+        """Return the ``util.spotify`` module constants pointing at this server."""
+        base = self.base_url
+        return {
+            "SPOTIFY_URL_REFRESH_TOKEN": f"{base}/api/token",
+            "SPOTIFY_URL_GENERATE_TOKEN": f"{base}/api/token",
+            "SPOTIFY_URL_NOW_PLAYING": f"{base}/v1/me/player/currently-playing?additional_types=track,episode",
+            "SPOTIFY_URL_RECENTLY_PLAY": f"{base}/v1/me/player/recently-played?limit=10",
+            "SPOTIFY_URL_USER_INFO": f"{base}/v1/me",
+        }
+
+    # -- data --------------------------------------------------------------
+
+    def cover_url(self, index):
+        return f"{self.base_url}/covers/{index % self.num_covers}.jpg"
+
+    def _images(self, index):
+        url = self.cover_url(index)
+        return [
+            {"url": url + "?s=640", "width": 640, "height": 640},
+            {"url": url, "width": 300, "height": 300},
+            {"url": url + "?s=64", "width": 64, "height": 64},
+        ]
+
+    def track(self, index):
+        h = index * 2654435761 & 0xFFFFFFFF
+        return {
+            "id": f"track{index}",
+            "name": TITLES[h % len(TITLES)],
+            "uri": f"spotify:track:track{index}",
+            "duration_ms": 120000 + h % 240000,
+            "artists": [{"name": ARTISTS[(h >> 8) % len(ARTISTS)]}],
+            "album": {
+                "id": f"album{index % self.num_covers}",
+                "name": f"Album {index % self.num_covers}",
+                "images": self._images(index),
+            },
+        }
+
+    def episode(self, index):
+        return {
+            "id": f"episode{index}",
+            "name": f"Episode {index}",
+            "uri": f"spotify:episode:episode{index}",
+            "duration_ms": 1800000,
+            "show": {"name": "Bench Show", "publisher": "Bench Podcast"},
+            "images": self._images(index),
+        }
+
+    def now_playing(self, uid):
+        h = _stable_hash(uid)
+        if (h % 1000) / 1000.0 >= self.playing_ratio:
+            return None
+        index = h // 1000
+        if ((h >> 4) % 1000) / 1000.0 < self.episode_ratio:
+            item = self.episode(index)
+            playing_type = "episode"
+        else:
+            item = self.track(index)
+            playing_type = "track"
+        progress = int(time.time() * 1000) % item["duration_ms"]
+        return {
+            "is_playing": True,
+            "progress_ms": progress,
+            "currently_playing_type": playing_type,
+            "item": item,
+        }
+
+    def recently_played(self, uid):
+        h = _stable_hash(uid)
+        return {"items": [{"track": self.track(h + i)} for i in range(10)]}
+
+    def cover(self, index):
+        index = index % self.num_covers
+        with self._lock:
+            content = self._covers.get(index)
+        if content is None:
+            content = make_cover(index)
+            with self._lock:
+                self._covers[index] = content
+        return content
+
+    # -- request handling --------------------------------------------------
+
+    def _count(self, key):
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def _delay(self, base_ms):
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self._rng.random() < self.error_rate
+        if base_ms or jitter:
+            time.sleep((base_ms + jitter) / 1000.0)
+        return fail
+
+    def _dispatch(self, handler, method):
+        url = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+
+        if url.path.startswith("/covers/"):
+            self._count("cover")
+            fail = self._delay(self.cdn_latency_ms)
+            if fail:
+                return self._send(handler, 503, b"unavailable", "text/plain")
+            index = int(url.path.rsplit("/", 1)[1].split(".")[0])
+            return self._send(handler, 200, self.cover(index), "image/jpeg")
+
+        key = url.path.rsplit("/", 1)[1]
+        self._count(key)
+        if self._delay(self.latency_ms):
+            return self._json(handler, 503, {"error": {"status": 503, "message": "Service unavailable"}})
+
+        if url.path == "/api/token" and method == "POST":
+            form = parse_qs(body.decode("ascii"))
+            refresh = form.get("refresh_token", ["refresh-unknown"])[0]
+            uid = refresh[len("refresh-") :]
+            return self._json(
+                handler,
+                200,
+                {"access_token": TOKEN_PREFIX + uid, "token_type": "Bearer", "expires_in": 3600},
+            )
+
+        auth = handler.headers.get("Authorization", "")
+        uid = uid_from_token(auth[len("Bearer ") :])
+        if uid is None:
+            return self._json(handler, 401, {"error": {"status": 401, "message": "Invalid access token"}})
+
+        if url.path == "/v1/me/player/currently-playing":
+            data = self.now_playing(uid)
+            if data is None:
+                return self._send(handler, 204, b"", None)
+            return self._json(handler, 200, data)
+        if url.path == "/v1/me/player/recently-played":
+            return self._json(handler, 200, self.recently_played(uid))
+        if url.path == "/v1/me":
+            return self._json(handler, 200, {"id": uid})
+
+        return self._json(handler, 404, {"error": {"status": 404, "message": "Not found"}})
+
+    def _json(self, handler, status, data):
+        self._send(handler, status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _send(self, handler, status, body, content_type):
+        handler.send_response(status)
+        if content_type:
+            handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        if body:
+            handler.wfile.write(body)
+
+
+class FakeRedis:
+    """Single-database Redis-protocol server backed by a dict."""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    args = fake._read_command(self.rfile)
+                    if args is None:
+                        return
+                    self.wfile.write(fake._execute(args))
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    @staticmethod
+    def _read_command(rfile):
+        line = rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(rfile.readline()[1:-2])
+            args.append(rfile.read(length + 2)[:-2])
+        return args
+
+    @staticmethod
+    def _bulk(value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def _execute(self, args):
+        command = args[0].upper()
+        with self._lock:
+            self.commands += 1
+            if command == b"PING":
+                return b"+PONG\r\n"
+            if command in (b"SELECT", b"AUTH"):
+                return b"+OK\r\n"
+            if command == b"GET":
+                return self._bulk(self._live(args[1]))
+            if command == b"SET":
+                expires_at = None
+                if len(args) >= 5 and args[3].upper() == b"PX":
+                    expires_at = time.time() + int(args[4]) / 1000.0
+                self.data[args[1]] = (args[2], expires_at)
+                return b"+OK\r\n"
+            if command == b"DEL":
+                removed = sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+                return b":%d\r\n" % removed
+            if command == b"SCAN":
+                pattern = b"*"
+                if b"MATCH" in [a.upper() for a in args]:
+                    pattern = args[[a.upper() for a in args].index(b"MATCH") + 1]
+                keys = [
+                    k for k in list(self.data)
+                    if fnmatch.fnmatchcase(k.decode("utf-8", "replace"), pattern.decode())
+                    and self._live(k) is not None
+                ]
+                return b"*2\r\n$1\r\n0\r\n*%d\r\n%s" % (
+                    len(keys),
+                    b"".join(self._bulk(k) for k in keys),
+                )
+            if command == b"FLUSHDB":
+                self.data.clear()
+                return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+
+def install(view_module, spotify_urls, firestore):
+    """Point an imported view module at the stand-ins.
+
+    ``spotify_urls`` is the dict returned by ``FakeSpotify.spotify_urls()``;
+    passing the dict rather than the server lets worker processes install the
+    fakes while the server itself runs in the parent.
+    """
+    from util import spotify
+
+    for name, value in spotify_urls.items():
+        setattr(spotify, name, value)
+    view_module.db = firestore
@@ -0,0 +1,140 @@
+"""Import-time profile of the application modules.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter and
+summarises the output: total import time, the slowest imports near the top
+of the tree by cumulative time, and the wall-clock cold import time over
+several runs.
+
+    python -m bench.importtime                     # api.view
+    python -m bench.importtime --module api.app --output importtime.json
+
+``TESTING=true`` is set so no Firebase credentials are needed. Pass a
+previous result as ``--baseline`` to compare against it.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench import report
+
+COMPARED_METRICS = {
+    "cold_import_ms.median": "lower",
+    "importtime_total_ms": "lower",
+}
+
+
+def _env():
+    env = dict(os.environ)
+    env["TESTING"] = "true"
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def parse_importtime(stderr):
+    """Return ``[(module, depth, self_us, cumulative_us)]`` from ``-X importtime``."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        # Nested imports are indented two spaces per level below their parent.
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=_env(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return parse_importtime(proc.stderr)
+
+
+def cold_import_ms(module, runs):
+    code = (
+        "import time; s = time.perf_counter(); "
+        f"import {module}; "
+        "print((time.perf_counter() - s) * 1000)"
+    )
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            cwd=ROOT,
+            env=_env(),
+            check=True,
+        )
+        samples.append(float(proc.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def run(module, runs=5, top=15, depth=2):
+    rows = profile(module)
+    samples = cold_import_ms(module, runs)
+    # The slowest imports close to the top are the ones worth deferring.
+    candidates = [
+        row for row in rows if row[0] != module and row[1] <= depth
+    ]
+    candidates.sort(key=lambda row: row[3], reverse=True)
+    return {
+        "module": module,
+        "environment": report.environment(),
+        "importtime_total_ms": round(sum(row[3] for row in rows if row[1] == 0) / 1000.0, 2),
+        "cold_import_ms": {
+            "median": round(statistics.median(samples), 2),
+            "min": round(min(samples), 2),
+            "runs": runs,
+        },
+        "slowest": [
+            {
+                "module": name,
+                "depth": level,
+                "cumulative_ms": round(cum / 1000.0, 2),
+                "self_ms": round(own / 1000.0, 2),
+            }
+            for name, level, own, cum in candidates[:top]
+        ],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="api.view")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--depth", type=int, default=2, help="nesting depth of reported imports")
+    parser.add_argument("--output", default="-", help="result file, '-' for stdout")
+    parser.add_argument("--baseline", help="previous result file to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    result = run(args.module, runs=args.runs, top=args.top, depth=args.depth)
+    report.write_json(args.output, result)
+
+    if args.baseline:
+        rows = report.compare(result, report.read_json(args.baseline), COMPARED_METRICS)
+        report.print_comparison(rows, args.threshold)
+        if any(worse > args.threshold for *_, worse in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""End-to-end load driver for the view endpoint.
+
+Replays a realistic mix of badge requests against ``api.view.catch_all`` in
+one or more worker processes. Spotify, the image CDN and Firestore are
+replaced by the local stand-ins from ``bench.fakes``, so results depend only
+on this code base and the configured latencies.
+
+    python -m bench.load --requests 2000 --workers 2 --concurrency 8 \\
+        --latency-ms 40 --output bench_load.json --baseline old.json
+
+The output is JSON; pass a previous run as ``--baseline`` to print a
+comparison and fail when p95 latency or throughput regresses by more than
+``--threshold`` percent.
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench import fakes, report
+
+# Rough share of themes seen in real embeds.
+THEME_WEIGHTS = {
+    "default": 45,
+    "compact": 15,
+    "natemoo-re": 12,
+    "novatorem": 12,
+    "spotify-embed": 6,
+    "apple": 5,
+    "karaoke": 5,
+}
+
+COMPARED_METRICS = {
+    "throughput_rps": "higher",
+    "latency_ms.p50": "lower",
+    "latency_ms.p95": "lower",
+    "latency_ms.p99": "lower",
+    "max_rss_kb": "lower",
+}
+
+
+def user_ids(num_users):
+    return [f"user{i:05d}" for i in range(num_users)]
+
+
+def build_workload(num_requests, num_users, seed=0, zipf_s=1.1, unknown_ratio=0.02):
+    """Return a list of request paths.
+
+    Users are drawn from a Zipf distribution (a few profiles get most of the
+    traffic), themes from ``THEME_WEIGHTS`` and the remaining query options
+    from fixed probabilities. ``unknown_ratio`` of the requests use a uid
+    that is not registered.
+    """
+    rng = random.Random(seed)
+    users = user_ids(num_users)
+    user_weights = [1.0 / (rank + 1) ** zipf_s for rank in range(num_users)]
+    themes = list(THEME_WEIGHTS)
+    theme_weights = list(THEME_WEIGHTS.values())
+
+    paths = []
+    for _ in range(num_requests):
+        if rng.random() < unknown_ratio:
+            uid = f"unknown{rng.randrange(num_users)}"
+        else:
+            uid = rng.choices(users, user_weights)[0]
+        params = [f"uid={uid}", f"theme={rng.choices(themes, theme_weights)[0]}"]
+        if rng.random() < 0.10:
+            params.append("cover_image=false")
+        if rng.random() < 0.10:
+            params.append("bar_color_cover=true")
+        if rng.random() < 0.20:
+            params.append("show_offline=true")
+        if rng.random() < 0.05:
+            params.append("profanity=true")
+        if rng.random() < 0.05:
+            params.append("hide_remaster=true")
+        if rng.random() < 0.10:
+            params.append("mode=dark")
+        paths.append("/?" + "&".join(params))
+    return paths
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _run_worker(worker_id, paths, config, spotify_urls, barrier, results):
+    os.environ["TESTING"] = "true"
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        import api.view as view
+
+        firestore = fakes.InMemoryFirestore(latency_ms=config["firestore_latency_ms"])
+        firestore.seed_users(
+            user_ids(config["users"]),
+            expired_ratio=config["expired_ratio"],
+            seed=config["seed"],
+        )
+        fakes.install(view, spotify_urls, firestore)
+        view.app.config.update({"TESTING": True})
+
+        rss_start = _rss_kb()
+        local = threading.local()
+
+        def hit(path):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = view.app.test_client()
+            start = time.perf_counter()
+            try:
+                status = client.get(path).status_code
+            except Exception:
+                status = 599
+            return (time.perf_counter() - start) * 1000.0, status
+
+        barrier.wait()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config["concurrency"]) as pool:
+            samples = list(pool.map(hit, paths))
+        elapsed = time.perf_counter() - start
+
+    results.put(
+        {
+            "worker": worker_id,
+            "requests": len(samples),
+            "errors": sum(1 for _, status in samples if status >= 500),
+            "duration_s": round(elapsed, 4),
+            "latencies_ms": [latency for latency, _ in samples],
+            "rss_start_kb": rss_start,
+            "rss_end_kb": _rss_kb(),
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "firestore_reads": firestore.reads,
+            "firestore_writes": firestore.writes,
+        }
+    )
+
+
+def run(config):
+    paths = build_workload(
+        config["requests"],
+        config["users"],
+        seed=config["seed"],
+        zipf_s=config["zipf_s"],
+        unknown_ratio=config["unknown_ratio"],
+    )
+    shards = [paths[i :: config["workers"]] for i in range(config["workers"])]
+
+    fake = fakes.FakeSpotify(
+        latency_ms=config["latency_ms"],
+        jitter_ms=config["jitter_ms"],
+        cdn_latency_ms=config["cdn_latency_ms"],
+        error_rate=config["error_rate"],
+        playing_ratio=config["playing_ratio"],
+        num_covers=config["covers"],
+        seed=config["seed"],
+    )
+    ctx = multiprocessing.get_context("spawn")
+    with fake:
+        barrier = ctx.Barrier(config["workers"] + 1)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(
+                target=_run_worker,
+                args=(i, shard, config, fake.spotify_urls(), barrier, results),
+            )
+            for i, shard in enumerate(shards)
+        ]
+        for proc in procs:
+            proc.start()
+        barrier.wait()
+        start = time.perf_counter()
+        workers = [results.get() for _ in procs]
+        wall = time.perf_counter() - start
+        for proc in procs:
+            proc.join()
+        upstream_calls = dict(fake.calls)
+
+    latencies = [value for w in workers for value in w.pop("latencies_ms")]
+    workers.sort(key=lambda w: w["worker"])
+    total = sum(w["requests"] for w in workers)
+    return {
+        "config": config,
+        "environment": report.environment(),
+        "requests": total,
+        "errors": sum(w["errors"] for w in workers),
+        "duration_s": round(wall, 4),
+        "throughput_rps": round(total / wall, 2) if wall else 0.0,
+        "latency_ms": report.latency_summary(latencies),
+        "max_rss_kb": max(w["max_rss_kb"] for w in workers),
+        "upstream_calls": upstream_calls,
+        "workers": workers,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4, help="threads per worker")
+    parser.add_argument("--covers", type=int, default=50, help="distinct album covers")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Spotify API latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--cdn-latency-ms", type=float, default=10.0)
+    parser.add_argument("--firestore-latency-ms", type=float, default=15.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--playing-ratio", type=float, default=0.6)
+    parser.add_argument("--expired-ratio", type=float, default=0.05)
+    parser.add_argument("--unknown-ratio", type=float, default=0.02)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="result file, '-' for stdout")
+    parser.add_argument("--baseline", help="previous result file to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "baseline", "threshold")
+    }
+    result = run(config)
+    report.write_json(args.output, result)
+
+    if args.baseline:
+        rows = report.compare(result, report.read_json(args.baseline), COMPARED_METRICS)
+        report.print_comparison(rows, args.threshold)
+        if any(worse > args.threshold for *_, worse in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Idle memory of the split (three services) vs unified deployment.
+
+Starts each layout with real gunicorn processes, sends one request to every
+endpoint so the request path is initialised, and then sums RSS and PSS over
+all masters and workers. PSS divides shared pages between the processes
+sharing them, so it is the number that shows copy-on-write sharing.
+
+    python -m bench.memory --workers 4 --output memory.json
+
+Linux only (reads /proc). Runs with ``TESTING=true`` so no Firebase
+credentials are needed.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench import report
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def layouts(workers):
+    """Return ``{layout: [(argv, env, paths_to_request)]}``."""
+    split = []
+    for module, num_workers, paths in (
+        ("view", workers, ["/"]),
+        ("login", 1, ["/"]),
+        ("callback", 1, ["/"]),
+    ):
+        port = _free_port()
+        argv = ["gunicorn", "-w", str(num_workers), "-b", f"127.0.0.1:{port}", "--chdir", "api", f"{module}:app"]
+        split.append((argv, {}, [f"http://127.0.0.1:{port}{path}" for path in paths]))
+
+    port = _free_port()
+    unified = [
+        (
+            ["gunicorn", "-c", "api/gunicorn.conf.py", "--chdir", "api", "app:app"],
+            {"BIND": f"127.0.0.1:{port}", "WEB_CONCURRENCY": str(workers)},
+            [f"http://127.0.0.1:{port}{path}" for path in ("/api/view", "/api/login", "/api/callback")],
+        )
+    ]
+    return {"split": split, "unified": unified}
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _memory_kb(pid):
+    values = {"rss_kb": 0, "pss_kb": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    values["rss_kb"] = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    values["pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return values
+
+
+def _request(url, timeout):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            opener = urllib.request.build_opener(NoRedirect)
+            opener.open(url, timeout=2).read()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def measure(services, expected_workers, settle_s=1.0, timeout=30.0):
+    procs = []
+    env_base = dict(os.environ, TESTING="true", PYTHONUNBUFFERED="1")
+    try:
+        for argv, env, _ in services:
+            procs.append(
+                subprocess.Popen(
+                    argv,
+                    cwd=ROOT,
+                    env=dict(env_base, **env),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            )
+        for _, _, urls in services:
+            for url in urls:
+                _request(url, timeout)
+
+        deadline = time.time() + timeout
+        while sum(len(_children(p.pid)) for p in procs) < expected_workers:
+            if time.time() > deadline:
+                raise RuntimeError("workers did not start")
+            time.sleep(0.2)
+        time.sleep(settle_s)
+
+        processes = []
+        for proc in procs:
+            for pid in [proc.pid] + _children(proc.pid):
+                processes.append(dict(pid=pid, master=pid == proc.pid, **_memory_kb(pid)))
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=timeout)
+
+    return {
+        "processes": len(processes),
+        "rss_kb": sum(p["rss_kb"] for p in processes),
+        "pss_kb": sum(p["pss_kb"] for p in processes),
+        "detail": processes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4, help="view / unified worker count")
+    parser.add_argument("--output", default="-", help="result file, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    result = {"environment": report.environment(), "workers": args.workers}
+    for name, services in layouts(args.workers).items():
+        expected = args.workers + 2 if name == "split" else args.workers
+        result[name] = measure(services, expected)
+        print(
+            f"{name:<8} processes={result[name]['processes']:>2} "
+            f"rss={result[name]['rss_kb'] / 1024:8.1f} MiB "
+            f"pss={result[name]['pss_kb'] / 1024:8.1f} MiB",
+            file=sys.stderr,
+        )
+    report.write_json(args.output, result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
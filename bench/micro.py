@@ -0,0 +1,280 @@
+"""Micro-benchmarks for the pure functions on the render path.
+
+Each benchmark is registered with ``@benchmark(name)`` and returns the
+zero-argument callable to time; whatever happens before the ``return`` is
+setup and is not measured. Timing uses ``timeit`` with a calibrated number of
+loops, repeated ``--rounds`` times, and the median per-call time is what gets
+compared.
+
+    python -m bench.micro --save                  # write bench/baselines/micro.json
+    python -m bench.micro --threshold 15          # fail on >15% slowdown
+    python -m bench.micro -k make_svg --output -  # subset, JSON to stdout
+
+Baselines are machine specific, so record them on the machine that runs the
+comparison.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench import fakes, report
+
+DEFAULT_BASELINE = os.path.join(ROOT, "bench", "baselines", "micro.json")
+
+THEMES = [
+    "default",
+    "compact",
+    "natemoo-re",
+    "novatorem",
+    "karaoke",
+    "spotify-embed",
+    "apple",
+]
+
+COVER_SIZES = [64, 300, 640]
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def _view():
+    os.environ.setdefault("TESTING", "true")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import api.view as view
+    return view
+
+
+def _make_svg_bench(theme, cached=False):
+    def setup():
+        from util import cache
+
+        view = _view()
+        # make_svg memoizes whole SVGs; without a cache every call renders.
+        view.CACHE_SVG = cache.get_cache("svg") if cached else cache.Cache("svg", ttl=0)
+        img_b64 = view.to_img_b64(fakes.make_cover(1))
+        ctx = view.app.app_context()
+        ctx.push()
+        view.make_svg(
+            "Queen", "Bohemian Rhapsody", img_b64, True, True, theme,
+            "53b14f", False, "121212", "light", "10", 61000, 354000,
+        )
+
+        def run():
+            view.make_svg(
+                "Queen", "Bohemian Rhapsody", img_b64, True, True, theme,
+                "53b14f", False, "121212", "light", "10", 61000, 354000,
+            )
+
+        return run
+
+    return setup
+
+
+for _theme in THEMES:
+    benchmark(f"make_svg[{_theme}]")(_make_svg_bench(_theme))
+
+benchmark("make_svg[default,cached]")(_make_svg_bench("default", cached=True))
+
+
+@benchmark("generate_css_bar")
+def _generate_css_bar():
+    # Bypass the lru_cache so the function body itself is measured.
+    generate = _view().generate_css_bar.__wrapped__
+    return lambda: generate(100)
+
+
+def _to_img_b64_bench(size):
+    def setup():
+        to_img_b64 = _view().to_img_b64
+        content = fakes.make_cover(7, size=size)
+        return lambda: to_img_b64(content)
+
+    return setup
+
+
+for _size in COVER_SIZES:
+    benchmark(f"to_img_b64[{_size}px]")(_to_img_b64_bench(_size))
+
+
+@benchmark("colorgram+isLightOrDark")
+def _colorgram():
+    import colorgram
+    from PIL import Image
+
+    is_light_or_dark = _view().isLightOrDark
+    content = fakes.make_cover(3)
+
+    def run():
+        colors = colorgram.extract(Image.open(io.BytesIO(content)), 5)
+        for color in colors:
+            rgb = color.rgb
+            is_light_or_dark([rgb.r, rgb.g, rgb.b], threshold=80)
+
+    return run
+
+
+def track_titles():
+    path = os.path.join(ROOT, "bench", "corpus", "track_titles.txt")
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+@benchmark("profanity_check")
+def _profanity_check():
+    from util.profanity import profanity_check
+
+    corpus = track_titles()
+
+    def run():
+        for name in corpus:
+            profanity_check(name)
+
+    return run
+
+
+@benchmark("profanity_check[uncached]")
+def _profanity_censor():
+    from util.profanity import censor
+
+    corpus = track_titles()
+
+    def run():
+        for name in corpus:
+            censor(name)
+
+    return run
+
+
+@benchmark("remove_remaster")
+def _remove_remaster():
+    from util.remaster import remove_remaster
+
+    corpus = fakes.TITLES
+
+    def run():
+        for name in corpus:
+            remove_remaster(name)
+
+    return run
+
+
+@benchmark("calculate_progress_data")
+def _calculate_progress_data():
+    calculate_progress_data = _view().calculate_progress_data
+    return lambda: calculate_progress_data(61000, 354000)
+
+
+@benchmark("encode_html_entities")
+def _encode_html_entities():
+    encode_html_entities = _view().encode_html_entities
+    return lambda: encode_html_entities("Simon & Garfunkel <Live> \"Bookends\"")
+
+
+def measure(func, rounds=5, min_time=0.2):
+    """Return per-call timings in microseconds for ``func``."""
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    # autorange targets 0.2s; scale to the requested minimum round time.
+    loops = max(1, int(loops * min_time / 0.2))
+    samples = [t / loops * 1e6 for t in timer.repeat(repeat=rounds, number=loops)]
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "min_us": round(min(samples), 3),
+        "mean_us": round(statistics.fmean(samples), 3),
+        "stdev_us": round(statistics.pstdev(samples), 3),
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def run(selected, rounds=5, min_time=0.2):
+    results = {}
+    for name in selected:
+        func = BENCHMARKS[name]()
+        results[name] = measure(func, rounds=rounds, min_time=min_time)
+        print(f"{name:<28} {results[name]['median_us']:>12.3f} us", file=sys.stderr)
+    return {"environment": report.environment(), "benchmarks": results}
+
+
+def check_regressions(current, baseline, threshold_pct):
+    """Return ``(name, baseline_us, current_us, change_pct)`` for every
+    benchmark that slowed down by more than ``threshold_pct`` percent."""
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base or not base["median_us"]:
+            continue
+        change = (result["median_us"] - base["median_us"]) / base["median_us"] * 100.0
+        if change > threshold_pct:
+            regressions.append((name, base["median_us"], result["median_us"], round(change, 2)))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-k", dest="keyword", help="only run benchmarks containing this text")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--output", help="result file, '-' for stdout")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCH_THRESHOLD", "20")),
+        help="allowed slowdown in percent (env BENCH_THRESHOLD)",
+    )
+    parser.add_argument("--list", action="store_true", help="list benchmark names")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name for name in BENCHMARKS if not args.keyword or args.keyword in name]
+
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    result = run(names, rounds=args.rounds, min_time=args.min_time)
+    if args.output:
+        report.write_json(args.output, result)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        report.write_json(args.baseline, result)
+        print(f"baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save first", file=sys.stderr)
+        return 0
+
+    regressions = check_regressions(result, report.read_json(args.baseline), args.threshold)
+    for name, base, cur, change in regressions:
+        print(
+            f"REGRESSION {name}: {base:.3f} us -> {cur:.3f} us (+{change:.1f}%)",
+            file=sys.stderr,
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
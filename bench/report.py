@@ -0,0 +1,107 @@
+"""Helpers for writing benchmark results and comparing them to a baseline."""
+
+import json
+import platform
+import subprocess
+import sys
+import time
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile of ``values`` using linear interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return float(ordered[0])
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(latencies_ms):
+    if not latencies_ms:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": round(percentile(latencies_ms, 50), 3),
+        "p95": round(percentile(latencies_ms, 95), 3),
+        "p99": round(percentile(latencies_ms, 99), 3),
+        "mean": round(sum(latencies_ms) / len(latencies_ms), 3),
+        "max": round(max(latencies_ms), 3),
+    }
+
+
+def git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "revision": git_revision(),
+        "timestamp": int(time.time()),
+    }
+
+
+def write_json(path, data):
+    if path == "-":
+        json.dump(data, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+        return
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current, baseline, metrics):
+    """Compare flat metrics between two result dicts.
+
+    ``metrics`` maps a dotted path (``"latency_ms.p95"``) to ``"lower"`` or
+    ``"higher"``, whichever direction is better. Returns a list of rows
+    ``(metric, baseline, current, change_pct, worse_pct)``, where
+    ``worse_pct`` is the change in the bad direction: positive when the
+    metric got worse, negative when it improved.
+    """
+    rows = []
+    for path, better in metrics.items():
+        base = _lookup(baseline, path)
+        cur = _lookup(current, path)
+        if base is None or cur is None:
+            continue
+        change = ((cur - base) / base * 100.0) if base else 0.0
+        worse = change if better == "lower" else -change
+        rows.append((path, base, cur, round(change, 2), worse))
+    return rows
+
+
+def print_comparison(rows, threshold_pct=None):
+    print(f"{'metric':<28} {'baseline':>12} {'current':>12} {'change':>9}")
+    for path, base, cur, change, worse in rows:
+        flag = ""
+        if threshold_pct is not None and worse > threshold_pct:
+            flag = "  REGRESSION"
+        print(f"{path:<28} {base:>12.3f} {cur:>12.3f} {change:>8.2f}%{flag}")
+
+
+def _lookup(data, path):
+    for key in path.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
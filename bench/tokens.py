@@ -0,0 +1,80 @@
+"""Memory per cached user: full Firestore dict vs TokenInfo.
+
+Fills a dict keyed by uid the way CACHE_TOKEN_INFO is filled, once with the
+documents ``callback.py`` stores and once with TokenInfo records, and reports
+the traced allocation per entry (keys, values and the mapping itself).
+
+    python -m bench.tokens --entries 1000000 --output tokens.json
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench import report
+from util.tokens import TokenInfo
+
+
+def firestore_document(i):
+    # Shape of the Spotify authorization_code response saved at login. Values
+    # decoded from Firestore are separate objects per document, so the
+    # constant strings are built per call rather than shared literals.
+    return {
+        "access_token": f"BQ{i:0>190}",
+        "token_type": b"Bearer".decode(),
+        "expires_in": 3600,
+        "refresh_token": f"AQ{i:0>129}",
+        "scope": b"user-read-recently-played user-read-currently-playing".decode(),
+        "expired_ts": 1700000000 + i,
+    }
+
+
+def measure(entries, make_value):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        cache = {}
+        for i in range(entries):
+            cache[f"user{i}"] = make_value(firestore_document(i))
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del cache
+    return current
+
+
+def run(entries):
+    result = {"environment": report.environment(), "entries": entries}
+    for name, make_value in (("dict", dict), ("token_info", TokenInfo.from_dict)):
+        total = measure(entries, make_value)
+        result[name] = {"total_mib": round(total / 2**20, 1), "bytes_per_entry": round(total / entries, 1)}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--output", default="-", help="result file, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    result = run(args.entries)
+    for name in ("dict", "token_info"):
+        print(
+            f"{name:<11} {result[name]['bytes_per_entry']:8.1f} B/entry "
+            f"{result[name]['total_mib']:8.1f} MiB",
+            file=sys.stderr,
+        )
+    report.write_json(args.output, result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
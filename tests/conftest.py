@@ -0,0 +1,55 @@
+import contextlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Start every test with empty application caches."""
+    from util.cache import clear_all
+
+    clear_all()
+    yield
+    clear_all()
+
+
+@pytest.fixture(autouse=True)
+def login_stamp(tmp_path, monkeypatch):
+    """Give every test its own login stamp instead of the host-wide one."""
+    from util import stamp
+
+    logins = stamp.Stamp(str(tmp_path / "logins.stamp"))
+    monkeypatch.setattr(stamp, "logins", logins)
+    return logins
+
+
+@pytest.fixture
+def fake_spotify(monkeypatch):
+    """Serve a view module against the local Spotify and Firestore stand-ins.
+
+    ``fake_spotify(view_module, uids, **options)`` seeds ``uids``, starts a
+    ``bench.fakes.FakeSpotify(**options)`` and returns it, with the Firestore
+    stand-in as its ``firestore`` attribute. api.view and the ``view`` module
+    imported by the other handlers are distinct modules, so the caller passes
+    the one whose ``db`` is replaced.
+    """
+    from bench import fakes
+    from util import spotify
+
+    with contextlib.ExitStack() as stack:
+
+        def start(view_module, uids, **options):
+            firestore = fakes.InMemoryFirestore()
+            firestore.seed_users(uids)
+            server = stack.enter_context(fakes.FakeSpotify(**options))
+            for name, value in server.spotify_urls().items():
+                monkeypatch.setattr(spotify, name, value)
+            monkeypatch.setattr(view_module, "db", firestore)
+            server.firestore = firestore
+            return server
+
+        yield start
@@ -0,0 +1,125 @@
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add the parent directory to the path to import the api module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def app_module():
+    from api import app as app_module
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    """Create a test client for the unified application."""
+    app = app_module.create_app()
+    app.config.update({"TESTING": True})
+
+    with app.test_client() as client:
+        yield client
+
+
+def test_index_redirects_to_login(client):
+    response = client.get('/')
+
+    assert response.status_code == 302
+    assert response.headers['Location'] == '/api/login'
+
+
+@pytest.mark.parametrize("path,handler", [
+    ('/api/login', 'login_handler'),
+    ('/api/callback', 'callback_handler'),
+    ('/api/view', 'view_handler'),
+    ('/api/view.svg', 'view_svg_handler'),
+    ('/api/view/extra/path', 'view_handler'),
+    ('/api/batch', 'batch_handler'),
+    ('/api/now', 'now_handler'),
+    ('/api/stream', 'stream_handler'),
+    ('/api/cover/' + 'ab' * 20, 'cover_handler'),
+])
+def test_routes_dispatch_to_handlers(app_module, client, path, handler):
+    """Every legacy service is reachable from the single app."""
+    with patch.object(app_module, handler, return_value='ok') as mock_handler:
+        response = client.get(path)
+
+    assert response.status_code == 200
+    mock_handler.assert_called_once()
+
+
+def test_handlers_share_firestore_client(app_module):
+    """callback and view use the same process-wide Firestore client."""
+    from util.firestore import get_firestore_db
+
+    callback_db = app_module.callback_module.db
+    view_db = app_module.view_module.db
+
+    assert callback_db.collection is view_db.collection
+    assert callback_db.collection is get_firestore_db().collection
+
+
+def test_firestore_client_created_once_under_concurrency(monkeypatch):
+    """Threads racing to the first request share a single Firestore client."""
+    import threading
+    import time
+    from util import firestore
+
+    created = []
+
+    def slow_create():
+        time.sleep(0.01)
+        client = MagicMock()
+        created.append(client)
+        return client
+
+    monkeypatch.setattr(firestore, "_db", None)
+    monkeypatch.setattr(firestore, "_create_client", slow_create)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(firestore.get_firestore_db())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(created) == 1
+    assert all(db is created[0] for db in results)
+
+
+def test_warm_up_compiles_templates(app_module):
+    app = app_module.create_app()
+    app_module.warm_up(app)
+
+    assert 'spotify.default.html.j2' in app.jinja_env.list_templates()
+
+
+def test_warm_up_builds_profanity_rules(app_module):
+    from util import profanity
+
+    profanity._matcher.cache_clear()
+    app_module.warm_up(app_module.create_app())
+
+    assert profanity._matcher.cache_info().currsize == 1
+
+
+def test_callback_clears_negative_cache(app_module, client, login_stamp):
+    """Test logging in again clears the view's negative and token caches."""
+    view_module = app_module.view_module
+    other_worker = type(login_stamp)(login_stamp.path)
+    view_module.CACHE_UNKNOWN_UID["new_user"] = "revoked"
+    view_module.CACHE_TOKEN_INFO["new_user"] = {"access_token": "old"}
+
+    profile = MagicMock(status_code=200, text='{"id": "new_user"}')
+    profile.json.return_value = {"id": "new_user"}
+    with patch('util.spotify.generate_token', return_value={"access_token": "a", "refresh_token": "r"}), \
+            patch('util.spotify.get_user_profile_raw', return_value=profile), \
+            patch.object(app_module.callback_module, 'db', MagicMock()):
+        response = client.get('/api/callback?code=abc')
+
+    assert response.status_code == 200
+    assert "new_user" not in view_module.CACHE_UNKNOWN_UID
+    assert "new_user" not in view_module.CACHE_TOKEN_INFO
+    assert other_worker.changed()
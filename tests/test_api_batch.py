@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path to import the api module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from api import batch
+
+
+@pytest.fixture
+def fake(fake_spotify):
+    """Serve the batch app against the local Spotify and Firestore stand-ins."""
+    return fake_spotify(batch.view, ["alice", "bob", "carol"], playing_ratio=1.0, episode_ratio=0.0, num_covers=1)
+
+
+@pytest.fixture
+def client():
+    batch.app.config.update({"TESTING": True})
+
+    with batch.app.test_client() as client:
+        yield client
+
+
+def test_batch_without_uids(client):
+    response = client.get('/')
+
+    assert response.status_code == 400
+
+
+def test_batch_too_many_uids(client, monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_MAX_UIDS", 2)
+
+    response = client.get('/?uids=a,b,c')
+
+    assert response.status_code == 400
+
+
+def test_batch_json_reads_firestore_once_and_dedupes_covers(client, fake):
+    """Token documents are batched and a cover shared by users is fetched once."""
+    response = client.get('/?uids=alice,bob,missing,alice&format=json')
+
+    assert response.status_code == 200
+    badges = response.get_json()["badges"]
+    assert [badge["uid"] for badge in badges] == ["alice", "bob", "missing"]
+    assert [badge["status"] for badge in badges] == ["ok", "ok", "invalid_token"]
+    assert badges[0]["svg"].startswith("<svg")
+    assert badges[2]["svg"] is None
+
+    assert fake.firestore.reads == 3
+    assert fake.calls["currently-playing"] == 2
+    assert fake.calls["cover"] == 1
+
+
+def test_batch_post_json_body(client, fake):
+    response = client.post(
+        '/?format=json', data=json.dumps({"uids": ["carol"]}), content_type="application/json"
+    )
+
+    assert [badge["status"] for badge in response.get_json()["badges"]] == ["ok"]
+
+
+def test_batch_grid(client, fake):
+    response = client.get('/?uids=alice,bob,carol&columns=2&cover_image=false')
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/svg+xml"
+    svg = response.data.decode("utf-8")
+    assert svg.count("<image ") == 3
+    # Two columns of 320px badges with a 10px gap, two rows of 145px
+    assert 'width="650" height="300"' in svg
+
+
+def test_make_grid_empty():
+    assert batch.make_grid([], 3) == (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="0" height="0" viewBox="0 0 0 0"></svg>'
+    )
+
+
+def test_batch_render_error_is_reported_per_uid(client, fake, monkeypatch):
+    """A badge that fails to render is an error entry, the others still render."""
+    render_badge = batch.view.render_badge
+    calls = []
+
+    def flaky_render_badge(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise ValueError("bad track")
+        return render_badge(*args, **kwargs)
+
+    monkeypatch.setattr(batch.view, "render_badge", flaky_render_badge)
+
+    response = client.get('/?uids=alice,bob,carol&format=json')
+
+    assert response.status_code == 200
+    badges = response.get_json()["badges"]
+    assert [badge["status"] for badge in badges] == ["ok", "error", "ok"]
+    assert badges[1]["svg"] is None
+    assert "is_now_playing" not in badges[1]
+
+    grid = client.get('/?uids=alice,bob,carol&cover_image=false')
+    assert grid.status_code == 200
+
+
+def test_batch_json_links_covers_without_fetching_them(client, fake, monkeypatch):
+    """JSON badges link Spotify covers from /api/cover, so none is downloaded."""
+    import re
+
+    monkeypatch.setattr(batch.view, "SPOTIFY_IMAGE_URL", re.compile(rf"^{re.escape(fake.base_url)}/covers/(\d+)\.jpg$"))
+
+    response = client.get('/?uids=alice,bob&format=json')
+
+    badges = response.get_json()["badges"]
+    assert [badge["status"] for badge in badges] == ["ok", "ok"]
+    assert all("/api/cover/0?size=" in badge["svg"] for badge in badges)
+    assert fake.calls.get("cover", 0) == 0
+
+    embedded = client.get('/?uids=alice&format=json&external_cover=false')
+    assert "/api/cover/" not in embedded.get_json()["badges"][0]["svg"]
+    assert fake.calls["cover"] == 1
@@ -0,0 +1,73 @@
+import io
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+# Add the parent directory to the path to import the api module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from api import cover
+
+COVER_ID = "ab67616d00001e02" + "0" * 24
+
+
+def jpeg(size):
+    out = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 30, 30)).save(out, "JPEG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def client():
+    cover.app.config.update({"TESTING": True})
+
+    with cover.app.test_client() as client:
+        yield client
+
+
+def test_cover_is_immutable_with_etag(client):
+    with patch.object(cover.view, "load_image", return_value=jpeg(300)) as mock_load_image:
+        response = client.get(f"/api/cover/{COVER_ID}")
+        again = client.get(f"/api/cover/{COVER_ID}", headers={"If-None-Match": response.headers["ETag"]})
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/jpeg"
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert Image.open(io.BytesIO(response.data)).size == (300, 300)
+    mock_load_image.assert_called_once_with("https://i.scdn.co/image/" + COVER_ID)
+
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_cover_is_scaled_down_to_size(client):
+    with patch.object(cover.view, "load_image", return_value=jpeg(300)):
+        response = client.get(f"/api/cover/{COVER_ID}?size=64")
+
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.data)).size == (64, 64)
+
+
+@pytest.mark.parametrize("path", [
+    "/api/cover/not-a-cover-id",
+    "/api/cover/" + "A" * 40,
+    f"/api/cover/{COVER_ID}?size=100",
+    f"/api/cover/{COVER_ID}?size=big",
+])
+def test_cover_rejects_invalid_requests(client, path):
+    with patch.object(cover.view, "load_image") as mock_load_image:
+        response = client.get(path)
+
+    assert response.status_code == 400
+    mock_load_image.assert_not_called()
+
+
+def test_cover_not_found(client):
+    with patch.object(cover.view, "load_image", return_value=None):
+        response = client.get(f"/api/cover/{COVER_ID}")
+
+    assert response.status_code == 404
+    assert "immutable" not in response.headers["Cache-Control"]
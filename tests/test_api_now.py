@@ -0,0 +1,133 @@
+import os
+import sys
+
+import pytest
+
+# Add the parent directory to the path to import the api module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from api import now
+
+
+@pytest.fixture
+def fake(fake_spotify):
+    """Serve the now app against the local Spotify and Firestore stand-ins."""
+    return fake_spotify(now.view, ["alice"], playing_ratio=1.0, episode_ratio=0.0)
+
+
+@pytest.fixture
+def client():
+    now.app.config.update({"TESTING": True})
+
+    with now.app.test_client() as client:
+        yield client
+
+
+def test_now_without_uid(client):
+    response = client.get('/')
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "missing_uid"}
+
+
+def test_now_unknown_uid(client, fake):
+    response = client.get('/?uid=missing')
+
+    assert response.status_code == 404
+    assert response.get_json()["error"] == "invalid_token"
+
+
+def test_now_playing_json_without_image_work(client, fake):
+    response = client.get('/?uid=alice')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["uid"] == "alice"
+    assert data["state"] == "playing"
+    assert data["type"] == "track"
+    assert data["title"] and data["artist"] and data["album"]
+    assert data["album_art_url"].startswith(fake.base_url)
+    assert 0 <= data["progress_ms"] <= data["duration_ms"]
+    assert response.headers["Access-Control-Allow-Origin"] == "*"
+    assert "cover" not in fake.calls
+
+
+def test_now_etag_returns_304_while_track_is_unchanged(client, fake):
+    first = client.get('/?uid=alice')
+    etag = first.headers["ETag"]
+
+    second = client.get('/?uid=alice', headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.data == b""
+    assert fake.calls["currently-playing"] == 1
+
+
+def test_etag_ignores_progress_but_not_seeks():
+    data = {"state": "playing", "title": "Song", "progress_ms": 10000}
+
+    assert now.get_etag(data, 100000) == now.get_etag(dict(data, progress_ms=15000), 105000)
+    assert now.get_etag(data, 100000) != now.get_etag(dict(data, progress_ms=60000), 105000)
+
+
+def test_track_data_offline():
+    assert now.get_track_data(None, False, None, None) == {"state": "offline"}
+
+
+def test_now_recently_played_is_stable_for_conditional_requests(client, fake_spotify):
+    """Offline users report their newest track, so a repeat poll gets a 304."""
+    fake_spotify(now.view, ["dave"], playing_ratio=0.0, num_covers=4)
+
+    first = client.get('/?uid=dave')
+    assert first.get_json()["state"] == "recently_played"
+    assert first.headers["ETag"].startswith('W/"')
+
+    for _ in range(5):
+        again = client.get('/?uid=dave', headers={"If-None-Match": first.headers["ETag"]})
+        assert again.status_code == 304
+
+
+def paused_song_info():
+    item = {
+        "name": "Song",
+        "artists": [{"name": "Artist"}],
+        "album": {"name": "Album", "images": []},
+        "duration_ms": 200000,
+        "currently_playing_type": "track",
+        "is_playing": False,
+    }
+    return item, True, 42000, 200000
+
+
+def test_track_data_paused():
+    data = now.get_track_data(*paused_song_info())
+
+    assert data["state"] == "paused"
+    assert data["progress_ms"] == 42000
+
+
+def test_etag_of_paused_track_holds_until_it_resumes():
+    data = now.get_track_data(*paused_song_info())
+
+    assert now.get_etag(data, 100000) == now.get_etag(data, 161600)
+    assert now.get_etag(data, 100000) != now.get_etag(dict(data, progress_ms=50000), 100000)
+    assert now.get_etag(data, 100000) != now.get_etag(dict(data, state="playing"), 100000)
+
+
+def test_etag_of_playing_track_tolerates_latency():
+    data = {"state": "playing", "title": "Song", "progress_ms": 10000}
+
+    # Playback started at 90.4 s, then seen as 90.6 s by a slower response
+    assert now.get_etag(data, 100400) == now.get_etag(dict(data, progress_ms=14800), 105400)
+
+
+def test_now_paused_user_gets_304(client, monkeypatch):
+    monkeypatch.setattr(now.view, "get_song_info", lambda *args, **kwargs: paused_song_info())
+    monkeypatch.setattr(now, "time", lambda: 1000.0)
+    first = client.get('/?uid=alice')
+    assert first.get_json()["state"] == "paused"
+
+    monkeypatch.setattr(now, "time", lambda: 1001.6)
+    second = client.get('/?uid=alice', headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 304
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add the parent directory to the path to import the api module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from api import stream
+from util.poller import Hub
+
+
+@pytest.fixture
+def client():
+    stream.app.config.update({"TESTING": True})
+
+    with stream.app.test_client() as client:
+        yield client
+
+
+def test_stream_without_uid(client):
+    response = client.get('/')
+
+    assert response.status_code == 400
+
+
+def test_stream_sends_track_events(client):
+    event = {"uid": "alice", "state": "playing", "title": "Song", "etag": "e1"}
+    hub = Hub(lambda uid: event, playing_interval=60)
+
+    with patch.object(stream, "hub", hub):
+        response = client.get('/?uid=alice')
+        assert response.mimetype == "text/event-stream"
+        chunks = response.iter_encoded()
+        assert next(chunks) == b"retry: 3000\n\n"
+        body = next(chunks).decode("utf-8")
+        response.close()
+
+    lines = body.strip().split("\n")
+    assert lines[0] == "event: track"
+    assert lines[1] == "id: e1"
+    assert json.loads(lines[2][len("data: "):])["title"] == "Song"
+
+
+def test_stream_ends_after_invalid_token():
+    hub = Hub(lambda uid: {"uid": uid, "state": "invalid_token", "etag": "invalid_token"}, playing_interval=60)
+
+    with patch.object(stream, "hub", hub):
+        chunks = list(stream.stream_events("gone", max_seconds=5))
+
+    assert len(chunks) == 2
+    assert hub.watched() == {"gone": 0}
+
+
+def test_fetch_event_invalid_token():
+    from util.spotify import InvalidTokenError
+
+    with patch.object(stream.view, "get_song_info", side_effect=InvalidTokenError("revoked")):
+        assert stream.fetch_event("gone")["state"] == "invalid_token"
+
+
+def test_stream_limits_open_streams_per_worker(client, monkeypatch):
+    hub = Hub(lambda uid: {"uid": uid, "state": "offline", "etag": "offline"}, playing_interval=60)
+    monkeypatch.setattr(stream, "stream_slots", stream.threading.BoundedSemaphore(1))
+
+    with patch.object(stream, "hub", hub):
+        first = client.get('/?uid=alice')
+        assert next(first.iter_encoded()) == b"retry: 3000\n\n"
+
+        with stream.app.test_client() as other:
+            busy = other.get('/?uid=bob')
+        assert busy.status_code == 503
+        assert busy.headers["Retry-After"] == str(stream.STREAM_RETRY_AFTER)
+
+        first.close()
+        with stream.app.test_client() as other:
+            second = other.get('/?uid=bob')
+            assert second.status_code == 200
+            second.close()
+
+
+def test_fetch_event_uses_newest_recently_played_track():
+    with patch.object(stream.view, "get_song_info", return_value=(None, False, None, None)) as get_song_info:
+        assert stream.fetch_event("alice")["state"] == "offline"
+
+    get_song_info.assert_called_once_with("alice", False, newest=True, prefetch=False)
+
+
+def test_fetch_event_of_paused_track_is_stable(monkeypatch):
+    """A paused user's events keep their etag, so subscribers are not re-sent them."""
+    item = {"name": "Song", "artists": [{"name": "Artist"}], "album": {"images": []}, "is_playing": False}
+    monkeypatch.setattr(stream.view, "get_song_info", lambda *args, **kwargs: (item, True, 42000, 200000))
+
+    monkeypatch.setattr(stream, "time", lambda: 1000.0)
+    first = stream.fetch_event("alice")
+    monkeypatch.setattr(stream, "time", lambda: 1001.6)
+    second = stream.fetch_event("alice")
+
+    assert first["state"] == "paused"
+    assert first["etag"] == second["etag"]
@@ -109,7 +109,8 @@ def test_catch_all_invalid_token_error(mock_get_song_info, client):
     ("natemoo-re", 84),
     ("novatorem", 100),
     ("apple", 534),
-    ("spotify-embed", 152)
+    ("spotify-embed", 152),
+    ("karaoke", 445),
 ])
 @patch('api.view.get_song_info')
 @patch('api.view.make_svg')
@@ -404,3 +405,267 @@ def test_generate_css_bar():
     css_10 = generate_css_bar(10)
     css_20 = generate_css_bar(20)
     assert len(css_20) > len(css_10)  # More bars should generate more CSS
+
+
+def test_recently_played_covers_are_prefetched(fake_spotify):
+    """Test a fresh recently-played list warms the covers of all its tracks."""
+    from api import view
+
+    fake = fake_spotify(view, ["offline_user"], playing_ratio=0.0, num_covers=4)
+
+    item, is_now_playing, _, _ = view.get_song_info("offline_user", False)
+    assert view.COVER_PREFETCHER.wait(5)
+    covers = fake.calls["cover"]
+
+    tracks = view.CACHE_RECENTLY_PLAYED.get("offline_user")
+    urls = {view.get_cover_url(track) for track in tracks}
+    assert covers == len(urls)
+    assert all(url in view.CACHE_IMAGE for url in urls)
+
+    # Rendering any of them is now served from the image cache
+    assert view.load_image(view.get_cover_url(item)) is not None
+    assert fake.calls["cover"] == covers
+
+
+def test_shared_album_cover_is_held_once(fake_spotify):
+    """Test users playing the same album share one cover asset and buffer."""
+    from api import view
+    from util import assets
+
+    fake = fake_spotify(view, ["user_a", "user_b"], playing_ratio=1.0, num_covers=1)
+
+    view.app.config.update({"TESTING": True})
+    with view.app.test_client() as client:
+        first = client.get("/?uid=user_a")
+        second = client.get("/?uid=user_b")
+
+    assert first.status_code == 200
+    assert fake.calls["cover"] == 1
+
+    asset = view.CACHE_IMAGE.get(view.get_cover_url(view.get_song_info("user_a", False)[0]))
+    assert asset is assets.intern(asset.content)
+    for response in (first, second):
+        assert asset.b64 in response.data
+        assert b"@@asset:" not in response.data
+
+
+def test_get_cover_url_picks_smallest_sufficient_image():
+    """Test the cover size follows the theme, with fallbacks for odd image lists."""
+    from api.view import get_cover_url, select_image
+
+    images = [
+        {"url": "640", "width": 640, "height": 640},
+        {"url": "300", "width": 300, "height": 300},
+        {"url": "64", "width": 64, "height": 64},
+    ]
+    track = {"album": {"images": images}}
+    assert get_cover_url(track) == "300"
+    assert get_cover_url(track, "natemoo-re") == "64"
+    assert get_cover_url(track, "novatorem") == "300"
+    assert select_image(images, 1000)["url"] == "640"
+
+    # Fewer images than usual must not raise
+    assert get_cover_url({"album": {"images": images[2:]}}) == "64"
+    assert get_cover_url({"album": {"images": [{"url": "only"}]}}) == "only"
+    assert get_cover_url({"album": {"images": []}}) is None
+    assert get_cover_url({"currently_playing_type": "episode", "images": images[:1]}, "natemoo-re") == "640"
+    assert get_cover_url({"currently_playing_type": "ad"}) is None
+
+
+@patch('api.view.get_song_info')
+@patch('api.view.load_image')
+def test_external_cover_links_cover_endpoint(mock_load_image, mock_get_song_info, client):
+    """Test external_cover=true links /api/cover instead of embedding the cover."""
+    cover_id = "ab67616d00001e02" + "1" * 24
+    mock_get_song_info.return_value = ({
+        "name": "Test Song",
+        "artists": [{"name": "Test Artist"}],
+        "album": {"images": [
+            {"url": "https://i.scdn.co/image/" + cover_id, "width": 300, "height": 300},
+            {"url": "https://example.com/64.jpg", "width": 64, "height": 64},
+        ]},
+        "currently_playing_type": "track",
+    }, True, 1000, 200000)
+
+    response = client.get('/?uid=test_user&external_cover=true&theme=novatorem')
+
+    assert response.status_code == 200
+    assert f'src="/api/cover/{cover_id}?size=80"'.encode() in response.data
+    mock_load_image.assert_not_called()
+
+    # Covers that are not on Spotify's CDN are still embedded
+    mock_load_image.return_value = b"fake_image_data"
+    response = client.get('/?uid=test_user&external_cover=true&theme=natemoo-re')
+    assert b"/api/cover/" not in response.data
+    mock_load_image.assert_called_once_with("https://example.com/64.jpg")
+
+
+@patch('api.view.get_song_info')
+@patch('api.view.load_image')
+def test_cover_background_uses_cached_derivatives(mock_load_image, mock_get_song_info, client):
+    """Test spotify-embed embeds a downscaled cover and a tiny backdrop, derived once."""
+    import base64
+    import io
+    import re
+    from api import view
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new("RGB", (300, 300), (20, 20, 20)).save(out, "JPEG")
+    mock_load_image.return_value = out.getvalue()
+    mock_get_song_info.return_value = ({
+        "name": "Test Song",
+        "artists": [{"name": "Test Artist"}],
+        "album": {"images": [{"url": "http://example.com/image.jpg"}] * 3},
+        "currently_playing_type": "track",
+    }, True, 1000, 200000)
+
+    with patch.object(view.derivatives, "backdrop", wraps=view.derivatives.backdrop) as mock_backdrop:
+        response = client.get('/?uid=test_user&theme=spotify-embed&cover_background=true')
+        client.get('/?uid=test_user&theme=spotify-embed&cover_background=true&border_radius=4')
+
+    assert response.status_code == 200
+    mock_backdrop.assert_called_once()
+    svg = response.data.decode()
+    assert "linear-gradient(160deg, #" in svg
+    cover = re.search(r'src="data:image/jpeg;base64,([^"]+)"', svg).group(1)
+    assert Image.open(io.BytesIO(base64.b64decode(cover))).size == (120, 120)
+
+
+@patch('api.view.get_song_info')
+def test_unknown_theme_is_rejected_before_fetching(mock_get_song_info, client):
+    """Test an unknown theme returns 400 without any upstream call."""
+    response = client.get('/?uid=test_user&theme=no-such-theme')
+
+    assert response.status_code == 400
+    assert b'default' in response.data
+    mock_get_song_info.assert_not_called()
+
+
+def test_make_svg_ignores_progress_for_themes_without_it():
+    """Test themes that draw no progress bar reuse one SVG for the whole track."""
+    from api import view
+
+    with view.app.app_context():
+        first = view.make_svg("Artist", "Song", "", True, False, "default", "53b14f", False, "121212", "light", "10", 1000, 200000)
+        later = view.make_svg("Artist", "Song", "", True, False, "default", "53b14f", False, "121212", "light", "10", 9000, 200000)
+        apple = view.make_svg("Artist", "Song", "", True, False, "apple", "53b14f", False, "121212", "light", "10", 1000, 200000)
+        apple_later = view.make_svg("Artist", "Song", "", True, False, "apple", "53b14f", False, "121212", "light", "10", 9000, 200000)
+
+    assert later is first
+    assert apple_later != apple
+
+
+def test_badge_is_compressed_when_accepted(monkeypatch, fake_spotify):
+    """Test badges are gzip encoded on request, identical once decoded."""
+    import gzip
+    from api import view
+    from util import compress
+
+    monkeypatch.setattr(compress, "brotli", None)
+    fake_spotify(view, ["user_a"], playing_ratio=1.0, num_covers=1)
+
+    view.app.config.update({"TESTING": True})
+    with view.app.test_client() as client:
+        plain = client.get("/?uid=user_a&theme=compact")
+        compressed = client.get("/?uid=user_a&theme=compact", headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Vary"] == "Accept-Encoding"
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert len(compressed.data) < len(plain.data)
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+def test_quantize_progress():
+    """Test progress is rounded down to the quantum in ms or percent."""
+    from api.view import quantize_progress
+
+    assert quantize_progress(None, 200000) is None
+    assert quantize_progress(120999, 200000, 1000) == 120000
+    assert quantize_progress(120999, 200000, 1000, 1) == 120000
+    assert quantize_progress(121999, 200000, 1000, 1) == 120000
+    assert quantize_progress(121999, 200000, 0) == 121999
+
+
+def test_calculate_progress_data_animated():
+    """Test animated progress shows the duration and animates the rest."""
+    from api.view import calculate_progress_data
+
+    data = calculate_progress_data(60000, 240000, animate=True)
+
+    assert data["progress_percentage"] == 25
+    assert data["animation_seconds"] == "180"
+    assert data["current_time"] == ""
+    assert data["remaining_time"] == "4:00"
+
+
+@patch('api.view.get_song_info')
+def test_badge_etag_is_stable_within_progress_quantum(mock_get_song_info, client):
+    """Test requests within one progress quantum get the same ETag and a 304."""
+    mock_item = {
+        "name": "Test Song",
+        "artists": [{"name": "Test Artist"}],
+        "album": {"images": [{"url": "http://example.com/image.jpg"}] * 3},
+        "currently_playing_type": "track",
+    }
+    mock_get_song_info.return_value = (mock_item, True, 120100, 240000)
+    first = client.get('/?uid=test_user&theme=apple&cover_image=false')
+
+    mock_get_song_info.return_value = (mock_item, True, 120900, 240000)
+    second = client.get(
+        '/?uid=test_user&theme=apple&cover_image=false',
+        headers={"If-None-Match": first.headers["ETag"]},
+    )
+
+    assert first.status_code == 200
+    assert first.headers["ETag"].startswith('W/"')
+    assert second.status_code == 304
+    assert second.data == b""
+
+    mock_get_song_info.return_value = (mock_item, True, 125000, 240000)
+    animated = client.get('/?uid=test_user&theme=apple&cover_image=false&animate_progress=true')
+    assert animated.headers["ETag"] != first.headers["ETag"]
+    assert b"animation: progress 120s linear forwards" in animated.data
+    assert b"@keyframes progress" in animated.data
+
+
+@patch('api.view.get_song_info')
+def test_animated_progress_within_first_quantum(mock_get_song_info, client):
+    """Test the first seconds of a track, quantized to 0, still animate."""
+    from api.view import calculate_progress_data
+
+    data = calculate_progress_data(0, 240000, animate=True)
+    assert data["progress_percentage"] == 0
+    assert data["animation_seconds"] == "240"
+    assert data["remaining_time"] == "4:00"
+
+    mock_item = {
+        "name": "Test Song",
+        "artists": [{"name": "Test Artist"}],
+        "album": {"images": [{"url": "http://example.com/image.jpg"}] * 3},
+        "currently_playing_type": "track",
+    }
+    mock_get_song_info.return_value = (mock_item, True, 4000, 240000)
+    response = client.get('/?uid=test_user&theme=apple&cover_image=false&animate_progress=true')
+
+    assert b"animation: progress 240s linear forwards" in response.data
+    assert b"4:00" in response.data
+
+
+@patch('api.view.get_song_info')
+def test_paused_track_progress_is_not_animated(mock_get_song_info, client):
+    """Test a paused track's bar stays where it is."""
+    mock_item = {
+        "name": "Test Song",
+        "artists": [{"name": "Test Artist"}],
+        "album": {"images": [{"url": "http://example.com/image.jpg"}] * 3},
+        "currently_playing_type": "track",
+        "is_playing": False,
+    }
+    mock_get_song_info.return_value = (mock_item, True, 120000, 240000)
+    response = client.get('/?uid=test_user&theme=apple&cover_image=false&animate_progress=true')
+
+    assert b"animation: progress" not in response.data
+    assert b"-2:00" in response.data
@@ -470,6 +470,26 @@ def test_get_song_info_now_playing(mock_recently_play, mock_now_playing, mock_ge
     assert item["currently_playing_type"] == "track"
 
 
+@patch('view_svg.get_access_token')
+@patch('util.spotify.get_now_playing')
+@patch('util.spotify.get_recently_play')
+def test_get_song_info_paused(mock_recently_play, mock_now_playing, mock_get_access_token):
+    """Test a paused track is still the current one, flagged as not playing."""
+    mock_get_access_token.return_value = "test_access_token"
+    mock_now_playing.return_value = {
+        "item": {"name": "Test Song", "artists": [{"name": "Test Artist"}], "duration_ms": 240000},
+        "currently_playing_type": "track",
+        "is_playing": False,
+        "progress_ms": 120000,
+    }
+
+    item, is_now_playing, progress_ms, _ = view_svg.get_song_info("paused_uid", False)
+
+    assert is_now_playing == True
+    assert item["is_playing"] == False
+    assert progress_ms == 120000
+
+
 @patch('view_svg.get_access_token')
 @patch('util.spotify.get_now_playing')
 @patch('util.spotify.get_recently_play')
@@ -529,3 +549,169 @@ def test_get_song_info_show_offline(mock_recently_play, mock_now_playing, mock_g
     assert duration_ms is None
     # recently_play should not be called when show_offline=True
     mock_recently_play.assert_not_called()
+
+
+@patch('view_svg.get_access_token')
+@patch('util.spotify.get_now_playing')
+@patch('util.spotify.get_recently_play')
+def test_get_song_info_recently_played_is_cached(mock_recently_play, mock_now_playing, mock_get_access_token):
+    """Test recently played tracks are fetched once per uid and picked locally."""
+    get_song_info = view_svg.get_song_info
+
+    mock_get_access_token.return_value = "test_access_token"
+    mock_now_playing.return_value = {}
+    mock_recently_play.return_value = {
+        "items": [
+            {"track": {"name": "Song A", "artists": [{"name": "A"}], "duration_ms": 1000}},
+            {"track": {"name": "Song B", "artists": [{"name": "B"}], "duration_ms": 2000}},
+        ]
+    }
+
+    names = set()
+    for idx in (0, 1, 0):
+        with patch('random.randint', return_value=idx):
+            item, is_now_playing, _, _ = get_song_info("cached_uid", False)
+        names.add(item["name"])
+        assert is_now_playing == False
+
+    assert names == {"Song A", "Song B"}
+    mock_recently_play.assert_called_once()
+    # The cached tracks are copied, not mutated
+    assert "currently_playing_type" not in view_svg.CACHE_RECENTLY_PLAYED.get("cached_uid")[0]
+
+
+def test_get_access_token_negative_cache():
+    """Test unknown and revoked uids are remembered without further Firestore reads."""
+    get_access_token = view_svg.get_access_token
+    mock_db = MagicMock()
+    mock_db.collection.return_value.document.return_value.get.return_value.exists = False
+
+    with patch('view_svg.db', mock_db):
+        assert get_access_token("unknown_uid") is None
+        assert get_access_token("unknown_uid") is None
+
+    assert mock_db.collection.return_value.document.return_value.get.call_count == 1
+    assert view_svg.CACHE_UNKNOWN_UID.get("unknown_uid") == "unknown"
+
+    mock_db = MagicMock()
+    doc = mock_db.collection.return_value.document.return_value.get.return_value
+    doc.exists = True
+    doc.to_dict.return_value = {"access_token": "a", "refresh_token": "r", "expired_ts": 0}
+    with patch('view_svg.db', mock_db), patch(
+        'util.spotify.refresh_token', return_value={"error": "invalid_grant"}
+    ):
+        assert get_access_token("revoked_uid") is None
+
+    assert "revoked_uid" not in view_svg.CACHE_TOKEN_INFO
+    assert view_svg.CACHE_UNKNOWN_UID.get("revoked_uid") == "revoked"
+
+
+def test_negative_cache_cleared_by_login_in_another_worker(login_stamp):
+    """Test a login elsewhere makes the next negative hit read Firestore again."""
+    from util import stamp
+
+    get_access_token = view_svg.get_access_token
+    mock_db = MagicMock()
+    mock_db.collection.return_value.document.return_value.get.return_value.exists = False
+
+    with patch('view_svg.db', mock_db):
+        assert get_access_token("late_uid") is None
+        assert get_access_token("late_uid") is None
+        assert mock_db.collection.return_value.document.return_value.get.call_count == 1
+
+        # callback.py in another worker
+        stamp.Stamp(login_stamp.path).touch()
+
+        assert get_access_token("late_uid") is None
+        assert mock_db.collection.return_value.document.return_value.get.call_count == 2
+
+
+def test_get_access_token_rejects_uid_missing_from_bloom_filter(tmp_path):
+    """Test uids the Bloom filter has never seen skip the Firestore read."""
+    from util.bloom import UidFilter
+
+    uid_filter = UidFilter(str(tmp_path / "uids.bloom"), lambda: ["known_uid"], capacity=100)
+    assert uid_filter.wait(5)
+    mock_db = MagicMock()
+
+    with patch('view_svg.get_uid_filter', return_value=uid_filter), patch('view_svg.db', mock_db):
+        assert view_svg.get_access_token("typo_uid") is None
+
+    mock_db.collection.assert_not_called()
+
+
+def test_get_access_token_refresh_keeps_refresh_token():
+    """Test the cached record keeps the refresh token after a refresh."""
+    mock_db = MagicMock()
+    doc = mock_db.collection.return_value.document.return_value.get.return_value
+    doc.exists = True
+    doc.to_dict.return_value = {"access_token": "a", "refresh_token": "r", "expired_ts": 0, "scope": "s"}
+
+    with patch('view_svg.db', mock_db), patch(
+        'util.spotify.refresh_token', return_value={"access_token": "b", "expires_in": 3600}
+    ) as mock_refresh:
+        assert view_svg.get_access_token("refresh_uid") == "b"
+
+    mock_refresh.assert_called_once_with("r")
+    assert view_svg.CACHE_TOKEN_INFO["refresh_uid"].refresh_token == "r"
+    mock_db.collection.return_value.document.return_value.update.assert_called_once_with(
+        {"access_token": "b", "refresh_token": "r", "expired_ts": view_svg.CACHE_TOKEN_INFO["refresh_uid"].expired_ts}
+    )
+
+
+@patch('util.spotify.get_now_playing')
+def test_get_now_playing_with_poll_scheduler(mock_now_playing):
+    """Test views only touch the scheduler once the uid's now-playing is cached."""
+    scheduler = MagicMock()
+    mock_now_playing.return_value = {}
+
+    with patch('view_svg.get_scheduler', return_value=scheduler):
+        assert view_svg.get_now_playing("polled_uid", "token") == {}
+        scheduler.touch.assert_called_once_with("polled_uid", {})
+
+        assert view_svg.get_now_playing("polled_uid", "token") == {}
+        scheduler.touch.assert_called_with("polled_uid")
+
+    mock_now_playing.assert_called_once()
+
+
+@patch('view_svg.get_song_info')
+def test_identical_concurrent_requests_render_once(mock_get_song_info):
+    """Test identical in-flight requests share the first one's render."""
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_song_info(uid, show_offline):
+        started.set()
+        release.wait(5)
+        return None, False, None, None
+
+    mock_get_song_info.side_effect = slow_song_info
+    app = view_svg.app
+    app.config.update({"TESTING": True})
+
+    def get():
+        with app.test_client() as client:
+            return client.get('/?uid=burst_uid&theme=compact')
+
+    with ThreadPoolExecutor(4) as executor:
+        first = executor.submit(get)
+        # get_song_info runs inside the shared render, so it is in flight now
+        assert started.wait(5)
+        assert view_svg.RENDERS_IN_FLIGHT.in_flight() == 1
+        others = [executor.submit(get) for _ in range(3)]
+        # Release the render only once the followers wait on it
+        key = (("theme", "compact"), ("uid", "burst_uid"))
+        deadline = time.monotonic() + 5
+        while view_svg.RENDERS_IN_FLIGHT.waiters(key) < 3:
+            assert time.monotonic() < deadline, "followers did not join the in-flight render"
+            time.sleep(0.001)
+        release.set()
+        responses = [first.result(5)] + [f.result(5) for f in others]
+
+    assert mock_get_song_info.call_count == 1
+    assert all(r.status_code == 200 and r.data == responses[0].data for r in responses)
@@ -0,0 +1,146 @@
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench import fakes, report
+from bench.load import build_workload
+
+
+def test_in_memory_firestore_document_lifecycle():
+    """The Firestore stand-in supports the calls made by the app."""
+    db = fakes.InMemoryFirestore()
+    doc_ref = db.collection("users").document("alice")
+
+    assert not doc_ref.get().exists
+
+    doc_ref.set({"access_token": "a", "expired_ts": 1})
+    doc_ref.update({"access_token": "b"})
+    assert doc_ref.get().to_dict() == {"access_token": "b", "expired_ts": 1}
+
+    doc_ref.delete()
+    assert not doc_ref.get().exists
+    assert db.reads == 3
+    assert db.writes == 3
+
+
+def test_in_memory_firestore_seed_and_stream():
+    db = fakes.InMemoryFirestore()
+    db.seed_users(["a", "b"])
+
+    ids = sorted(snapshot.id for snapshot in db.collection("users").stream())
+    assert ids == ["a", "b"]
+
+    snapshots = list(db.get_all([db.collection("users").document(u) for u in ("a", "x")]))
+    assert [s.exists for s in snapshots] == [True, False]
+
+
+def test_fake_spotify_serves_spotify_module():
+    """util.spotify works unchanged against the fake server."""
+    from util import spotify
+
+    with fakes.FakeSpotify(playing_ratio=1.0) as fake:
+        urls = fake.spotify_urls()
+        original = {name: getattr(spotify, name) for name in urls}
+        try:
+            for name, value in urls.items():
+                setattr(spotify, name, value)
+
+            data = spotify.get_now_playing(fakes.TOKEN_PREFIX + "alice")
+            assert data["item"]["name"]
+            assert data["progress_ms"] < data["item"]["duration_ms"]
+
+            recent = spotify.get_recently_play(fakes.TOKEN_PREFIX + "alice")
+            assert len(recent["items"]) == 10
+
+            token = spotify.refresh_token("refresh-alice")
+            assert token["access_token"] == fakes.TOKEN_PREFIX + "alice"
+        finally:
+            for name, value in original.items():
+                setattr(spotify, name, value)
+
+        assert fake.calls == {"currently-playing": 1, "recently-played": 1, "token": 1}
+
+
+def test_fake_spotify_offline_user_gets_204():
+    from util import spotify
+
+    with fakes.FakeSpotify(playing_ratio=0.0) as fake:
+        original = spotify.SPOTIFY_URL_NOW_PLAYING
+        spotify.SPOTIFY_URL_NOW_PLAYING = fake.spotify_urls()["SPOTIFY_URL_NOW_PLAYING"]
+        try:
+            assert spotify.get_now_playing(fakes.TOKEN_PREFIX + "bob") == {}
+        finally:
+            spotify.SPOTIFY_URL_NOW_PLAYING = original
+
+
+def test_build_workload_is_reproducible():
+    first = build_workload(200, 50, seed=3)
+    second = build_workload(200, 50, seed=3)
+
+    assert first == second
+    assert build_workload(200, 50, seed=4) != first
+    assert all(path.startswith("/?uid=") for path in first)
+
+
+def test_percentile_and_compare():
+    assert report.percentile([1, 2, 3, 4], 50) == pytest.approx(2.5)
+    assert report.percentile([], 99) == 0.0
+
+    baseline = {"throughput_rps": 100.0, "latency_ms": {"p95": 10.0}}
+    current = {"throughput_rps": 80.0, "latency_ms": {"p95": 11.0}}
+    rows = report.compare(
+        current, baseline, {"throughput_rps": "higher", "latency_ms.p95": "lower"}
+    )
+
+    assert rows[0][0] == "throughput_rps"
+    assert rows[0][4] == pytest.approx(20.0)
+    assert rows[1][4] == pytest.approx(10.0)
+
+
+def test_micro_benchmarks_cover_render_path():
+    from bench.micro import BENCHMARKS, THEMES
+
+    for theme in THEMES:
+        assert f"make_svg[{theme}]" in BENCHMARKS
+    for name in ("generate_css_bar", "profanity_check", "remove_remaster",
+                 "calculate_progress_data", "encode_html_entities"):
+        assert name in BENCHMARKS
+
+
+def test_micro_measure_and_regression_gate():
+    from bench.micro import check_regressions, measure
+
+    result = measure(lambda: None, rounds=2, min_time=0.01)
+    assert result["rounds"] == 2
+    assert result["median_us"] >= 0
+
+    baseline = {"benchmarks": {"a": {"median_us": 10.0}, "b": {"median_us": 10.0}}}
+    current = {"benchmarks": {"a": {"median_us": 11.0}, "b": {"median_us": 13.0}}}
+
+    assert check_regressions(current, baseline, 20) == [("b", 10.0, 13.0, 30.0)]
+    assert check_regressions(current, baseline, 50) == []
+
+
+def test_make_svg_benchmark_renders_every_call(monkeypatch):
+    """make_svg[theme] times rendering, not the SVG cache."""
+    from bench.micro import BENCHMARKS, _view
+
+    view = _view()
+    monkeypatch.setattr(view, "CACHE_SVG", view.CACHE_SVG)
+    renders = []
+    render_template = view.render_template
+    monkeypatch.setattr(view, "render_template", lambda *a, **kw: renders.append(a) or render_template(*a, **kw))
+
+    run = BENCHMARKS["make_svg[default]"]()
+    renders.clear()
+    run()
+    run()
+    assert len(renders) == 2
+
+    run = BENCHMARKS["make_svg[default,cached]"]()
+    renders.clear()
+    run()
+    assert renders == []
@@ -0,0 +1,92 @@
+import gc
+import os
+import pickle
+import sys
+from base64 import b64encode
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.assets import AssetStore, AssetText, store
+
+
+def test_identical_content_is_interned_once():
+    assets = AssetStore()
+    first = assets.intern(b"cover")
+    second = assets.intern(bytearray(b"cover"))
+
+    assert first is second
+    assert len(assets) == 1
+    assert assets.intern(b"other") is not first
+    assert first.b64 is first.b64
+    assert first.b64 == b64encode(b"cover")
+
+
+def test_asset_is_freed_when_unreferenced():
+    assets = AssetStore()
+    asset = assets.intern(b"cover")
+    digest = asset.digest
+    assert assets.get(digest) is asset
+
+    del asset
+    gc.collect()
+    assert assets.get(digest) is None
+    assert len(assets) == 0
+
+
+def test_chunks_share_the_asset_buffer():
+    assets = AssetStore()
+    asset = assets.intern(b"cover")
+    text = f'<image href="data:image/jpeg;base64,{asset.placeholder}"/>'
+
+    chunks = assets.chunks(text)
+    assert chunks[1] is asset.b64
+    assert b"".join(chunks).decode() == assets.expand(text)
+    assert assets.expand(text) == f'<image href="data:image/jpeg;base64,{b64encode(b"cover").decode()}"/>'
+
+
+def test_chunks_leave_plain_text_and_unknown_placeholders_alone():
+    assets = AssetStore()
+    unknown = "@@asset:" + "0" * 32 + "@@"
+
+    assert assets.chunks("<svg/>") == [b"<svg/>"]
+    assert assets.expand(f"<svg>{unknown}</svg>") == f"<svg>{unknown}</svg>"
+
+
+def test_asset_text_keeps_assets_alive_and_pickles():
+    asset = store.intern(b"pickled cover")
+    text = AssetText(f"<svg>{asset.placeholder}</svg>", store.find(asset.placeholder))
+    digest = asset.digest
+    del asset
+    gc.collect()
+
+    assert store.get(digest) is text.assets[0]
+
+    restored = pickle.loads(pickle.dumps(text))
+    assert restored == text
+    assert restored.assets[0] is text.assets[0]
+    assert store.expand(restored) == "<svg>" + b64encode(b"pickled cover").decode() + "</svg>"
+
+
+def test_encode_gzip_shares_the_asset_segment():
+    import gzip
+
+    asset = store.intern(b"\x00compressible cover" * 200)
+    first = AssetText(f"<svg>{'a' * 1000}{asset.placeholder}</svg>", (asset,))
+    second = AssetText(f"<svg>{'b' * 1000}{asset.placeholder}</svg>", (asset,))
+
+    first_chunks, encoding = store.encode(first, "gzip")
+    second_chunks, _ = store.encode(second, "gzip")
+
+    assert encoding == "gzip"
+    assert gzip.decompress(b"".join(first_chunks)).decode() == store.expand(first)
+    assert gzip.decompress(b"".join(second_chunks)).decode() == store.expand(second)
+    assert any(chunk is asset.gzip_segment for chunk in first_chunks)
+    assert any(chunk is asset.gzip_segment for chunk in second_chunks)
+    # Memoized on the text
+    assert store.encode(first, "gzip")[0] is first_chunks
+    assert pickle.loads(pickle.dumps(first)).encoded == {}
+
+
+def test_encode_leaves_small_or_unaccepted_bodies_alone():
+    assert store.encode("<svg/>", "gzip") == ([b"<svg/>"], None)
+    assert store.encode("<svg>" + "a" * 1000 + "</svg>", None)[1] is None
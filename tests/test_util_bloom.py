@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util import bloom
+from util.bloom import BloomFilter, UidFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bf = BloomFilter(1000, error_rate=0.01)
+    keys = [f"user{i}" for i in range(1000)]
+    for key in keys:
+        bf.add(key)
+
+    assert all(key in bf for key in keys)
+    false_positives = sum(f"other{i}" in bf for i in range(10000))
+    assert false_positives < 300
+
+
+def test_bloom_filter_round_trip():
+    bf = BloomFilter(100)
+    bf.add("alice")
+    copy = BloomFilter.from_bytes(bf.to_bytes())
+
+    assert "alice" in copy
+    assert "bob" not in copy
+    assert (copy.num_bits, copy.num_hashes, copy.built_at) == (bf.num_bits, bf.num_hashes, bf.built_at)
+
+
+def test_uid_filter_builds_once_and_reloads_from_disk(tmp_path):
+    path = str(tmp_path / "uids.bloom")
+    calls = []
+
+    def load_uids():
+        calls.append(1)
+        return ["alice", "bob"]
+
+    first = UidFilter(path, load_uids, capacity=100)
+    assert first.wait(5)
+    assert first.might_exist("alice")
+    assert not first.might_exist("mallory")
+
+    second = UidFilter(path, load_uids, capacity=100)
+    assert second.wait(5)
+    assert second.might_exist("bob")
+    assert len(calls) == 1
+
+
+def test_uid_filter_sees_uids_added_by_another_worker(tmp_path):
+    path = str(tmp_path / "uids.bloom")
+    worker_a = UidFilter(path, lambda: ["alice"], capacity=100)
+    worker_b = UidFilter(path, lambda: ["alice"], capacity=100)
+    assert worker_a.wait(5) and worker_b.wait(5)
+
+    worker_a.add("carol")
+
+    assert worker_b.might_exist("carol")
+
+
+def test_uid_filter_admits_everyone_until_ready(tmp_path):
+    release = threading.Event()
+
+    def load_uids():
+        release.wait(5)
+        return ["alice"]
+
+    uid_filter = UidFilter(str(tmp_path / "uids.bloom"), load_uids, capacity=100)
+    assert uid_filter.might_exist("mallory")
+
+    release.set()
+    assert uid_filter.wait(5)
+    assert not uid_filter.might_exist("mallory")
+
+
+def test_uid_filter_rebuilds_when_stale(tmp_path):
+    path = str(tmp_path / "uids.bloom")
+    uids = ["alice"]
+    UidFilter(path, lambda: list(uids), capacity=100).wait(5)
+
+    uids.append("dave")
+    stale = UidFilter(path, lambda: list(uids), capacity=100, max_age=0)
+    assert stale.wait(5)
+
+    assert stale.might_exist("dave")
+
+
+def test_get_uid_filter_is_disabled_without_path(monkeypatch):
+    monkeypatch.delenv("UID_BLOOM_PATH", raising=False)
+    monkeypatch.setattr(bloom, "_uid_filter", None)
+
+    assert bloom.get_uid_filter() is None
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util import cache
+
+
+def test_memory_backend_lru_eviction():
+    backend = cache.MemoryBackend(maxsize=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+    assert backend.get("c") == 3
+
+
+def test_memory_backend_ttl(monkeypatch):
+    backend = cache.MemoryBackend()
+    now = [100.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+
+    backend.set("a", 1, ttl=5)
+    assert backend.get("a") == 1
+
+    now[0] += 5
+    assert backend.get("a", "gone") == "gone"
+
+
+def test_cache_mapping_interface_and_disabled_ttl():
+    tokens = cache.Cache("test_tokens")
+    tokens["uid"] = {"access_token": "x"}
+
+    assert "uid" in tokens
+    assert tokens["uid"] == {"access_token": "x"}
+    del tokens["uid"]
+    assert "uid" not in tokens
+    with pytest.raises(KeyError):
+        tokens["uid"]
+
+    disabled = cache.Cache("test_disabled", ttl=0)
+    assert disabled.set("a", 1) is False
+    assert disabled.get("a") is None
+
+
+def test_get_cache_returns_same_instance():
+    assert cache.get_cache("test_same") is cache.get_cache("test_same")
+
+
+def _shm_child(path, queue):
+    backend = cache.SharedMemoryBackend(path, slots=16, slot_size=1024)
+    queue.put(backend.get("ns:key"))
+    backend.set("ns:child", "from child")
+
+
+def test_shared_memory_backend_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    backend = cache.SharedMemoryBackend(path, slots=16, slot_size=1024)
+    backend.set("ns:key", {"value": 1}, ttl=60)
+
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_shm_child, args=(path, queue))
+    proc.start()
+    proc.join(10)
+
+    assert queue.get(timeout=5) == {"value": 1}
+    assert backend.get("ns:child") == "from child"
+
+
+def test_shared_memory_backend_limits(tmp_path):
+    backend = cache.SharedMemoryBackend(str(tmp_path / "cache.bin"), slots=4, slot_size=256)
+
+    assert backend.set("big", b"x" * 1024) is False
+    assert backend.get("big") is None
+
+    backend.set("short", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get("short") is None
+
+    for i in range(10):
+        backend.set(f"ns:{i}", i)
+    backend.set("other:1", 1)
+    backend.clear("ns:")
+    assert all(backend.get(f"ns:{i}") is None for i in range(10))
+    assert backend.get("other:1") == 1
+
+
+def test_redis_backend_against_local_server():
+    from bench.fakes import FakeRedis
+
+    with FakeRedis() as server:
+        backend = cache.RedisBackend(server.url)
+        backend.set("ns:a", [1, 2, 3], ttl=60)
+        backend.set("other:b", "b")
+
+        assert backend.get("ns:a") == [1, 2, 3]
+        assert backend.get("ns:missing", "default") == "default"
+
+        backend.clear("ns:")
+        assert backend.get("ns:a") is None
+        assert backend.get("other:b") == "b"
+
+        backend.delete("other:b")
+        assert backend.get("other:b") is None
+
+
+def test_redis_backend_unreachable_is_a_miss():
+    backend = cache.RedisBackend("redis://127.0.0.1:1/0", timeout=0.1)
+
+    assert backend.set("a", 1) is False
+    assert backend.get("a", "default") == "default"
+
+
+def test_shared_backend_prefixes_namespaces(tmp_path):
+    backend = cache.SharedMemoryBackend(str(tmp_path / "cache.bin"), slots=64, slot_size=512)
+    first = cache.get_cache("test_ns_first")
+    second = cache.get_cache("test_ns_second")
+    cache.set_shared_backend(backend)
+    try:
+        first.set("key", "one")
+        second.set("key", "two")
+        assert first.get("key") == "one"
+        assert second.get("key") == "two"
+
+        first.clear()
+        assert first.get("key") is None
+        assert second.get("key") == "two"
+    finally:
+        cache.set_shared_backend(None)
@@ -0,0 +1,46 @@
+import gzip
+import os
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util import compress
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("deflate, gzip;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("*", "gzip"),
+    ("*, gzip;q=0", None),
+])
+def test_negotiate_gzip(monkeypatch, header, expected):
+    monkeypatch.setattr(compress, "brotli", None)
+
+    assert compress.negotiate(header) == expected
+
+
+def test_negotiate_prefers_brotli_when_installed():
+    pytest.importorskip("brotli")
+
+    assert compress.negotiate("gzip, deflate, br") == "br"
+    assert compress.negotiate("gzip, br;q=0") == "gzip"
+
+
+def test_gzip_segments_concatenate():
+    parts = [b"<svg>" * 100, os.urandom(2000), b"</svg>" * 100]
+    segments = [compress.deflate_segment(part) for part in parts]
+    body = b"".join(parts)
+
+    chunks = compress.gzip_segments(segments, zlib.crc32(body), len(body))
+
+    assert gzip.decompress(b"".join(chunks)) == body
+    # Segments are reusable in another body
+    chunks = compress.gzip_segments(segments[1:], zlib.crc32(b"".join(parts[1:])), len(b"".join(parts[1:])))
+    assert gzip.decompress(b"".join(chunks)) == b"".join(parts[1:])
@@ -0,0 +1,61 @@
+import io
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util import derivatives
+
+
+def two_tone(size=300):
+    """A cover that is two thirds red and one third blue."""
+    img = Image.new("RGB", (size, size), (200, 30, 30))
+    img.paste((10, 10, 200), (0, 0, size // 3, size))
+    out = io.BytesIO()
+    img.save(out, "JPEG")
+    return out.getvalue()
+
+
+def test_downscale_fits_size_and_keeps_small_images():
+    content = two_tone()
+
+    small = derivatives.downscale(content, 120)
+    assert Image.open(io.BytesIO(small)).size == (120, 120)
+    assert len(small) < len(content)
+
+    # Within the slack the original bytes are kept as they are
+    assert derivatives.downscale(content, 288, slack=1.25) is content
+    assert derivatives.downscale(content, 640) is content
+
+
+def test_dominant_colors_are_ordered_by_area():
+    first, second = derivatives.dominant_colors(two_tone())
+
+    r, g, b = (int(first[i : i + 2], 16) for i in (0, 2, 4))
+    assert r > 150 and g < 80 and b < 80
+    r, g, b = (int(second[i : i + 2], 16) for i in (0, 2, 4))
+    assert b > 150 and r < 80
+
+
+def test_dominant_colors_of_flat_cover():
+    out = io.BytesIO()
+    Image.new("RGB", (64, 64), (0, 0, 0)).save(out, "PNG")
+
+    assert derivatives.dominant_colors(out.getvalue()) == ["000000", "000000"]
+
+
+def test_backdrop_is_tiny():
+    backdrop = derivatives.backdrop(two_tone())
+
+    assert Image.open(io.BytesIO(backdrop)).size == (derivatives.BACKDROP_SIZE,) * 2
+    assert len(backdrop) < 1024
+
+
+def test_truncated_covers_are_accepted():
+    content = two_tone(600)
+    truncated = content[: len(content) * 2 // 3]
+
+    assert max(Image.open(io.BytesIO(derivatives.downscale(truncated, 300))).size) == 300
+    assert len(derivatives.dominant_colors(truncated)) == 2
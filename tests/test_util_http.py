@@ -0,0 +1,18 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util import http
+
+
+def test_session_is_shared_within_process():
+    assert http.get_session() is http.get_session()
+
+
+def test_session_is_recreated_after_fork(monkeypatch):
+    """A forked worker must not reuse the master's connection pool."""
+    session = http.get_session()
+    monkeypatch.setattr(http.os, "getpid", lambda: -1)
+
+    assert http.get_session() is not session
@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.image import ImageError, fetch_image, sniff
+
+
+def encode(fmt, size=(300, 200), **kwargs):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("fmt,kind", [
+    ("JPEG", "jpeg"),
+    ("PNG", "png"),
+    ("GIF", "gif"),
+    ("WEBP", "webp"),
+])
+def test_sniff_formats(fmt, kind):
+    assert sniff(encode(fmt)) == (kind, (300, 200))
+
+
+def test_sniff_progressive_jpeg_with_exif():
+    data = encode("JPEG", progressive=True, exif=b"Exif\x00\x00" + b"\x00" * 5000)
+
+    assert sniff(data) == ("jpeg", (300, 200))
+    assert sniff(data[:100]) == ("jpeg", None)
+
+
+def test_sniff_rejects_non_images():
+    with pytest.raises(ImageError):
+        sniff(b"<html><body>Not found</body></html>")
+    assert sniff(b"\x89PN") == (None, None)
+
+
+@pytest.fixture
+def server():
+    """Local HTTP server serving ``routes[path] = (body, send_length)``."""
+    routes = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body, send_length = routes[self.path]
+            self.send_response(200)
+            if send_length:
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for i in range(0, len(body), 8192):
+                    chunk = body[i : i + 8192]
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.write(b"0\r\n\r\n")
+            except OSError:
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.routes = routes
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+
+
+@pytest.mark.parametrize("send_length", [True, False])
+def test_fetch_image(server, send_length):
+    data = encode("JPEG")
+    server.routes["/cover.jpg"] = (data, send_length)
+
+    assert fetch_image(server.url + "/cover.jpg") == data
+
+
+def test_fetch_image_rejects_declared_oversize(server):
+    server.routes["/big.jpg"] = (encode("JPEG"), True)
+
+    with pytest.raises(ImageError, match="limit"):
+        fetch_image(server.url + "/big.jpg", max_bytes=1000)
+
+
+def test_fetch_image_aborts_streamed_oversize(server):
+    data = encode("PNG", size=(1000, 1000), compress_level=0)
+    server.routes["/big.png"] = (data, False)
+
+    with pytest.raises(ImageError, match="exceeds"):
+        fetch_image(server.url + "/big.png", max_bytes=64 * 1024)
+
+
+def test_fetch_image_rejects_non_image(server):
+    server.routes["/page.html"] = (b"<html>" + b" " * 100000 + b"</html>", False)
+
+    with pytest.raises(ImageError, match="not an image"):
+        fetch_image(server.url + "/page.html")
+
+
+def test_fetch_image_rejects_large_dimensions(server):
+    server.routes["/wide.png"] = (encode("PNG", size=(5000, 10)), True)
+
+    with pytest.raises(ImageError, match="5000x10"):
+        fetch_image(server.url + "/wide.png")
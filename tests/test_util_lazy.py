@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.lazy import lazy_import
+
+
+def test_lazy_import_defers_execution(tmp_path, monkeypatch):
+    """The module body only runs on first attribute access."""
+    (tmp_path / "lazy_probe.py").write_text(
+        "import builtins\nbuiltins.LAZY_PROBE_LOADED = True\nVALUE = 42\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_probe", raising=False)
+
+    import builtins
+
+    module = lazy_import("lazy_probe")
+    assert not hasattr(builtins, "LAZY_PROBE_LOADED")
+
+    assert module.VALUE == 42
+    assert builtins.LAZY_PROBE_LOADED
+    del builtins.LAZY_PROBE_LOADED
+
+
+def test_lazy_import_configures_module_once_loaded(tmp_path, monkeypatch):
+    (tmp_path / "lazy_configured.py").write_text("FLAG = False\nVALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_configured", raising=False)
+    configured = []
+
+    def configure(module):
+        configured.append(module)
+        module.FLAG = True
+
+    module = lazy_import("lazy_configured", configure=configure)
+    assert configured == []
+
+    assert module.VALUE == 42
+    assert module.FLAG is True
+    assert configured == [module]
+
+
+def test_lazy_import_returns_loaded_module():
+    import json
+
+    assert lazy_import("json") is json
+
+
+def test_view_import_skips_heavy_dependencies():
+    """Importing the view must not load Pillow, colorgram, firebase or profanityfilter."""
+    code = (
+        "import sys, api.view\n"
+        "loaded = [m for m in ('PIL.Image', 'PIL.ImageFile', 'colorgram', 'firebase_admin', 'profanityfilter')\n"
+        "          if type(sys.modules.get(m)).__name__ not in ('NoneType', '_LazyModule')]\n"
+        "print('loaded=' + ','.join(loaded))\n"
+    )
+    root = os.path.join(os.path.dirname(__file__), "..")
+    env = dict(os.environ, TESTING="true")
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True
+    )
+
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip().splitlines()[-1] == "loaded="
@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.poller import Hub, next_interval
+
+
+def test_next_interval_playing_wakes_at_track_end():
+    playing = {"state": "playing", "progress_ms": 100000, "duration_ms": 102000}
+
+    assert next_interval(playing, None, playing_interval=5) == 3.0
+    assert next_interval(dict(playing, progress_ms=0), None, playing_interval=5) == 5
+    assert next_interval(dict(playing, progress_ms=102000), None, playing_interval=5) == 1.0
+
+
+def test_next_interval_idle_backs_off():
+    offline = {"state": "offline"}
+
+    assert next_interval(offline, None, playing_interval=5, idle_interval=60) == 5
+    assert next_interval(offline, 5, playing_interval=5, idle_interval=60) == 10
+    assert next_interval(offline, 40, playing_interval=5, idle_interval=60) == 60
+    assert next_interval(None, 60, playing_interval=5, idle_interval=60) == 60
+
+
+def test_hub_polls_once_for_many_subscribers():
+    calls = []
+    fetched = threading.Event()
+
+    def fetch(uid):
+        calls.append(uid)
+        fetched.set()
+        return {"state": "offline", "etag": "a"}
+
+    hub = Hub(fetch, playing_interval=60, idle_interval=60)
+    subscriptions = [hub.subscribe("alice") for _ in range(5)]
+    fetched.wait(5)
+
+    assert all(s.get(timeout=5)["etag"] == "a" for s in subscriptions)
+    assert calls == ["alice"]
+
+    # A late subscriber gets the last known state without another poll
+    assert hub.subscribe("alice").get(timeout=1)["etag"] == "a"
+    assert calls == ["alice"]
+
+
+def test_hub_only_publishes_changes():
+    etags = iter(["a", "a", "b"])
+    polled = threading.Semaphore(0)
+
+    def fetch(uid):
+        try:
+            return {"state": "playing", "etag": next(etags)}
+        finally:
+            polled.release()
+
+    hub = Hub(fetch, playing_interval=0.01)
+    with hub.subscribe("alice") as subscription:
+        for _ in range(3):
+            polled.acquire(timeout=5)
+        assert subscription.get(timeout=5)["etag"] == "a"
+        assert subscription.get(timeout=5)["etag"] == "b"
+
+
+def test_hub_retires_watcher_without_subscribers():
+    hub = Hub(lambda uid: {"state": "offline", "etag": "a"}, playing_interval=0.01, idle_interval=0.01, linger=0)
+
+    hub.subscribe("alice").close()
+    watcher = hub._watchers["alice"]
+    watcher.thread.join(5)
+
+    assert hub.watched() == {}
+
+
+def test_next_interval_paused_backs_off():
+    paused = {"state": "paused", "progress_ms": 100000, "duration_ms": 102000}
+
+    assert next_interval(paused, 5, playing_interval=5, idle_interval=60) == 10
+    assert next_interval(paused, 60, playing_interval=5, idle_interval=60) == 60
+
+
+def test_new_subscriber_wakes_backed_off_watcher(monkeypatch):
+    from util import poller
+
+    polled = threading.Semaphore(0)
+
+    def fetch(uid):
+        polled.release()
+        return {"state": "offline", "etag": "a"}
+
+    # Fully backed off after the first poll
+    monkeypatch.setattr(poller, "next_interval", lambda *args: 60)
+    hub = Hub(fetch, playing_interval=0.01, idle_interval=60)
+    with hub.subscribe("alice"):
+        assert polled.acquire(timeout=5)
+        assert not polled.acquire(timeout=0.1)
+
+        with hub.subscribe("alice"):
+            assert polled.acquire(timeout=5)
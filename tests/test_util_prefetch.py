@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.prefetch import Prefetcher
+
+
+def test_prefetcher_runs_each_pending_key_once():
+    release = threading.Event()
+    loaded = []
+
+    def load(key):
+        release.wait(5)
+        loaded.append(key)
+
+    prefetcher = Prefetcher(load)
+    assert prefetcher.submit("a")
+    assert not prefetcher.submit("a")
+    release.set()
+    assert prefetcher.wait(5)
+
+    assert loaded == ["a"]
+    # Done keys can be prefetched again
+    assert prefetcher.submit("a")
+    assert prefetcher.wait(5)
+
+
+def test_prefetcher_drops_when_full_and_survives_errors():
+    release = threading.Event()
+
+    def load(key):
+        release.wait(5)
+        raise RuntimeError("cdn down")
+
+    prefetcher = Prefetcher(load, max_pending=2)
+    assert prefetcher.submit("a")
+    assert prefetcher.submit("b")
+    assert not prefetcher.submit("c")
+    release.set()
+    assert prefetcher.wait(5)
+
+    assert prefetcher.pending() == 0
+
+
+def test_prefetcher_wait_times_out_while_busy():
+    release = threading.Event()
+    prefetcher = Prefetcher(lambda key: release.wait(5))
+
+    assert prefetcher.wait(0)
+    prefetcher.submit("a")
+    assert not prefetcher.wait(0.05)
+    release.set()
+    assert prefetcher.wait(5)
@@ -23,3 +23,41 @@ def test_profanity_check_profane_text():
     # The exact censoring depends on the library, but should be different
     assert result != "fuck"
     assert "*" in result  # Should contain censoring characters
+
+
+def test_profanity_check_matches_profanityfilter():
+    """The compiled matcher gives exactly the same output as ProfanityFilter."""
+    from profanityfilter import ProfanityFilter
+    from util.profanity import censor
+
+    corpus_path = os.path.join(
+        os.path.dirname(__file__), "..", "bench", "corpus", "track_titles.txt"
+    )
+    with open(corpus_path, encoding="utf-8") as f:
+        corpus = [line.rstrip("\n") for line in f]
+    corpus += [
+        "",
+        "FUCK fuck FuCk",
+        "fuckfuck",
+        "@$$ hole",
+        "s.o.b. and shi+",
+        "classic assassin",
+        "motherfuckers!",
+        "dick-head",
+    ]
+
+    pf = ProfanityFilter()
+    for name in corpus:
+        assert censor(name) == pf.censor(name), name
+
+
+def test_profanity_check_is_memoized():
+    from util.profanity import profanity_check
+
+    profanity_check.cache_clear()
+    profanity_check("Hello World")
+    profanity_check("Hello World")
+
+    info = profanity_check.cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.scheduler import PollScheduler, UidState
+
+
+def playing(progress_ms, duration_ms, track_id="t1"):
+    return {"is_playing": True, "progress_ms": progress_ms, "item": {"id": track_id, "duration_ms": duration_ms}}
+
+
+def state_for(data, view_rate=0.0, interval=None):
+    state = UidState(0.0)
+    state.view_rate = view_rate
+    state.interval = interval
+    return state, state.observe(data)
+
+
+def test_next_interval_playing():
+    scheduler = PollScheduler(None, hot_interval=2, playing_interval=5, hot_views_per_minute=6)
+
+    assert scheduler.next_interval(*state_for(playing(0, 200000))) == 5
+    assert scheduler.next_interval(*state_for(playing(0, 200000), view_rate=10)) == 2
+    # Wake up just after the track ends
+    assert scheduler.next_interval(*state_for(playing(197000, 200000))) == 4.0
+    assert scheduler.next_interval(*state_for(playing(200000, 200000))) == 1.0
+
+
+def test_next_interval_idle_backs_off():
+    scheduler = PollScheduler(None, playing_interval=5, idle_interval=120, hot_views_per_minute=6)
+
+    assert scheduler.next_interval(*state_for({}, interval=None)) == 5
+    state, _ = state_for({}, interval=5)
+    assert scheduler.next_interval(state) == 10
+    state.interval = 100
+    assert scheduler.next_interval(state) == 120
+    state.view_rate = 10
+    assert scheduler.next_interval(state) == 30
+    # A new track resets the backoff
+    state, changed = state_for({"is_playing": False, "item": {"id": "t2"}}, interval=100)
+    assert scheduler.next_interval(state, changed) == 5
+
+
+def test_scheduler_polls_viewed_uids_and_forgets_the_rest():
+    polls = []
+    polled = threading.Semaphore(0)
+
+    def poll(uid):
+        polls.append(uid)
+        polled.release()
+        return {}
+
+    scheduler = PollScheduler(poll, playing_interval=0.02, idle_interval=0.02, forget_after=0.3)
+    scheduler.touch("alice", {})
+
+    assert polled.acquire(timeout=5)
+    assert polled.acquire(timeout=5)
+    assert set(polls) == {"alice"}
+
+    time.sleep(0.5)
+    assert "alice" not in scheduler.watched()
+    count = len(polls)
+    time.sleep(0.1)
+    assert len(polls) == count
+
+
+def test_scheduler_stops_polling_after_error():
+    polled = threading.Event()
+
+    def poll(uid):
+        polled.set()
+        raise RuntimeError("revoked")
+
+    scheduler = PollScheduler(poll, playing_interval=0.01)
+    scheduler.touch("alice", {})
+
+    assert polled.wait(5)
+    deadline = time.time() + 5
+    while "alice" in scheduler.watched() and time.time() < deadline:
+        time.sleep(0.01)
+    assert "alice" not in scheduler.watched()
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.singleflight import Group
+
+
+def test_concurrent_calls_share_one_result():
+    group = Group()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "svg"
+
+    with ThreadPoolExecutor(8) as executor:
+        futures = [executor.submit(group.do, "key", slow) for _ in range(8)]
+        assert started.wait(5)
+        assert group.in_flight() == 1
+        # Release the leader only once the other seven are waiting on it
+        deadline = time.monotonic() + 5
+        while group.waiters("key") < 7:
+            assert time.monotonic() < deadline, "callers did not join the in-flight call"
+            time.sleep(0.001)
+        release.set()
+        results = [future.result(5) for future in futures]
+
+    assert results == ["svg"] * 8
+    assert len(calls) == 1
+    assert group.in_flight() == 0
+
+
+def test_error_is_shared_and_not_remembered():
+    group = Group()
+
+    with pytest.raises(ValueError):
+        group.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+
+    assert group.do("key", lambda: "ok") == "ok"
+
+
+def test_waiter_runs_itself_after_timeout():
+    group = Group()
+    release = threading.Event()
+    started = threading.Event()
+
+    def leader():
+        started.set()
+        release.wait(5)
+        return "leader"
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(group.do, "key", leader)
+        started.wait(5)
+        assert group.do("key", lambda: "waiter", timeout=0.01) == "waiter"
+        release.set()
+        assert future.result(5) == "leader"
+
+
+def test_waiters_counts_callers_of_in_flight_key():
+    group = Group()
+
+    assert group.waiters("key") == 0
+    assert group.do("key", lambda: group.waiters("key")) == 0
@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.stamp import Stamp
+
+
+def test_stamp_reports_touches_by_other_processes(tmp_path):
+    path = str(tmp_path / "logins.stamp")
+    worker_a = Stamp(path)
+    worker_b = Stamp(path)
+
+    assert not worker_b.changed()
+    worker_a.touch()
+    assert worker_b.changed()
+    assert not worker_b.changed()
+
+    # Touches before a process starts do not count.
+    assert not Stamp(path).changed()
+
+
+def test_stamp_survives_unwritable_path(tmp_path):
+    stamp = Stamp(str(tmp_path / "missing" / "logins.stamp"))
+
+    stamp.touch()
+    assert not stamp.changed()
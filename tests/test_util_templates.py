@@ -0,0 +1,66 @@
+import os
+import sys
+
+from flask import Flask, render_template
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util import templates
+
+RENDER_ARGS = {
+    "height": 445,
+    "num_bar": 0,
+    "content_bar": "",
+    "css_bar": "",
+    "title_text": "Now playing",
+    "artist_name": "A &amp; B",
+    "song_name": "Song",
+    "img": "",
+    "cover_image": False,
+    "bar_color": "53b14f",
+    "background_color": "121212",
+    "mode": "light",
+    "is_now_playing": True,
+    "progress_data": {},
+    "border_radius": "10",
+}
+
+
+def make_app(**kwargs):
+    return templates.configure(Flask(__name__, template_folder=templates.TEMPLATE_DIR), **kwargs)
+
+
+def render(app):
+    with app.app_context():
+        return render_template("spotify.default.html.j2", **RENDER_ARGS)
+
+
+def test_configure_uses_shared_bytecode_cache(tmp_path):
+    app = make_app(modules="", bytecode_cache=True, cache_dir=str(tmp_path))
+
+    assert app.jinja_env.auto_reload is False
+    assert app.jinja_env.autoescape is False
+    svg = render(app)
+    assert "A &amp; B" in svg
+    assert os.listdir(tmp_path)
+
+    # A new worker loads the bytecode instead of compiling
+    assert render(make_app(modules="", bytecode_cache=True, cache_dir=str(tmp_path))) == svg
+
+
+def test_precompiled_modules_render_the_same(tmp_path):
+    names = templates.precompile(str(tmp_path))
+
+    assert "spotify.default.html.j2" in names
+    assert "callback.html.j2" in names
+    assert len(os.listdir(tmp_path)) == len(names)
+
+    precompiled = make_app(modules=str(tmp_path), bytecode_cache=False)
+    assert precompiled.jinja_env.bytecode_cache is None
+    assert render(precompiled) == render(make_app(modules="", bytecode_cache=False))
+
+
+def test_minify_keeps_line_breaks_and_drops_the_rest():
+    source = "<svg>\n  <!-- logo -->\n  <style>\n    /* bars */\n    .a {\n      color: red;\n    }\n  </style>\n\n  <text>A\n    B</text>\n</svg>\n"
+
+    assert templates.minify(source) == "<svg>\n<style>\n.a {\ncolor: red;\n}\n</style>\n<text>A\nB</text>\n</svg>\n"
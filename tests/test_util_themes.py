@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.themes import DEFAULT_COVER_SIZE, THEMES, get_cover_size
+
+TEMPLATES = os.path.join(os.path.dirname(__file__), "..", "api", "templates")
+
+
+def test_every_theme_has_a_template_and_vice_versa():
+    templates = {name for name in os.listdir(TEMPLATES) if name.startswith("spotify.")}
+
+    assert templates == {theme.template for theme in THEMES.values()}
+
+
+def test_theme_geometry():
+    assert THEMES["default"].get_height(True) == 445
+    assert THEMES["default"].get_height(False) == 145
+    assert THEMES["natemoo-re"].get_height(False) == 84
+    assert THEMES["karaoke"].num_bar == 0
+    assert [name for name, theme in THEMES.items() if theme.progress] == ["apple", "spotify-embed"]
+
+
+def test_get_cover_size():
+    assert get_cover_size("natemoo-re") == 64
+    assert get_cover_size("default") == DEFAULT_COVER_SIZE
+    assert get_cover_size("no-such-theme") == DEFAULT_COVER_SIZE
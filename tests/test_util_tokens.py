@@ -0,0 +1,44 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from util.tokens import TokenInfo
+
+
+def test_from_dict_keeps_only_token_fields():
+    info = TokenInfo.from_dict(
+        {
+            "access_token": "a",
+            "refresh_token": "r",
+            "expired_ts": 100,
+            "scope": "user-read-currently-playing",
+            "token_type": "Bearer",
+        }
+    )
+
+    assert (info.access_token, info.refresh_token, info.expired_ts) == ("a", "r", 100)
+    assert not hasattr(info, "__dict__")
+
+
+def test_expired():
+    assert TokenInfo("a", "r", None).expired(now=0)
+    assert TokenInfo("a", "r", 100).expired(now=100)
+    assert not TokenInfo("a", "r", 100).expired(now=99)
+
+
+def test_refreshed_keeps_refresh_token_unless_rotated():
+    info = TokenInfo("old", "refresh", 0)
+
+    refreshed = info.refreshed({"access_token": "new", "expires_in": 3600}, now=10)
+    assert refreshed == TokenInfo("new", "refresh", 3610)
+
+    rotated = info.refreshed({"access_token": "new", "refresh_token": "rotated", "expires_in": 60}, now=10)
+    assert rotated.refresh_token == "rotated"
+
+
+def test_pickle_round_trip():
+    info = TokenInfo("a", "r", 100)
+
+    assert pickle.loads(pickle.dumps(info)) == info
@@ -0,0 +1,176 @@
+"""Content-addressed store for cover images.
+
+Thousands of users listen to the same albums, so the same cover bytes would
+otherwise be held once per cache entry: raw in the image cache, base64
+encoded in every rendered SVG, and again in every response body. Instead
+each distinct cover becomes one Asset, keyed by the hash of its content,
+that holds the raw bytes and, once asked for, their base64 encoding.
+
+Rendered SVGs contain a short placeholder where the base64 image goes.
+``chunks`` turns such an SVG into the list of byte strings handed to the
+WSGI server, with the asset's shared base64 bytes as one of them, so a
+response never copies the image. WSGI requires bytes objects, so the shared
+buffer is an immutable ``bytes`` rather than a memoryview.
+
+Assets are reference counted by the interpreter: the store only holds weak
+references, and an asset is freed once no cache entry or response in flight
+uses it any more. Rendered SVGs are AssetText strings that hold on to the
+assets they refer to, so a placeholder always resolves while its SVG lives.
+
+``encode`` compresses the same way: an asset's compressed base64 is shared
+by every response that contains it, and an AssetText memoizes its
+compressed form for as long as it is cached.
+"""
+
+import hashlib
+import re
+import threading
+import weakref
+import zlib
+from base64 import b64encode
+
+from util import compress
+
+PLACEHOLDER = re.compile(r"@@asset:([0-9a-f]{32})@@")
+
+
+class Asset:
+    __slots__ = ("content", "digest", "_b64", "_gzip", "__weakref__")
+
+    def __init__(self, content, digest):
+        self.content = content
+        self.digest = digest
+        self._b64 = None
+        self._gzip = None
+
+    @property
+    def b64(self):
+        if self._b64 is None:
+            self._b64 = b64encode(self.content)
+        return self._b64
+
+    @property
+    def gzip_segment(self):
+        if self._gzip is None:
+            self._gzip = compress.deflate_segment(self.b64)
+        return self._gzip
+
+    @property
+    def placeholder(self):
+        return f"@@asset:{self.digest}@@"
+
+    def __reduce__(self):
+        # Shared cache backends pickle assets; unpickling interns them again.
+        return (intern, (self.content,))
+
+
+class AssetText(str):
+    """A str with placeholders that keeps the assets they refer to alive."""
+
+    def __new__(cls, text, assets=()):
+        obj = super().__new__(cls, text)
+        obj.assets = tuple(assets)
+        # Compressed bodies by encoding, see AssetStore.encode
+        obj.encoded = {}
+        return obj
+
+    def __reduce__(self):
+        return (AssetText, (str(self), self.assets))
+
+
+class AssetStore:
+    def __init__(self):
+        self._assets = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def intern(self, content):
+        """Return the Asset for ``content``, reusing an existing one."""
+        digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        with self._lock:
+            asset = self._assets.get(digest)
+            if asset is None:
+                asset = self._assets[digest] = Asset(bytes(content), digest)
+        return asset
+
+    def get(self, digest):
+        return self._assets.get(digest)
+
+    def find(self, text):
+        """Return the assets whose placeholders appear in ``text``."""
+        assets = []
+        for digest in PLACEHOLDER.findall(text):
+            asset = self.get(digest)
+            if asset is not None:
+                assets.append(asset)
+        return tuple(assets)
+
+    def parts(self, text):
+        """Return ``text`` as ``(bytes, asset)`` pairs with placeholders
+        resolved; ``asset`` is None for literal text."""
+        parts = PLACEHOLDER.split(text)
+        if len(parts) == 1:
+            return [(text.encode("utf-8"), None)]
+
+        result = []
+        # split() alternates literal text and captured digests.
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                if part:
+                    result.append((part.encode("utf-8"), None))
+                continue
+            asset = self.get(part)
+            if asset is not None:
+                result.append((asset.b64, asset))
+            else:
+                result.append((f"@@asset:{part}@@".encode("ascii"), None))
+        return result
+
+    def chunks(self, text):
+        """Return ``text`` as a list of byte strings with placeholders resolved."""
+        return [data for data, _ in self.parts(text)]
+
+    def encode(self, text, encoding):
+        """Return ``(chunks, encoding)``: ``text`` as byte strings compressed
+        with ``encoding`` ("br", "gzip" or None), or uncompressed with None
+        if it is too small to be worth it."""
+        encoded = getattr(text, "encoded", None)
+        if encoded is not None and encoding in encoded:
+            return encoded[encoding], encoding
+
+        parts = self.parts(text)
+        size = sum(len(data) for data, _ in parts)
+        if encoding is None or size < compress.MIN_SIZE:
+            return [data for data, _ in parts], None
+
+        if encoding == "gzip":
+            crc = 0
+            segments = []
+            for data, asset in parts:
+                crc = zlib.crc32(data, crc)
+                segments.append(asset.gzip_segment if asset is not None else compress.deflate_segment(data))
+            chunks = compress.gzip_segments(segments, crc, size)
+        elif encoding == "br":
+            chunks = [compress.brotli_compress(b"".join(data for data, _ in parts))]
+        else:
+            raise ValueError(f"unknown encoding {encoding!r}")
+
+        if encoded is not None:
+            encoded[encoding] = chunks
+        return chunks, encoding
+
+    def expand(self, text):
+        """Return ``text`` with placeholders replaced by base64 images."""
+        return b"".join(self.chunks(text)).decode("utf-8")
+
+    def __len__(self):
+        return len(self._assets)
+
+    def total_bytes(self):
+        return sum(len(asset.content) for asset in list(self._assets.values()))
+
+
+store = AssetStore()
+
+
+def intern(content):
+    return store.intern(content)
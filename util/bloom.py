@@ -0,0 +1,235 @@
+"""Bloom filter of registered uids.
+
+``get_access_token`` asks the filter before reading Firestore, so uids that
+were never registered (typos, scrapers, deleted accounts) cost a few hash
+operations instead of a network round trip. A Bloom filter has no false
+negatives, so a registered uid is never turned away as long as every sign-up
+is added to it.
+
+The filter is enabled by ``UID_BLOOM_PATH``. On first use a worker loads the
+file, or builds it from a key-only scan of the ``users`` collection when it
+does not exist yet (one worker builds, the others wait on a file lock). Until
+the filter is ready every uid is admitted. ``callback.py`` adds new uids to
+the file under the same lock, and other workers reload the file when it has
+changed before rejecting a uid.
+
+The file is per host. With several hosts, set ``UID_BLOOM_MAX_AGE`` so the
+filter is rebuilt from Firestore periodically and picks up users who signed
+up elsewhere.
+"""
+
+import fcntl
+import hashlib
+import math
+import os
+import struct
+import threading
+from time import time
+
+# magic, number of bits, number of hashes, build time
+_HEADER = struct.Struct("<8sQId")
+_MAGIC = b"UIDBLOOM"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        num_bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        num_hashes = round(num_bits / capacity * math.log(2))
+        self._init(max(num_bits, 8), max(num_hashes, 1), time())
+
+    def _init(self, num_bits, num_hashes, built_at, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.built_at = built_at
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    def _positions(self, key):
+        # Kirsch-Mitzenmacher double hashing: two 64-bit hashes give k indexes.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def to_bytes(self):
+        return _HEADER.pack(_MAGIC, self.num_bits, self.num_hashes, self.built_at) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, num_bits, num_hashes, built_at = _HEADER.unpack_from(data)
+        bits = bytearray(data[_HEADER.size :])
+        if magic != _MAGIC or len(bits) != (num_bits + 7) // 8:
+            raise ValueError("not a uid bloom filter")
+        bloom = cls.__new__(cls)
+        bloom._init(num_bits, num_hashes, built_at, bits)
+        return bloom
+
+
+def read_filter(path):
+    with open(path, "rb") as f:
+        return BloomFilter.from_bytes(f.read())
+
+
+def write_filter(path, bloom):
+    """Atomically replace ``path`` with ``bloom``."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(bloom.to_bytes())
+    os.replace(tmp_path, path)
+
+
+class UidFilter:
+    """Admission check backed by a Bloom filter file, see the module docstring."""
+
+    def __init__(self, path, load_uids, capacity=1_000_000, error_rate=0.001, max_age=None):
+        self.path = path
+        self.load_uids = load_uids
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_age = max_age
+        self._bloom = None
+        self._mtime = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _file_lock(self):
+        f = open(f"{self.path}.lock", "a+")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads do not survive fork, so every worker loads its own copy.
+            self._pid = os.getpid()
+            self._bloom = None
+            self._start(self._load)
+
+    def _start(self, target):
+        self._thread = threading.Thread(target=target, name="uid-bloom", daemon=True)
+        self._thread.start()
+
+    def _stale(self, bloom):
+        return self.max_age is not None and time() - bloom.built_at > self.max_age
+
+    def _needs_build(self):
+        try:
+            return self._stale(read_filter(self.path))
+        except (OSError, ValueError, struct.error):
+            return True
+
+    def _load(self):
+        try:
+            with self._file_lock():
+                if self._needs_build():
+                    self._build()
+                self._reload()
+        except Exception as e:
+            print(f"uid bloom filter unavailable, admitting every uid: {e}")
+
+    def _build(self):
+        uids = list(self.load_uids())
+        bloom = BloomFilter(max(self.capacity, 2 * len(uids)), self.error_rate)
+        for uid in uids:
+            bloom.add(uid)
+        write_filter(self.path, bloom)
+        print(f"built uid bloom filter with {len(uids)} uids")
+
+    def _reload(self):
+        mtime = os.path.getmtime(self.path)
+        bloom = read_filter(self.path)
+        with self._lock:
+            self._bloom = bloom
+            self._mtime = mtime
+
+    def ready(self):
+        self._ensure_started()
+        return self._bloom is not None
+
+    def wait(self, timeout=None):
+        self._ensure_started()
+        self._thread.join(timeout)
+        return self._bloom is not None
+
+    def might_exist(self, uid):
+        """Return False only for uids that are definitely not registered."""
+        self._ensure_started()
+        bloom = self._bloom
+        if bloom is None or uid in bloom:
+            return True
+
+        # Another worker may have added the uid since the file was loaded.
+        try:
+            if os.path.getmtime(self.path) != self._mtime:
+                self._reload()
+        except (OSError, ValueError):
+            return True
+        bloom = self._bloom
+        if self._stale(bloom) and not self._thread.is_alive():
+            # Refresh from Firestore in the background. This miss is still
+            # answered from the current filter.
+            self._start(self._load)
+        return uid in bloom
+
+    def add(self, uid):
+        """Record a new sign-up in this process and in the file."""
+        self._ensure_started()
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(uid)
+        try:
+            with self._file_lock():
+                # Without a file the build in progress reads the uid from
+                # Firestore, since callers add it after writing the user.
+                if os.path.exists(self.path):
+                    bloom = read_filter(self.path)
+                    bloom.add(uid)
+                    write_filter(self.path, bloom)
+                    self._reload()
+        except Exception as e:
+            print(f"could not add uid {uid} to the bloom filter: {e}")
+
+
+_uid_filter = None
+_uid_filter_lock = threading.Lock()
+
+
+def _stream_registered_uids():
+    from util.firestore import get_firestore_db
+
+    # Key-only scan: select([]) returns document ids without token fields.
+    users = get_firestore_db().collection("users").select([])
+    return (doc.id for doc in users.stream())
+
+
+def get_uid_filter():
+    """Return the process-wide UidFilter, or None if UID_BLOOM_PATH is unset."""
+    global _uid_filter
+
+    path = os.getenv("UID_BLOOM_PATH")
+    if not path:
+        return None
+    if _uid_filter is None:
+        with _uid_filter_lock:
+            if _uid_filter is None:
+                max_age = os.getenv("UID_BLOOM_MAX_AGE")
+                _uid_filter = UidFilter(
+                    path,
+                    _stream_registered_uids,
+                    capacity=int(os.getenv("UID_BLOOM_CAPACITY", "1000000")),
+                    error_rate=float(os.getenv("UID_BLOOM_ERROR_RATE", "0.001")),
+                    max_age=float(max_age) if max_age else None,
+                )
+    return _uid_filter
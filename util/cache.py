@@ -0,0 +1,449 @@
+"""Pluggable cache backends shared by the API handlers.
+
+Every cache in the app is a named ``Cache`` obtained from ``get_cache()``.
+Where the entries live is decided once per process by ``CACHE_BACKEND``:
+
+- ``memory`` (default): a per-process LRU dict, bounded by ``maxsize``.
+- ``shm``: a fixed-size hash table in an mmap'ed file (``CACHE_SHM_PATH``)
+  shared by every worker on the node.
+- ``redis``: any server speaking the Redis protocol (``CACHE_URL``), shared
+  by every node.
+
+The shared backends pickle values and silently drop entries that do not fit
+(``shm``) or that fail to reach the server (``redis``), so a cache problem
+only ever costs a miss.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import socket
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from time import monotonic, time
+from urllib.parse import unquote, urlparse
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, prefix=""):
+        with self._lock:
+            if not prefix:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Slot header: key hash, expiry timestamp (0 = never), key length, value length.
+_SLOT_HEADER = struct.Struct("<QdHI")
+
+
+class SharedMemoryBackend:
+    """Open-addressing hash table in a memory-mapped file.
+
+    The file is split into ``slots`` fixed-size slots. A key hashes to a home
+    slot and may live in any of the next ``probes`` slots; when all of them
+    are taken by live entries the home slot is overwritten. Access is
+    serialised with ``flock`` across processes and a lock within a process.
+    """
+
+    def __init__(self, path, slots=1024, slot_size=65536, probes=8):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.probes = min(probes, slots)
+        self._lock = threading.RLock()
+        self._pid = None
+        self._fd = None
+        self._mm = None
+
+    def _map(self):
+        # flock is tied to the open file description, which a forked child
+        # shares with its parent, so every process opens the file itself.
+        pid = os.getpid()
+        if self._pid != pid:
+            size = self.slots * self.slot_size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd = fd
+            self._mm = mmap.mmap(fd, size)
+            self._pid = pid
+        return self._mm
+
+    @contextlib.contextmanager
+    def _locked(self, operation):
+        with self._lock:
+            mm = self._map()
+            fcntl.flock(self._fd, operation)
+            try:
+                yield mm
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key_bytes):
+        digest = hashlib.blake2b(key_bytes, digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def _candidates(self, key_hash):
+        home = key_hash % self.slots
+        return [(home + i) % self.slots for i in range(self.probes)]
+
+    def _find(self, mm, key_bytes, key_hash):
+        for index in self._candidates(key_hash):
+            offset = index * self.slot_size
+            slot_hash, expires_at, key_len, value_len = _SLOT_HEADER.unpack_from(mm, offset)
+            if slot_hash != key_hash:
+                continue
+            start = offset + _SLOT_HEADER.size
+            if mm[start : start + key_len] == key_bytes:
+                return offset, expires_at, start + key_len, value_len
+        return None
+
+    def get(self, key, default=None):
+        key_bytes = key.encode("utf-8")
+        key_hash = self._hash(key_bytes)
+        with self._locked(fcntl.LOCK_SH) as mm:
+            found = self._find(mm, key_bytes, key_hash)
+            if found is None:
+                return default
+            _, expires_at, value_start, value_len = found
+            if expires_at and expires_at <= time():
+                return default
+            payload = mm[value_start : value_start + value_len]
+        return pickle.loads(payload)
+
+    def set(self, key, value, ttl=None):
+        key_bytes = key.encode("utf-8")
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if _SLOT_HEADER.size + len(key_bytes) + len(payload) > self.slot_size:
+            return False
+
+        key_hash = self._hash(key_bytes)
+        expires_at = time() + ttl if ttl else 0.0
+        with self._locked(fcntl.LOCK_EX) as mm:
+            found = self._find(mm, key_bytes, key_hash)
+            if found is not None:
+                offset = found[0]
+            else:
+                offset = None
+                now = time()
+                for index in self._candidates(key_hash):
+                    slot_offset = index * self.slot_size
+                    slot_hash, slot_expires, _, _ = _SLOT_HEADER.unpack_from(mm, slot_offset)
+                    if slot_hash == 0 or (slot_expires and slot_expires <= now):
+                        offset = slot_offset
+                        break
+                if offset is None:
+                    offset = self._candidates(key_hash)[0] * self.slot_size
+
+            start = offset + _SLOT_HEADER.size
+            mm[start : start + len(key_bytes)] = key_bytes
+            value_start = start + len(key_bytes)
+            mm[value_start : value_start + len(payload)] = payload
+            _SLOT_HEADER.pack_into(mm, offset, key_hash, expires_at, len(key_bytes), len(payload))
+        return True
+
+    def delete(self, key):
+        key_bytes = key.encode("utf-8")
+        with self._locked(fcntl.LOCK_EX) as mm:
+            found = self._find(mm, key_bytes, self._hash(key_bytes))
+            if found is not None:
+                _SLOT_HEADER.pack_into(mm, found[0], 0, 0.0, 0, 0)
+
+    def clear(self, prefix=""):
+        prefix_bytes = prefix.encode("utf-8")
+        with self._locked(fcntl.LOCK_EX) as mm:
+            for index in range(self.slots):
+                offset = index * self.slot_size
+                slot_hash, _, key_len, _ = _SLOT_HEADER.unpack_from(mm, offset)
+                if slot_hash == 0:
+                    continue
+                start = offset + _SLOT_HEADER.size
+                if mm[start : start + key_len].startswith(prefix_bytes):
+                    _SLOT_HEADER.pack_into(mm, offset, 0, 0.0, 0, 0)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """Minimal Redis protocol (RESP2) client: GET, SET, DEL and SCAN.
+
+    One connection per thread, reconnected lazily after errors or a fork.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", timeout=0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn[0] == os.getpid():
+            return conn
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (os.getpid(), sock, sock.makefile("rb"))
+        self._local.conn = conn
+        if self.password:
+            self._execute(conn, "AUTH", self.password)
+        if self.db:
+            self._execute(conn, "SELECT", str(self.db))
+        return conn
+
+    def _disconnect(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(args):
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RedisError(rest.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read(reader) for _ in range(length)]
+        raise RedisError(f"unexpected reply: {line!r}")
+
+    def _execute(self, conn, *args):
+        _, sock, reader = conn
+        sock.sendall(self._encode(args))
+        return self._read(reader)
+
+    def command(self, *args):
+        try:
+            return self._execute(self._connection(), *args)
+        except (OSError, RedisError) as e:
+            print(f"Cache backend error ({args[0]}): {e}")
+            self._disconnect()
+            raise
+
+    def get(self, key, default=None):
+        try:
+            payload = self.command("GET", key)
+        except (OSError, RedisError):
+            return default
+        if payload is None:
+            return default
+        return pickle.loads(payload)
+
+    def set(self, key, value, ttl=None):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        args = ["SET", key, payload]
+        if ttl:
+            args += ["PX", str(int(ttl * 1000))]
+        try:
+            self.command(*args)
+        except (OSError, RedisError):
+            return False
+        return True
+
+    def delete(self, key):
+        try:
+            self.command("DEL", key)
+        except (OSError, RedisError):
+            pass
+
+    def clear(self, prefix=""):
+        cursor = b"0"
+        try:
+            while True:
+                cursor, keys = self.command("SCAN", cursor, "MATCH", prefix + "*", "COUNT", "500")
+                if keys:
+                    self.command("DEL", *keys)
+                if cursor == b"0":
+                    break
+        except (OSError, RedisError):
+            pass
+
+
+def create_backend(kind=None):
+    """Build the shared backend selected by ``CACHE_BACKEND``.
+
+    Returns ``None`` for the in-process backend, where every ``Cache`` keeps
+    its own ``MemoryBackend`` so ``maxsize`` applies per cache.
+    """
+    kind = kind or os.getenv("CACHE_BACKEND", "memory")
+    if kind == "memory":
+        return None
+    if kind == "shm":
+        default_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        return SharedMemoryBackend(
+            os.getenv("CACHE_SHM_PATH", os.path.join(default_dir, "spotify-github-profile.cache")),
+            slots=int(os.getenv("CACHE_SHM_SLOTS", "1024")),
+            slot_size=int(os.getenv("CACHE_SHM_SLOT_SIZE", "65536")),
+        )
+    if kind == "redis":
+        return RedisBackend(os.getenv("CACHE_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+
+_shared_backend = _MISSING
+_caches = {}
+
+
+def get_shared_backend():
+    global _shared_backend
+
+    if _shared_backend is _MISSING:
+        _shared_backend = create_backend()
+
+    return _shared_backend
+
+
+def set_shared_backend(backend):
+    """Switch every cache to ``backend`` (``None`` for in-process)."""
+    global _shared_backend
+
+    _shared_backend = backend
+    for cache in _caches.values():
+        cache._memory = None
+
+
+class Cache:
+    """A named cache with a default TTL.
+
+    ``ttl`` is in seconds; ``None`` means entries never expire and ``0``
+    disables the cache. ``maxsize`` bounds the in-process backend only.
+    """
+
+    def __init__(self, namespace, ttl=None, maxsize=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._memory = None
+
+    def _backend(self):
+        shared = get_shared_backend()
+        if shared is not None:
+            return shared, f"{self.namespace}:"
+        if self._memory is None:
+            self._memory = MemoryBackend(self.maxsize)
+        return self._memory, ""
+
+    def get(self, key, default=None):
+        if self.ttl == 0:
+            return default
+        backend, prefix = self._backend()
+        return backend.get(prefix + key, default)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl == 0:
+            return False
+        backend, prefix = self._backend()
+        return backend.set(prefix + key, value, ttl)
+
+    def delete(self, key):
+        backend, prefix = self._backend()
+        backend.delete(prefix + key)
+
+    def clear(self):
+        backend, prefix = self._backend()
+        backend.clear(prefix)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+
+def get_cache(namespace, ttl=None, maxsize=None):
+    """Return the process-wide cache called ``namespace``."""
+    cache = _caches.get(namespace)
+    if cache is None:
+        cache = _caches[namespace] = Cache(namespace, ttl, maxsize)
+    return cache
+
+
+def clear_all():
+    for cache in _caches.values():
+        cache.clear()
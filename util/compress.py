@@ -0,0 +1,69 @@
+"""Response compression negotiated on Accept-Encoding.
+
+gzip is built from independently compressed segments: each one is a run of
+raw deflate blocks ended with a sync flush, so segments can be compressed
+once, memoized (a cover's base64, for instance), and concatenated into any
+number of responses. Only the gzip header and trailer are per response.
+brotli (``pip install brotli``) is used when installed and accepted; its
+streams cannot be concatenated, so whole bodies are compressed instead.
+"""
+
+import os
+import struct
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# Bodies smaller than this are sent as they are.
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "512"))
+
+# Magic, deflate, no flags, no mtime, no extra flags, unknown OS.
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# An empty final deflate block, ending the stream after the last segment.
+DEFLATE_END = b"\x03\x00"
+
+
+def negotiate(accept_encoding):
+    """Return "br", "gzip" or None for an Accept-Encoding header value."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding] = q
+
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def deflate_segment(data, level=GZIP_LEVEL):
+    """Compress ``data`` into raw deflate blocks that can be concatenated."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def gzip_segments(segments, crc, size):
+    """Return the chunks of a gzip body made of deflate ``segments``.
+
+    ``crc`` and ``size`` are the CRC-32 and length of the uncompressed body.
+    """
+    return [GZIP_HEADER, *segments, DEFLATE_END + struct.pack("<II", crc & 0xFFFFFFFF, size & 0xFFFFFFFF)]
+
+
+def brotli_compress(data, quality=BROTLI_QUALITY):
+    return brotli.compress(data, quality=quality)
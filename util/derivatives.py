@@ -0,0 +1,67 @@
+import io
+
+from util.lazy import lazy_import
+
+
+def _load_truncated_images(image_file):
+    # Covers cut short on the CDN still decode to something usable.
+    image_file.LOAD_TRUNCATED_IMAGES = True
+
+
+# Before PIL.Image: the flag must be set however Pillow gets loaded.
+ImageFile = lazy_import("PIL.ImageFile", configure=_load_truncated_images)
+Image = lazy_import("PIL.Image")
+ImageFilter = lazy_import("PIL.ImageFilter")
+
+JPEG_QUALITY = 85
+# Covers up to this much larger than the drawn size are kept as they are;
+# re-encoding them would cost quality for few bytes.
+DOWNSCALE_SLACK = 1.25
+# The browser stretches the backdrop to the badge, which blurs it further.
+BACKDROP_SIZE = 16
+BACKDROP_BLUR = 2
+
+
+def _open(content):
+    img = Image.open(io.BytesIO(content))
+    # JPEGs can be decoded at a fraction of their size, plenty for colors
+    # and the backdrop.
+    if img.format == "JPEG":
+        img.draft("RGB", (64, 64))
+    return img
+
+
+def _jpeg(img, quality=JPEG_QUALITY):
+    out = io.BytesIO()
+    img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def downscale(content, size, slack=1.0):
+    """Return ``content`` scaled down to fit ``size`` px, as JPEG.
+
+    Images that already fit ``size * slack`` are returned unchanged.
+    """
+    img = Image.open(io.BytesIO(content))
+    if max(img.size) <= size * slack:
+        return content
+    img.thumbnail((size, size))
+    return _jpeg(img)
+
+
+def dominant_colors(content, count=2):
+    """Return the ``count`` most common colors of an image as hex strings."""
+    img = _open(content).convert("RGB")
+    img.thumbnail((64, 64))
+    quantized = img.quantize(colors=max(count, 4))
+    palette = quantized.getpalette()
+    colors = ["%02x%02x%02x" % tuple(palette[i * 3 : i * 3 + 3]) for _, i in sorted(quantized.getcolors(), reverse=True)]
+    # Flat covers have fewer colors than asked for.
+    return (colors * count)[:count]
+
+
+def backdrop(content, size=BACKDROP_SIZE):
+    """Return a tiny blurred JPEG of an image, to be stretched as a background."""
+    img = _open(content).convert("RGB")
+    img = img.resize((size, size), Image.Resampling.BOX)
+    return _jpeg(img.filter(ImageFilter.GaussianBlur(BACKDROP_BLUR)), quality=70)
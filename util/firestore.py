@@ -1,18 +1,22 @@
 import json
 import os
+import threading
 from base64 import b64decode
 
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
+_db = None
+_db_lock = threading.Lock()
 
 
-def get_firestore_db():
+def _create_client():
     # In testing environment, return a mock client
     if os.getenv("TESTING") == "true":
         from unittest.mock import MagicMock
         return MagicMock()
-    
+
+    import firebase_admin
+    from firebase_admin import credentials
+    from firebase_admin import firestore
+
     if not firebase_admin._apps:
         firebase_config = os.getenv("FIREBASE")
         if firebase_config is None:
@@ -23,3 +27,32 @@ def get_firestore_db():
         firebase_admin.initialize_app(cred)
 
     return firestore.client()
+
+
+def get_firestore_db():
+    global _db
+
+    if _db is None:
+        # Threads of a worker can race to the first request; only one of them
+        # creates the client.
+        with _db_lock:
+            if _db is None:
+                _db = _create_client()
+
+    return _db
+
+
+class LazyFirestoreClient:
+    """Firestore client placeholder that connects on first use.
+
+    firebase_admin and the gRPC stack it pulls in are slow to import, so
+    modules hold one of these at import time and the real client is created
+    by the first request that touches Firestore.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_firestore_db(), name)
+
+
+def lazy_firestore_db():
+    return LazyFirestoreClient()
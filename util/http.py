@@ -0,0 +1,31 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+_session = None
+_session_pid = None
+
+
+def get_session():
+    """Return the process-wide requests session.
+
+    All outgoing HTTP (Spotify API and cover images) goes through one
+    keep-alive connection pool per process. The session is recreated after a
+    fork so gunicorn workers started with --preload never share sockets
+    inherited from the master.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+        _session_pid = pid
+
+    return _session
@@ -0,0 +1,122 @@
+import os
+import struct
+
+from util.http import get_session
+
+# Cover art from Spotify's CDN is 10-200 KB; anything far beyond that is not
+# a cover and must not be buffered in a worker.
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(2 * 1024 * 1024)))
+MAX_IMAGE_DIMENSION = int(os.getenv("MAX_IMAGE_DIMENSION", "4096"))
+CHUNK_SIZE = 16 * 1024
+# JPEG dimensions sit in the SOF segment, after EXIF/ICC segments of up to
+# 64 KB each. Give up looking for them after this many bytes.
+HEADER_LIMIT = 256 * 1024
+
+
+class ImageError(ValueError):
+    pass
+
+
+def _jpeg_size(data):
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ImageError("corrupt JPEG marker")
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        (length,) = struct.unpack(">H", data[pos + 2 : pos + 4])
+        # SOF0-SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[pos + 5 : pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def _webp_size(data):
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    raise ImageError("unknown WebP chunk")
+
+
+def sniff(data):
+    """Return ``(format, (width, height))`` from the start of an image.
+
+    The size is None while ``data`` is too short to contain it. Raises
+    ImageError if the bytes are not a supported image format.
+    """
+    data = bytes(data[:HEADER_LIMIT])
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg", _jpeg_size(data)
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png", struct.unpack(">II", data[16:24]) if len(data) >= 24 else None
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif", struct.unpack("<HH", data[6:10]) if len(data) >= 10 else None
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp", _webp_size(data)
+    if len(data) < 12:
+        # Not enough bytes to rule anything out yet.
+        return None, None
+    raise ImageError("not an image")
+
+
+def fetch_image(url, max_bytes=MAX_IMAGE_BYTES, max_dimension=MAX_IMAGE_DIMENSION, timeout=10):
+    """Download an image with bounded memory.
+
+    The body is streamed into a buffer of at most ``max_bytes``. The header
+    is checked as soon as it has arrived, and the download is aborted on
+    content that is not an image, is larger than ``max_dimension`` on a side,
+    or is larger than ``max_bytes``. Raises ImageError or a requests error.
+    """
+    with get_session().get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+
+        length = response.headers.get("Content-Length")
+        length = int(length) if length and length.isdigit() else None
+        if length is not None and length > max_bytes:
+            raise ImageError(f"image is {length} bytes, limit is {max_bytes}")
+
+        buffer = bytearray(length if length is not None else 0)
+        size = 0
+        checked = False
+        for chunk in response.iter_content(CHUNK_SIZE):
+            end = size + len(chunk)
+            if end > max_bytes:
+                raise ImageError(f"image exceeds {max_bytes} bytes")
+            if end > len(buffer):
+                # No or wrong Content-Length: grow, still within the cap.
+                buffer.extend(bytes(end - len(buffer)))
+            buffer[size:end] = chunk
+            size = end
+
+            if not checked:
+                kind, dimensions = sniff(memoryview(buffer)[:size])
+                if dimensions is not None:
+                    width, height = dimensions
+                    if width > max_dimension or height > max_dimension:
+                        raise ImageError(f"{kind} image is {width}x{height}, limit is {max_dimension}")
+                    checked = True
+                elif size >= HEADER_LIMIT:
+                    raise ImageError("image size not found in header")
+
+        if not checked:
+            raise ImageError("truncated image")
+
+    del buffer[size:]
+    return bytes(buffer)
@@ -0,0 +1,50 @@
+import importlib.abc
+import importlib.util
+import sys
+
+
+class _ConfiguringLoader(importlib.abc.Loader):
+    """Run ``configure(module)`` right after ``loader`` executes the module."""
+
+    def __init__(self, loader, configure):
+        self.loader = loader
+        self.configure = configure
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.loader.exec_module(module)
+        self.configure(module)
+
+
+def lazy_import(name, configure=None):
+    """Return module ``name`` without executing it until an attribute is used.
+
+    Heavy optional dependencies (Pillow, colorgram, firebase_admin, ...) are
+    only needed by some requests. Importing them through this helper keeps
+    them off the cold-start path: the returned module object is registered in
+    ``sys.modules`` and is loaded on first attribute access, so
+    ``mock.patch("PIL.Image.open")`` and friends keep working.
+
+    ``configure(module)`` is called once the module is loaded, for module
+    level settings that would otherwise force the load.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        if configure is not None:
+            configure(module)
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+    if configure is not None:
+        spec.loader = _ConfiguringLoader(spec.loader, configure)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
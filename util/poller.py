@@ -0,0 +1,178 @@
+"""Fan-out of now-playing changes to live subscribers.
+
+One watcher thread per uid polls ``fetch(uid)`` and pushes every change to
+all subscribers of that uid, so N viewers of a profile cost one upstream
+poll instead of N. The poll interval adapts to what the user is doing:
+
+- playing: every ``playing_interval`` seconds, or just after the current
+  track ends if that is sooner, so the next track shows up on time;
+- paused, offline or failing: backs off from ``playing_interval`` up to
+  ``idle_interval``. A new subscriber cuts a backed off wait short, so it
+  does not start on a state up to ``idle_interval`` old.
+
+A watcher stops once its last subscriber has been gone for ``linger``
+seconds.
+"""
+
+import os
+import queue
+import threading
+from time import monotonic
+
+PLAYING_INTERVAL = float(os.getenv("POLL_PLAYING_INTERVAL", "5"))
+IDLE_INTERVAL = float(os.getenv("POLL_IDLE_INTERVAL", "60"))
+MIN_INTERVAL = 1.0
+# Poll this long after the expected end of a track.
+TRACK_END_SLACK = 1.0
+
+
+def next_interval(data, previous, playing_interval=PLAYING_INTERVAL, idle_interval=IDLE_INTERVAL):
+    """Return seconds until the next poll after ``data`` was fetched."""
+    if data is None or data.get("state") != "playing":
+        if previous is None:
+            return playing_interval
+        return min(max(previous * 2, playing_interval), idle_interval)
+
+    interval = playing_interval
+    progress_ms = data.get("progress_ms")
+    duration_ms = data.get("duration_ms")
+    if progress_ms is not None and duration_ms:
+        remaining = max(duration_ms - progress_ms, 0) / 1000.0
+        interval = min(interval, remaining + TRACK_END_SLACK)
+    return max(interval, MIN_INTERVAL)
+
+
+class Subscription:
+    """Iterator over change events for one subscriber."""
+
+    def __init__(self, hub, uid, maxsize=16):
+        self.hub = hub
+        self.uid = uid
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A slow consumer only needs the latest state.
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(event)
+
+    def get(self, timeout=None):
+        """Return the next event, or None after ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Watcher:
+    def __init__(self, hub, uid):
+        self.hub = hub
+        self.uid = uid
+        self.subscribers = set()
+        self.last_event = None
+        self.idle_since = None
+        self.fetched_at = None
+        # Set by Hub.subscribe to poll now instead of after the interval.
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"poll-{uid}", daemon=True)
+
+    def run(self):
+        interval = None
+        while True:
+            try:
+                event = self.hub.fetch(self.uid)
+            except Exception as e:
+                print(f"poll {self.uid} failed: {e}")
+                event = None
+            self.fetched_at = monotonic()
+
+            if event is not None:
+                self.hub.publish(self, event)
+            interval = next_interval(
+                event, interval, self.hub.playing_interval, self.hub.idle_interval
+            )
+
+            if self.wake.wait(interval):
+                self.wake.clear()
+                # Someone is watching again, start backing off anew.
+                interval = None
+            if self.hub.retire(self):
+                return
+
+
+class Hub:
+    """Registry of watchers, see the module docstring.
+
+    ``fetch(uid)`` returns the current state as a dict with at least
+    ``state`` and an ``etag`` that changes whenever subscribers should be
+    told, or raises.
+    """
+
+    def __init__(self, fetch, playing_interval=PLAYING_INTERVAL, idle_interval=IDLE_INTERVAL, linger=30.0):
+        self.fetch = fetch
+        self.playing_interval = playing_interval
+        self.idle_interval = idle_interval
+        self.linger = linger
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, uid):
+        """Return a Subscription; the latest known state is delivered first."""
+        subscription = Subscription(self, uid)
+        with self._lock:
+            watcher = self._watchers.get(uid)
+            if watcher is None:
+                watcher = self._watchers[uid] = _Watcher(self, uid)
+                watcher.thread.start()
+            watcher.subscribers.add(subscription)
+            watcher.idle_since = None
+            if watcher.last_event is not None:
+                subscription.put(watcher.last_event)
+            fetched_at = watcher.fetched_at
+            if fetched_at is not None and monotonic() - fetched_at >= self.playing_interval:
+                watcher.wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            watcher = self._watchers.get(subscription.uid)
+            if watcher is None:
+                return
+            watcher.subscribers.discard(subscription)
+            if not watcher.subscribers:
+                watcher.idle_since = monotonic()
+
+    def publish(self, watcher, event):
+        with self._lock:
+            if watcher.last_event is not None and watcher.last_event.get("etag") == event.get("etag"):
+                return
+            watcher.last_event = event
+            subscribers = list(watcher.subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def retire(self, watcher):
+        """Remove ``watcher`` if it has had no subscribers for ``linger`` seconds."""
+        with self._lock:
+            if watcher.idle_since is None or monotonic() - watcher.idle_since < self.linger:
+                return False
+            del self._watchers[watcher.uid]
+            return True
+
+    def watched(self):
+        with self._lock:
+            return {uid: len(watcher.subscribers) for uid, watcher in self._watchers.items()}
@@ -0,0 +1,59 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """Run ``load(key)`` in the background, once per key while it is pending.
+
+    Submissions beyond ``max_pending`` are dropped: a prefetch is only a
+    head start, the caller still loads the key itself when it needs it.
+    """
+
+    def __init__(self, load, max_workers=2, max_pending=128):
+        self.load = load
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Recreated after a fork, the parent's threads do not exist in a worker.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+            self._pid = os.getpid()
+            self._pending = set()
+        return self._executor
+
+    def submit(self, key):
+        """Queue ``key``; return False if it is already pending or the queue is full."""
+        with self._lock:
+            executor = self._get_executor()
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(key)
+        executor.submit(self._run, key)
+        return True
+
+    def _run(self, key):
+        try:
+            self.load(key)
+        except Exception as e:
+            print(f"prefetch {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                if not self._pending:
+                    self._idle.notify_all()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def wait(self, timeout=None):
+        """Block until nothing is pending; return False on ``timeout``."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
@@ -1,11 +1,63 @@
-from profanityfilter import ProfanityFilter
+import functools
+import re
 
-pf = ProfanityFilter()
+# ProfanityFilter.censor() rebuilds the word list and re-compiles one regex per
+# word (~750 of them) on every call, and profanity_check used to run it twice
+# (is_clean + censor). The same rules are compiled once here instead:
+#
+# - any_word is a single alternation of every word without word boundaries.
+#   If it finds nothing the text cannot match any bounded rule either, so it
+#   is clean. This is the fast path for almost every title.
+# - rules keeps the exact per-word (regex, replacement) pairs in the order
+#   the library applies them, so profane text is censored identically.
+#
+# Loading profanityfilter and compiling the rules is deferred to the first
+# request that asks for filtering, keeping it off the cold-start path.
 
 
-def profanity_check(name):
+@functools.cache
+def _matcher():
+    from profanityfilter import ProfanityFilter
+    from profanityfilter.profanityfilter import (
+        ENDS_WITH_WORD_CHAR,
+        RE_ESCAPED_CHAR,
+        STARTS_WITH_WORD_CHAR,
+    )
+
+    pf = ProfanityFilter()
+    words = pf.get_profane_words()
+
+    rules = []
+    for word in words:
+        regex_string = word
+        if STARTS_WITH_WORD_CHAR.search(word):
+            regex_string = r"\b" + regex_string
+        if ENDS_WITH_WORD_CHAR.search(word):
+            regex_string = regex_string + r"\b"
+        replacement = pf._censor_char * len(RE_ESCAPED_CHAR.sub("\1", word))
+        rules.append((re.compile(regex_string, re.IGNORECASE), replacement))
+
+    any_word = re.compile("|".join(words), re.IGNORECASE)
+    return any_word, rules
+
+
+def warm_up():
+    """Load profanityfilter and compile the rules now, e.g. before forking."""
+    _matcher()
 
-    if pf.is_clean(name):
+
+def censor(name):
+    """Return ``name`` censored exactly like ``ProfanityFilter().censor``."""
+    any_word, rules = _matcher()
+    if any_word.search(name) is None:
         return name
 
-    return pf.censor(name)
+    for regex, replacement in rules:
+        name = regex.sub(replacement, name)
+    return name
+
+
+@functools.lru_cache(maxsize=4096)
+def profanity_check(name):
+
+    return censor(name)
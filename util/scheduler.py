@@ -0,0 +1,198 @@
+"""Background now-playing polls driven by listening activity.
+
+With ``POLL_SCHEDULER=true`` the view stops fetching now-playing on request.
+After the first view of a uid, every view ``touch``es it instead, and this
+scheduler keeps the now-playing cache fed in the background. How often a uid
+is polled depends on its state:
+
+- playing and viewed often (``POLL_HOT_VIEWS_PER_MINUTE``):
+  ``POLL_HOT_INTERVAL``;
+- playing: ``POLL_PLAYING_INTERVAL``;
+- either way, just after the current track ends if that comes sooner, so
+  the next track shows up on time;
+- paused or offline: backs off from the playing interval to
+  ``POLL_IDLE_INTERVAL`` (a quarter of it if viewed often), and starts over
+  as soon as the track changes;
+- not viewed for ``POLL_FORGET_AFTER`` seconds: not polled at all.
+
+Upstream cost therefore follows listening activity, not page views. Each
+process runs its own scheduler for the uids it serves.
+"""
+
+import heapq
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+HOT_INTERVAL = float(os.getenv("POLL_HOT_INTERVAL", "2"))
+PLAYING_INTERVAL = float(os.getenv("POLL_PLAYING_INTERVAL", "5"))
+IDLE_INTERVAL = float(os.getenv("POLL_IDLE_INTERVAL", "120"))
+FORGET_AFTER = float(os.getenv("POLL_FORGET_AFTER", "600"))
+HOT_VIEWS_PER_MINUTE = float(os.getenv("POLL_HOT_VIEWS_PER_MINUTE", "6"))
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "8"))
+MIN_INTERVAL = 1.0
+TRACK_END_SLACK = 1.0
+
+
+class UidState:
+    __slots__ = ("last_view", "view_rate", "track_id", "is_playing", "remaining", "interval", "due")
+
+    def __init__(self, now):
+        self.last_view = now
+        self.view_rate = 0.0
+        self.track_id = None
+        self.is_playing = False
+        self.remaining = None
+        self.interval = None
+        self.due = None
+
+    def viewed(self, now):
+        # Views in roughly the last minute, decayed exponentially.
+        self.view_rate = self.view_rate * math.exp(-(now - self.last_view) / 60.0) + 1.0
+        self.last_view = now
+
+    def observe(self, data):
+        """Update from a now-playing payload. Return True if the track changed."""
+        item = (data or {}).get("item") or {}
+        track_id = item.get("id") or item.get("uri")
+        changed = track_id != self.track_id
+        self.track_id = track_id
+        self.is_playing = bool(data) and data.get("is_playing", True)
+
+        progress_ms = (data or {}).get("progress_ms")
+        duration_ms = item.get("duration_ms")
+        if self.is_playing and progress_ms is not None and duration_ms:
+            self.remaining = max(duration_ms - progress_ms, 0) / 1000.0
+        else:
+            self.remaining = None
+        return changed
+
+
+class PollScheduler:
+    """See the module docstring. ``poll(uid)`` fetches, caches and returns the
+    raw now-playing payload, or raises to stop polling the uid."""
+
+    def __init__(
+        self,
+        poll,
+        hot_interval=HOT_INTERVAL,
+        playing_interval=PLAYING_INTERVAL,
+        idle_interval=IDLE_INTERVAL,
+        forget_after=FORGET_AFTER,
+        hot_views_per_minute=HOT_VIEWS_PER_MINUTE,
+        concurrency=POLL_CONCURRENCY,
+    ):
+        self.poll = poll
+        self.hot_interval = hot_interval
+        self.playing_interval = playing_interval
+        self.idle_interval = idle_interval
+        self.forget_after = forget_after
+        self.hot_views_per_minute = hot_views_per_minute
+        self.concurrency = concurrency
+        self._states = {}
+        self._heap = []
+        self._cond = threading.Condition()
+        self._pid = None
+        self._executor = None
+
+    def next_interval(self, state, changed=False):
+        hot = state.view_rate >= self.hot_views_per_minute
+        if not state.is_playing:
+            if changed or state.interval is None:
+                return self.playing_interval
+            # Someone keeps looking at this badge: notice a resume sooner.
+            idle_interval = self.idle_interval / 4 if hot else self.idle_interval
+            return min(max(state.interval * 2, self.playing_interval), idle_interval)
+
+        interval = self.hot_interval if hot else self.playing_interval
+        if state.remaining is not None:
+            interval = min(interval, state.remaining + TRACK_END_SLACK)
+        return max(interval, MIN_INTERVAL)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        # Threads do not survive fork, so each worker starts its own.
+        self._pid = os.getpid()
+        self._states = {}
+        self._heap = []
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="poll")
+        threading.Thread(target=self._run, name="poll-scheduler", daemon=True).start()
+
+    def _schedule(self, uid, state, delay):
+        state.due = monotonic() + delay
+        heapq.heappush(self._heap, (state.due, uid))
+        self._cond.notify()
+
+    def touch(self, uid, data=None):
+        """Record a view of ``uid``; ``data`` is a payload the caller just fetched."""
+        with self._cond:
+            self._ensure_started()
+            now = monotonic()
+            state = self._states.get(uid)
+            if state is None:
+                state = self._states[uid] = UidState(now)
+                state.viewed(now)
+                changed = state.observe(data)
+                state.interval = self.next_interval(state, changed)
+                self._schedule(uid, state, state.interval)
+                return
+            state.viewed(now)
+
+    def watched(self):
+        with self._cond:
+            return dict(self._states)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > monotonic():
+                    timeout = self._heap[0][0] - monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                due, uid = heapq.heappop(self._heap)
+                state = self._states.get(uid)
+                if state is None or state.due != due:
+                    # Forgotten, or rescheduled since this entry was pushed.
+                    continue
+                if monotonic() - state.last_view > self.forget_after:
+                    del self._states[uid]
+                    continue
+                state.due = None
+            self._executor.submit(self._poll, uid)
+
+    def _poll(self, uid):
+        try:
+            data = self.poll(uid)
+        except Exception as e:
+            print(f"poll {uid} failed, not polling it until viewed again: {e}")
+            with self._cond:
+                self._states.pop(uid, None)
+            return
+
+        with self._cond:
+            state = self._states.get(uid)
+            if state is None or state.due is not None:
+                return
+            changed = state.observe(data)
+            state.interval = self.next_interval(state, changed)
+            self._schedule(uid, state, state.interval)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(poll):
+    """Return the process-wide scheduler polling with ``poll``, or None if
+    POLL_SCHEDULER is not enabled."""
+    global _scheduler
+
+    if os.getenv("POLL_SCHEDULER", "false") != "true":
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = PollScheduler(poll)
+    return _scheduler
@@ -0,0 +1,65 @@
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """Collapse concurrent calls with the same key into one.
+
+    The first caller for a key runs ``fn``; callers arriving while it is in
+    flight wait and get the same result (or exception). Nothing is cached
+    once the call returns. Works across the threads of one process.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """Return ``fn()``, shared with concurrent callers of ``key``.
+
+        A waiter that gives up after ``timeout`` seconds runs ``fn`` itself.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def waiters(self, key):
+        """Return how many callers joined the in-flight call for ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call is not None else 0
@@ -8,7 +8,7 @@ import json
 import os
 import random
 
-import requests
+from util.http import get_session
 
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_SECRET_ID = os.getenv("SPOTIFY_SECRET_ID")
@@ -48,7 +48,7 @@ def generate_token(authorization_code):
 
     headers = {"Authorization": f"Basic {get_authorization()}"}
 
-    response = requests.post(SPOTIFY_URL_GENERATE_TOKEN, data=data, headers=headers)
+    response = get_session().post(SPOTIFY_URL_GENERATE_TOKEN, data=data, headers=headers)
     response_json = response.json()
 
     return response_json
@@ -63,7 +63,7 @@ def refresh_token(refresh_token):
 
     headers = {"Authorization": f"Basic {get_authorization()}"}
 
-    response = requests.post(SPOTIFY_URL_REFRESH_TOKEN, data=data, headers=headers)
+    response = get_session().post(SPOTIFY_URL_REFRESH_TOKEN, data=data, headers=headers)
     response_json = response.json()
 
     return response_json
@@ -72,14 +72,14 @@ def refresh_token(refresh_token):
 def get_user_profile_raw(access_token):
     """Return the raw Response object for flexible error handling by callers."""
     headers = {"Authorization": f"Bearer {access_token}"}
-    return requests.get(SPOTIFY_URL_USER_INFO, headers=headers)
+    return get_session().get(SPOTIFY_URL_USER_INFO, headers=headers)
 
 
 def get_user_profile(access_token):
 
     headers = {"Authorization": f"Bearer {access_token}"}
 
-    response = requests.get(SPOTIFY_URL_USER_INFO, headers=headers)
+    response = get_session().get(SPOTIFY_URL_USER_INFO, headers=headers)
     response_json = response.json()
 
     return response_json
@@ -89,7 +89,7 @@ def get_recently_play(access_token):
 
     headers = {"Authorization": f"Bearer {access_token}"}
 
-    response = requests.get(SPOTIFY_URL_RECENTLY_PLAY, headers=headers)
+    response = get_session().get(SPOTIFY_URL_RECENTLY_PLAY, headers=headers)
 
     if response.status_code == 204:
         return {}
@@ -102,7 +102,7 @@ def get_now_playing(access_token):
 
     headers = {"Authorization": f"Bearer {access_token}"}
 
-    response = requests.get(SPOTIFY_URL_NOW_PLAYING, headers=headers)
+    response = get_session().get(SPOTIFY_URL_NOW_PLAYING, headers=headers)
 
     if response.status_code == 204:
         return {}
@@ -0,0 +1,53 @@
+"""Tell the other workers of a host that something changed.
+
+A per-process cache cannot be cleared from another worker. The worker that
+changes something touches a stamp file instead, and the others compare its
+mtime with the one they saw last, like util/bloom.py does with the filter
+file, and drop what they cached before.
+
+``logins`` is touched by callback.py whenever a user logs in, so the view's
+negative cache of unknown and revoked uids can be cleared in every worker.
+Its path is ``LOGIN_STAMP_PATH`` (default: a file in the system temp dir),
+which must be shared by the workers, so per host. Shared cache backends
+(shm, redis) do not need it: deleting an entry there is seen by everyone.
+"""
+
+import os
+import tempfile
+import threading
+
+LOGIN_STAMP_PATH = os.getenv("LOGIN_STAMP_PATH") or os.path.join(tempfile.gettempdir(), "spotify-badge-logins.stamp")
+
+
+class Stamp:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Nothing is cached before the process starts, so earlier touches
+        # do not count.
+        self._seen = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def touch(self):
+        try:
+            with open(self.path, "a"):
+                pass
+            os.utime(self.path)
+        except OSError as e:
+            print(f"cannot touch stamp {self.path}: {e}")
+
+    def changed(self):
+        """Return True if the stamp was touched since the last call."""
+        mtime = self._mtime()
+        with self._lock:
+            changed = mtime != self._seen
+            self._seen = mtime
+        return changed
+
+
+logins = Stamp(LOGIN_STAMP_PATH)
@@ -0,0 +1,92 @@
+"""Jinja settings for the badge templates.
+
+Flask compiles a template the first time a worker renders it, so every cold
+start pays for parsing and compiling the spotify.*.html.j2 themes again.
+``configure`` avoids that in two ways:
+
+- a bytecode cache (``TEMPLATE_BYTECODE_CACHE``, default on) in
+  ``TEMPLATE_CACHE_DIR`` (default: a directory in the system temp dir), which
+  all workers on a machine share. Entries are keyed by the template source,
+  so an edited template is simply compiled again;
+- templates compiled ahead of time into Python modules, loaded from
+  ``TEMPLATE_MODULES`` when that directory exists. Build it with
+
+      python -m util.templates build/templates
+
+  and build it again whenever a template changes: modules are not checked
+  against their source.
+
+Badge templates are minified as they are loaded (and so before they are
+compiled or precompiled): indentation, blank lines and comments are dropped,
+and block tags do not leave empty lines behind. Line breaks are kept, they
+are whitespace in the markup.
+
+Templates are never reloaded from disk and not autoescaped: the view escapes
+the few user-controlled values itself, see make_svg.
+"""
+
+import os
+import re
+import sys
+
+from jinja2 import ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, ModuleLoader
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "api", "templates")
+TEMPLATE_BYTECODE_CACHE = os.getenv("TEMPLATE_BYTECODE_CACHE", "true") == "true"
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR") or None
+TEMPLATE_MODULES = os.getenv("TEMPLATE_MODULES", "")
+# Compiled code depends on these, so precompiled modules use them too.
+ENVIRONMENT_OPTIONS = {"autoescape": False, "trim_blocks": True, "lstrip_blocks": True}
+MINIFIED = re.compile(r"^spotify\..*\.j2$")
+
+COMMENTS = re.compile(r"<!--.*?-->|/\*.*?\*/", re.S)
+INDENTATION = re.compile(r"^[ \t]+|[ \t]+$", re.M)
+BLANK_LINES = re.compile(r"\n{2,}")
+
+
+def minify(source):
+    """Return template ``source`` without comments, indentation and blank lines."""
+    source = COMMENTS.sub("", source)
+    source = INDENTATION.sub("", source)
+    return BLANK_LINES.sub("\n", source).strip() + "\n"
+
+
+class MinifyingLoader(FileSystemLoader):
+    """Load templates matching MINIFIED minified, the others as they are."""
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        if MINIFIED.match(template):
+            source = minify(source)
+        return source, filename, uptodate
+
+
+def configure(app, modules=TEMPLATE_MODULES, bytecode_cache=TEMPLATE_BYTECODE_CACHE, cache_dir=TEMPLATE_CACHE_DIR):
+    env = app.jinja_env
+    env.auto_reload = False
+    for name, value in ENVIRONMENT_OPTIONS.items():
+        setattr(env, name, value)
+    env.loader = MinifyingLoader(os.path.join(app.root_path, app.template_folder))
+
+    if modules and os.path.isdir(modules):
+        env.loader = ChoiceLoader([ModuleLoader(modules), env.loader])
+    elif bytecode_cache:
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    return app
+
+
+def precompile(target, template_dir=TEMPLATE_DIR):
+    """Compile every template in ``template_dir`` into modules in ``target``."""
+    env = Environment(loader=MinifyingLoader(template_dir), **ENVIRONMENT_OPTIONS)
+    os.makedirs(target, exist_ok=True)
+    env.compile_templates(target, zip=None, filter_func=lambda name: name.endswith(".j2"), ignore_errors=False)
+    return sorted(env.list_templates(filter_func=lambda name: name.endswith(".j2")))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m util.templates TARGET_DIR")
+    for name in precompile(sys.argv[1]):
+        print(f"compiled {name}")
@@ -0,0 +1,81 @@
+"""Badge themes and what each of them draws.
+
+Every theme has a template ``api/templates/spotify.<name>.html.j2``. The view
+uses this registry to size the SVG and to skip work a theme has no use for:
+bars, progress, the bar color taken from the cover, cover derivatives.
+"""
+
+# Spotify offers 64, 300 and 640 px covers.
+DEFAULT_COVER_SIZE = 300
+
+
+class Theme:
+    __slots__ = (
+        "name",
+        "height",
+        "height_without_cover",
+        "num_bar",
+        "cover_size",
+        "progress",
+        "bar_color",
+        "skip_dark_bar",
+        "derivatives",
+    )
+
+    def __init__(
+        self,
+        name,
+        height,
+        height_without_cover=None,
+        num_bar=0,
+        cover_size=DEFAULT_COVER_SIZE,
+        progress=False,
+        bar_color=False,
+        skip_dark_bar=False,
+        derivatives=False,
+    ):
+        self.name = name
+        # Height of the SVG in px, with and without the cover
+        self.height = height
+        self.height_without_cover = height if height_without_cover is None else height_without_cover
+        # Number of equalizer bars drawn while playing
+        self.num_bar = num_bar
+        # Side in px at which the cover is drawn
+        self.cover_size = cover_size
+        # Draws a progress bar from progress_ms and duration_ms
+        self.progress = progress
+        # Draws something in bar_color, so bar_color_cover applies
+        self.bar_color = bar_color
+        # bar_color_cover skips dark colors, the background is dark
+        self.skip_dark_bar = skip_dark_bar
+        # Embeds the cover resized to cover_size and can draw a backdrop
+        self.derivatives = derivatives
+
+    @property
+    def template(self):
+        return f"spotify.{self.name}.html.j2"
+
+    def get_height(self, cover_image):
+        return self.height if cover_image else self.height_without_cover
+
+    def __repr__(self):
+        return f"Theme({self.name!r})"
+
+
+THEMES = {
+    theme.name: theme
+    for theme in (
+        Theme("default", 445, 145, num_bar=75, bar_color=True, skip_dark_bar=True),
+        Theme("compact", 400, 100),
+        Theme("natemoo-re", 84, num_bar=100, cover_size=64, bar_color=True),
+        Theme("novatorem", 100, num_bar=100, cover_size=80, bar_color=True),
+        Theme("karaoke", 445, 145),
+        Theme("apple", 534, cover_size=288, progress=True, derivatives=True),
+        Theme("spotify-embed", 152, cover_size=120, progress=True, derivatives=True),
+    )
+}
+
+
+def get_cover_size(name):
+    theme = THEMES.get(name)
+    return theme.cover_size if theme is not None else DEFAULT_COVER_SIZE
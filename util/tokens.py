@@ -0,0 +1,47 @@
+from time import time
+
+
+class TokenInfo:
+    """The parts of a user's Firestore document the view needs.
+
+    The document holds everything Spotify returned at login (scope,
+    token_type, expires_in, ...). Caching only these three fields keeps a
+    cached user at a fraction of the size of the full dict.
+    """
+
+    __slots__ = ("access_token", "refresh_token", "expired_ts")
+
+    def __init__(self, access_token, refresh_token, expired_ts=None):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expired_ts = expired_ts
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("access_token"), data.get("refresh_token"), data.get("expired_ts"))
+
+    def expired(self, now=None):
+        now = int(time()) if now is None else now
+        return self.expired_ts is None or now >= self.expired_ts
+
+    def refreshed(self, new_token, now=None):
+        """Return the record after a refresh-token grant returned ``new_token``."""
+        now = int(time()) if now is None else now
+        return TokenInfo(
+            new_token["access_token"],
+            # Spotify may rotate the refresh token; keep the old one otherwise.
+            new_token.get("refresh_token", self.refresh_token),
+            now + new_token["expires_in"],
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, TokenInfo):
+            return NotImplemented
+        return (self.access_token, self.refresh_token, self.expired_ts) == (
+            other.access_token,
+            other.refresh_token,
+            other.expired_ts,
+        )
+
+    def __repr__(self):
+        return f"TokenInfo(expired_ts={self.expired_ts!r})"